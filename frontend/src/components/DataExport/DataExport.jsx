@@ -70,9 +70,8 @@ const DataExport = () => {
             const response = await apiClient.post('/api/export', {
                 format: 'json',
                 options: { onlyConfirmed: false },
-            });
-            const blob = new Blob([JSON.stringify(response.data, null, 2)], { type: 'application/json' });
-            const url = window.URL.createObjectURL(blob);
+            }, { responseType: 'blob' });
+            const url = window.URL.createObjectURL(new Blob([response.data], { type: 'application/json' }));
             const a = document.createElement('a');
             a.href = url;
             a.download = `annotations_${new Date().toISOString().split('T')[0]}.json`;
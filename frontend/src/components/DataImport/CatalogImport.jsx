@@ -12,11 +12,20 @@ const CatalogImport = ({ projectId, onSuccess, onError, setMessage }) => {
     const [videoTotalPages, setVideoTotalPages] = useState(1);
     const [loading, setLoading] = useState(false);
     const [importing, setImporting] = useState(false);
+    const [scanning, setScanning] = useState(false);
+    const [importProgress, setImportProgress] = useState(null);
 
     useEffect(() => {
         fetchDatasets();
     }, []);
 
+    // While the server is still indexing the dataset, refresh the page as files are found
+    useEffect(() => {
+        if (!scanning || !selectedDataset) return;
+        const timer = setTimeout(() => fetchDatasetVideos(selectedDataset.id, videoPage, true), 2000);
+        return () => clearTimeout(timer);
+    }, [scanning, selectedDataset, videoPage, videoTotal]);
+
     const fetchDatasets = async () => {
         setLoading(true);
         try {
@@ -36,17 +45,19 @@ const CatalogImport = ({ projectId, onSuccess, onError, setMessage }) => {
         await fetchDatasetVideos(dataset.id, 1);
     };
 
-    const fetchDatasetVideos = async (datasetId, page) => {
-        setLoading(true);
+    const fetchDatasetVideos = async (datasetId, page, background = false) => {
+        if (!background) setLoading(true);
         try {
             const response = await apiClient.get(`/api/catalog/datasets/${datasetId}/videos?page=${page}&per_page=50`);
             setDatasetVideos(response.data.videos || []);
             setVideoTotal(response.data.total || 0);
             setVideoTotalPages(response.data.total_pages || 1);
+            setScanning(Boolean(response.data.scanning));
         } catch (err) {
             console.error('Error fetching dataset videos:', err);
+            setScanning(false);
         } finally {
-            setLoading(false);
+            if (!background) setLoading(false);
         }
     };
 
@@ -69,7 +80,16 @@ const CatalogImport = ({ projectId, onSuccess, onError, setMessage }) => {
                 project_id: projectId,
                 import_all: true,
             });
-            const data = response.data;
+            // The import runs as a background job; poll it until it finishes
+            let data = response.data;
+            while (data.status === 'queued' || data.status === 'running') {
+                setImportProgress(data);
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                data = (await apiClient.get(`/api/catalog/import/${data.job_id}`)).data;
+            }
+            if (data.status === 'failed') {
+                throw new Error(data.error || 'Import failed');
+            }
             setMessage && setMessage(
                 `Imported ${data.imported} videos from "${data.dataset_name}" (${data.skipped} already imported)`
             );
@@ -79,6 +99,7 @@ const CatalogImport = ({ projectId, onSuccess, onError, setMessage }) => {
             if (onError) onError(err);
         } finally {
             setImporting(false);
+            setImportProgress(null);
         }
     };
 
@@ -153,6 +174,7 @@ const CatalogImport = ({ projectId, onSuccess, onError, setMessage }) => {
             <div className="import-actions">
                 <div className="import-summary">
                     <strong>{videoTotal}</strong> video files found
+                    {scanning && <span> &middot; <FaSpinner className="spin" /> still scanning</span>}
                     {selectedDataset.total_size_gb && (
                         <span> &middot; {formatSize(selectedDataset.total_size_gb)} total</span>
                     )}
@@ -163,7 +185,8 @@ const CatalogImport = ({ projectId, onSuccess, onError, setMessage }) => {
                     disabled={importing || !projectId || videoTotal === 0}
                 >
                     {importing ? (
-                        <><FaSpinner className="spin" /> Importing...</>
+                        <><FaSpinner className="spin" /> Importing{importProgress && importProgress.total
+                            ? ` ${importProgress.processed}/${importProgress.total}` : ''}...</>
                     ) : (
                         <><FaDatabase /> Import All {videoTotal} Videos</>
                     )}
@@ -33,11 +33,18 @@ const LabelingInterface = () => {
     useEffect(() => {
         const fetchVideos = async () => {
             try {
-                const params = new URLSearchParams();
-                if (currentProject?.project_id) params.append('project_id', currentProject.project_id);
-                params.append('per_page', '10000');
-                const response = await apiClient.get(`/api/videos?${params}`);
-                setVideos(response.data.videos || []);
+                const all = [];
+                let after = null;
+                do {
+                    const params = new URLSearchParams();
+                    if (currentProject?.project_id) params.append('project_id', currentProject.project_id);
+                    if (after != null) params.append('after', after);
+                    params.append('per_page', '1000');
+                    const response = await apiClient.get(`/api/videos?${params}`);
+                    all.push(...(response.data.videos || []));
+                    after = response.data.next_cursor;
+                } while (after != null);
+                setVideos(all);
             } catch (err) {
                 console.error('Error fetching videos:', err);
             }
@@ -8,9 +8,16 @@ const VideoList = ({ onVideoSelect, projectId }) => {
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
     const [page, setPage] = useState(1);
-    const [totalPages, setTotalPages] = useState(1);
+    // cursors[i] is the `after` value that loads page i + 1
+    const [cursors, setCursors] = useState([null]);
     const [total, setTotal] = useState(0);
     const perPage = 50;
+    const totalPages = Math.max(1, Math.ceil(total / perPage));
+
+    useEffect(() => {
+        setPage(1);
+        setCursors([null]);
+    }, [projectId]);
 
     useEffect(() => {
         const fetchVideos = async () => {
@@ -18,13 +25,18 @@ const VideoList = ({ onVideoSelect, projectId }) => {
                 setLoading(true);
                 const params = new URLSearchParams();
                 if (projectId) params.append('project_id', projectId);
-                params.append('page', page);
+                if (cursors[page - 1] != null) params.append('after', cursors[page - 1]);
                 params.append('per_page', perPage);
+                params.append('include_total', 'true');
 
                 const response = await apiClient.get(`/api/videos?${params}`);
                 setVideos(response.data.videos || []);
                 setTotal(response.data.total || 0);
-                setTotalPages(response.data.total_pages || 1);
+                setCursors(prev => {
+                    const next = prev.slice(0, page);
+                    if (response.data.next_cursor != null) next.push(response.data.next_cursor);
+                    return next;
+                });
                 setError(null);
             } catch (err) {
                 console.error("Error fetching videos:", err);
@@ -97,8 +109,8 @@ const VideoList = ({ onVideoSelect, projectId }) => {
                         Page {page} of {totalPages} ({total} videos)
                     </span>
                     <button
-                        onClick={() => setPage(p => Math.min(totalPages, p + 1))}
-                        disabled={page >= totalPages}
+                        onClick={() => setPage(p => p + 1)}
+                        disabled={cursors.length <= page}
                         className="page-btn"
                     >
                         <FaChevronRight />
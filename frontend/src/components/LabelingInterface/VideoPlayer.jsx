@@ -19,6 +19,7 @@ const VideoPlayer = ({ videoUrl, onPositionChange }) => {
     const [currentFrame, setCurrentFrame] = useState(0);
     const [frameThumbnails, setFrameThumbnails] = useState({});
     const [showFrameSelector, setShowFrameSelector] = useState(false);
+    const [hlsUrl, setHlsUrl] = useState(null);
     
     useEffect(() => {
         // Reset playback rate and zoom when video changes
@@ -32,8 +33,39 @@ const VideoPlayer = ({ videoUrl, onPositionChange }) => {
             setIsPlaying(false);
             setFrameThumbnails({});
         }
+        setHlsUrl(null);
+        setError(null);
     }, [videoUrl]);
 
+    useEffect(() => {
+        const video = videoRef.current;
+        if (!hlsUrl || !video) return undefined;
+        // Safari plays HLS natively; other browsers go through hls.js and Media Source Extensions
+        if (video.canPlayType('application/vnd.apple.mpegurl')) {
+            video.src = hlsUrl;
+            return undefined;
+        }
+        let hls = null;
+        let cancelled = false;
+        import('hls.js').then(({ default: Hls }) => {
+            if (cancelled) return;
+            if (!Hls.isSupported()) {
+                setError("This browser cannot stream the converted video.");
+                return;
+            }
+            hls = new Hls();
+            hls.on(Hls.Events.ERROR, (_event, data) => {
+                if (data.fatal) setError("Failed to stream video.");
+            });
+            hls.loadSource(hlsUrl);
+            hls.attachMedia(video);
+        });
+        return () => {
+            cancelled = true;
+            if (hls) hls.destroy();
+        };
+    }, [hlsUrl]);
+
     const handleMetadataLoaded = (e) => {
         setDuration(e.target.duration);
         // Use an even more conservative frame rate to ensure frames are within range
@@ -61,7 +93,26 @@ const VideoPlayer = ({ videoUrl, onPositionChange }) => {
         }
     };
 
-    const handleVideoError = () => {
+    const handleVideoError = async () => {
+        if (hlsUrl) {
+            if (videoRef.current?.error) setError("Failed to stream video.");
+            return;
+        }
+        // Files the browser can't play are answered with 202 and an HLS playlist to stream instead
+        try {
+            const response = await fetch(videoUrl);
+            if (response.status === 202) {
+                const status = await response.json();
+                if (status.hls_url) {
+                    setHlsUrl(`${basePath}${status.hls_url}`);
+                    return;
+                }
+            } else {
+                response.body?.cancel();
+            }
+        } catch (e) {
+            console.error('Error checking video status:', e);
+        }
         setError("Failed to load video. Please check the file format.");
     };
 
@@ -386,7 +437,7 @@ const VideoPlayer = ({ videoUrl, onPositionChange }) => {
                                     {/* Video without controls */}
                                     <video 
                                         ref={videoRef} 
-                                        src={videoUrl} 
+                                        src={hlsUrl ? undefined : videoUrl} 
                                         className="video-element"
                                         controls={false}
                                         onLoadedMetadata={handleMetadataLoaded}
@@ -40,7 +40,7 @@ const VideoQueue = ({ selectedVideo, onVideoSelect }) => {
                 { withCredentials: true }
             );
 
-            setAssignedVideos(response.data || []);
+            setAssignedVideos(response.data.videos || []);
         } catch (error) {
             console.error('Error fetching assigned videos:', error);
             setAssignedVideos([]);
@@ -22,10 +22,16 @@ const VideoAssignment = ({ projectId, onClose, onAssignmentComplete }) => {
             setLoading(true);
             setError(null);
             
-            // Fetch unassigned videos for the project
-            const videosResponse = await apiClient.get(
-                `/api/videos?project_id=${projectId}&unassigned=true`
-            );
+            // Fetch the project's videos, page by page
+            const projectVideos = [];
+            let after = null;
+            do {
+                const params = new URLSearchParams({ project_id: projectId, per_page: '1000' });
+                if (after != null) params.append('after', after);
+                const videosResponse = await apiClient.get(`/api/videos?${params}`);
+                projectVideos.push(...(videosResponse.data.videos || []));
+                after = videosResponse.data.next_cursor;
+            } while (after != null);
             
             // Fetch project members
             const membersResponse = await apiClient.get(
@@ -34,7 +40,7 @@ const VideoAssignment = ({ projectId, onClose, onAssignmentComplete }) => {
                 }
             );
             
-            setVideos(videosResponse.data);
+            setVideos(projectVideos);
             setUsers(membersResponse.data.members.filter(m => 
                 m.role === 'annotator' || m.role === 'member'
             ));
@@ -164,7 +170,7 @@ const VideoAssignment = ({ projectId, onClose, onAssignmentComplete }) => {
                     {/* Videos Panel */}
                     <div className="selection-panel">
                         <div className="panel-header">
-                            <h3><FaVideo /> Unassigned Videos ({videos.length})</h3>
+                            <h3><FaVideo /> Project Videos ({videos.length})</h3>
                             <button 
                                 className="select-all-btn"
                                 onClick={selectAllVideos}
@@ -174,7 +180,7 @@ const VideoAssignment = ({ projectId, onClose, onAssignmentComplete }) => {
                         </div>
                         <div className="selection-list">
                             {videos.length === 0 ? (
-                                <p className="no-items">No unassigned videos</p>
+                                <p className="no-items">No videos in project</p>
                             ) : (
                                 videos.map(video => (
                                     <label key={video.video_id} className="selection-item">
@@ -1,9 +1,11 @@
-"""CLI entry points for label-dev, label-serve, label-build."""
+"""CLI entry points for label-dev, label-serve, label-build, label-cache, label-warm, label-db."""
 
+import argparse
 import subprocess
 import signal
 import sys
 import os
+import time
 
 
 def dev():
@@ -40,3 +42,284 @@ def build():
     frontend_dir = os.path.join(os.path.dirname(__file__), "..", "..", "frontend")
     frontend_dir = os.path.normpath(frontend_dir)
     subprocess.run(["npm", "run", "build"], cwd=frontend_dir, check=True)
+
+
+# Temp files from a crashed writer are only removed once they are clearly abandoned
+STALE_PART_SECONDS = 3600
+
+
+def _media_caches():
+    from .config import settings
+    from .services.frame_index import index_store
+    from .services.hls import segment_cache
+    from .services.transcode import transcode_cache
+    from .services.video_processing import get_frame_cache
+
+    return {
+        "transcoded": transcode_cache,
+        "thumbnails": get_frame_cache(settings.thumbnail_cache),
+        "hls": segment_cache,
+        "index": index_store,
+    }
+
+
+def _entry_is_valid(cache, key):
+    import cv2
+    import numpy as np
+
+    path = cache.path_for(key)
+    if os.path.getsize(path) == 0:
+        return False
+    if cache.suffix == ".mp4":
+        cap = cv2.VideoCapture(path)
+        try:
+            return cap.isOpened() and cap.get(cv2.CAP_PROP_FRAME_COUNT) > 0
+        finally:
+            cap.release()
+    if cache.suffix == ".jpg":
+        return cv2.imread(path) is not None
+    if cache.suffix == ".npz":
+        try:
+            with np.load(path) as data:
+                return "pts" in data and "keyframes" in data
+        except (OSError, ValueError):
+            return False
+    return True
+
+
+def _gb(n):
+    return f"{n / 1024 ** 3:.2f} GB"
+
+
+def cache():
+    """Report, prune or verify the on-disk media caches."""
+    parser = argparse.ArgumentParser(prog="label-cache", description=cache.__doc__)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("report", help="show entries and size per cache")
+    prune = sub.add_parser("prune", help="evict least-recently-used entries down to the budget")
+    prune.add_argument("--max-bytes", type=int, help="target size instead of the configured budget")
+    sub.add_parser("verify", help="remove unreadable entries and abandoned temp files")
+    for p in sub.choices.values():
+        p.add_argument("--cache", action="append", help="limit to these caches (repeatable)")
+    args = parser.parse_args()
+
+    caches = _media_caches()
+    selected = args.cache or list(caches)
+    unknown = set(selected) - set(caches)
+    if unknown:
+        parser.error(f"unknown cache(s): {', '.join(sorted(unknown))}; choose from {', '.join(caches)}")
+
+    for name in selected:
+        c = caches[name]
+        if args.command == "report":
+            stats = c.stats()
+            print(f"{name:<12} {stats['entries']:>8} entries  {_gb(stats['size_bytes']):>10} "
+                  f"of {_gb(stats['max_bytes'])}  ({c.directory})")
+
+        elif args.command == "prune":
+            before = c.stats()["size_bytes"]
+            removed = c.prune(args.max_bytes)
+            freed = before - c.stats()["size_bytes"]
+            print(f"{name:<12} removed {removed} entries, freed {_gb(freed)}")
+
+        elif args.command == "verify":
+            bad = 0
+            for key, _ in c.entries():
+                try:
+                    valid = _entry_is_valid(c, key)
+                except OSError:
+                    valid = False
+                if not valid:
+                    c.discard(key)
+                    bad += 1
+            orphans = 0
+            if os.path.isdir(c.directory):
+                cutoff = time.time() - STALE_PART_SECONDS
+                for entry in os.scandir(c.directory):
+                    if ".part" in entry.name and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        orphans += 1
+            print(f"{name:<12} removed {bad} invalid entries, {orphans} abandoned temp files")
+
+
+def _parse_shard(value):
+    try:
+        index, count = (int(x) for x in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("shard must look like i/N, e.g. 0/8")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError("shard index must satisfy 0 <= i < N")
+    return index, count
+
+
+def warm():
+    """Pre-compute frame indexes, transcodes, poster frames and filmstrips for a project or catalog dataset."""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    from .config import settings
+    from .services.transcode import available_cores
+
+    parser = argparse.ArgumentParser(prog="label-warm", description=warm.__doc__)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--project", type=int, help="warm every video in this project")
+    source.add_argument("--dataset", type=int, help="warm every video in this catalog dataset")
+    parser.add_argument("--shard", type=_parse_shard, default=(0, 1),
+                        help="process only shard i of N, e.g. $SLURM_ARRAY_TASK_ID/$SLURM_ARRAY_TASK_COUNT")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (default: a quarter of the cores)")
+    parser.add_argument("--filmstrip", type=int, default=20, help="filmstrip frames per video")
+    parser.add_argument("--no-transcode", action="store_true", help="skip transcoding")
+    args = parser.parse_args()
+
+    if args.project is not None:
+        # One read-only query for the list; no migrations, and the workers never open the database
+        from sqlalchemy.orm import Session
+        from .database import _create_engine
+        from .models import Video
+        from .services.video_processing import resolve_video_path
+        eng = _create_engine(settings.database_url, read_only=True)
+        try:
+            with Session(eng) as db:
+                paths = [resolve_video_path(v) for v in db.query(Video).filter_by(project_id=args.project)]
+        finally:
+            eng.dispose()
+    else:
+        from .services import catalog as catalog_svc
+        listing = catalog_svc.list_dataset_videos(args.dataset, page=1, per_page=sys.maxsize, wait=True)
+        paths = [v["path"] for v in listing["videos"]]
+
+    # Every shard sorts the same list, so shards partition it without coordinating
+    index, count = args.shard
+    paths = sorted(set(paths))[index::count]
+
+    cores = available_cores()
+    workers = args.workers or max(1, cores // 4)
+    threads = max(1, cores // workers)
+    print(f"Warming {len(paths)} videos (shard {index}/{count}) with {workers} workers", flush=True)
+
+    from .services.warm import warm_video
+    totals = {}
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as pool:
+        futures = [pool.submit(warm_video, p, args.filmstrip, not args.no_transcode, threads) for p in paths]
+        for n, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            totals[result["status"]] = totals.get(result["status"], 0) + 1
+            detail = result.get("error") or " ".join(result["steps"])
+            print(f"[{n}/{len(paths)}] {result['status']:<7} {result['path']}  {detail}", flush=True)
+
+    print("Done: " + ", ".join(f"{k}={v}" for k, v in sorted(totals.items())))
+
+
+def _bench_profile(eng, writers, seconds, batch):
+    """Annotator-style writers (small transactions) racing one export-style full-table reader."""
+    import threading
+    from sqlalchemy import insert, select
+    from sqlalchemy.exc import OperationalError
+    from .database import Base
+    from .models import BoundingBoxAnnotation, Video
+
+    Base.metadata.create_all(bind=eng)
+    with eng.begin() as conn:
+        conn.execute(insert(Video).values(video_id=1, filename="bench.mp4"))
+        conn.execute(insert(BoundingBoxAnnotation), [
+            {"video_id": 1, "frame_index": i, "x": 0.1, "y": 0.1, "width": 0.2, "height": 0.2, "part_label": "Head"}
+            for i in range(50000)
+        ])
+
+    latencies, errors, reads = [], [0], [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def write(worker):
+        frame = 0
+        while time.monotonic() < deadline:
+            rows = [{"video_id": 1, "frame_index": frame + i, "x": 0.5, "y": 0.5, "width": 0.1, "height": 0.1,
+                     "part_label": "Torso", "annotator_name": f"w{worker}"} for i in range(batch)]
+            frame += batch
+            started = time.perf_counter()
+            try:
+                with eng.begin() as conn:
+                    conn.execute(insert(BoundingBoxAnnotation), rows)
+            except OperationalError:
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    def read():
+        while time.monotonic() < deadline:
+            with eng.connect() as conn:
+                conn.execute(select(BoundingBoxAnnotation)).fetchall()
+            reads[0] += 1
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(writers)]
+    threads.append(threading.Thread(target=read))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    eng.dispose()
+
+    latencies.sort()
+
+    def pick(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0
+
+    return {"commits": len(latencies), "errors": errors[0], "reads": reads[0],
+            "p50": pick(0.5), "p95": pick(0.95), "max": pick(1.0)}
+
+
+def db():
+    """Maintain the application database, reconcile its counters or benchmark the SQLite profile."""
+    import tempfile
+
+    parser = argparse.ArgumentParser(prog="label-db", description=db.__doc__)
+    sub = parser.add_subparsers(dest="command", required=True)
+    maintain = sub.add_parser("maintain", help="checkpoint and truncate the WAL, refresh planner statistics")
+    maintain.add_argument("--vacuum", action="store_true", help="also rebuild the file to reclaim free pages")
+    sub.add_parser("reconcile", help="rebuild per-video annotation counters and project rollups")
+    bench = sub.add_parser("bench", help="compare default and configured pragmas on a scratch database")
+    bench.add_argument("--writers", type=int, default=12, help="concurrent annotator threads")
+    bench.add_argument("--seconds", type=float, default=10, help="duration of each run")
+    bench.add_argument("--batch", type=int, default=20, help="boxes per save")
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine, text
+    from . import database
+    from .config import settings
+
+    if args.command == "maintain":
+        database.init_db(settings.database_url)
+        result = database.maintain(truncate=True)
+        print(f"checkpointed {result['checkpointed']} of {result['wal_frames']} WAL frames"
+              + (" (blocked by active readers)" if result["busy"] else ""))
+        if args.vacuum:
+            with database.engine.connect() as conn:
+                conn.execute(text("VACUUM"))
+            print("vacuumed")
+        database.close_db()
+
+    elif args.command == "reconcile":
+        from .services import counters
+        database.init_db(settings.database_url)
+        with database.engine.begin() as conn:
+            fixed = counters.rebuild(conn)
+        print(f"corrected counters on {fixed['videos']} videos and {fixed['projects']} projects")
+        database.close_db()
+
+    elif args.command == "bench":
+        with tempfile.TemporaryDirectory() as tmp:
+            profiles = {
+                "default": create_engine(f"sqlite:///{tmp}/default.db", connect_args={"check_same_thread": False}),
+                "configured": database._create_engine(f"sqlite:///{tmp}/configured.db"),
+            }
+            print(f"{args.writers} writers x {args.batch} boxes/save + 1 full-table reader, {args.seconds:g}s each")
+            for name, eng in profiles.items():
+                r = _bench_profile(eng, args.writers, args.seconds, args.batch)
+                print(f"{name:<11} {r['commits'] / args.seconds:>8.1f} saves/s  p50 {r['p50']:>7.1f} ms  "
+                      f"p95 {r['p95']:>7.1f} ms  max {r['max']:>8.1f} ms  "
+                      f"locked {r['errors']:>4}  exports {r['reads']:>4}")
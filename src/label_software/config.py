@@ -8,8 +8,40 @@ class Settings(BaseSettings):
     upload_folder: str = os.path.join(os.getcwd(), "uploads")
     frontend_dist: str = os.path.join(os.path.dirname(__file__), "..", "..", "frontend", "dist")
     max_upload_size: int = 10 * 1024 * 1024 * 1024  # 10GB
+    sqlite_journal_mode: str = "auto"  # auto = WAL when the database is on a local disk, else delete
+    sqlite_synchronous: str = "normal"  # durable at checkpoints; safe with WAL
+    sqlite_busy_timeout: int = 30000  # ms a connection waits for a lock before "database is locked"
+    sqlite_cache_size: int = -65536  # page cache per connection; negative = KiB (64MB)
+    sqlite_mmap_size: int = 256 * 1024 * 1024  # 256MB of the file read through mmap
+    sqlite_read_pool_size: int = 8  # read-only connections serving GET routes
+    sqlite_maintenance_interval: int = 300  # seconds between WAL checkpoints / PRAGMA optimize; 0 disables
+    idempotency_ttl: int = 24 * 3600  # seconds a bulk write's Idempotency-Key is remembered
     catalog_db_path: str = "/projects/helmetlab1/Data-Catalog/catalog.db"
     catalog_data_root: str = "/projects/helmetlab1/Data-Catalog/data"
+    catalog_index_ttl: int = 300  # seconds before a browse re-checks a dataset's directories
+    catalog_scan_workers: int = 16  # concurrent directory listings during a catalog scan
+    import_probe_workers: int = 8  # concurrent probes during a catalog import with extract_metadata
+    decoder_pool_size: int = 8  # max open VideoCaptures kept for frame extraction
+    decoder_idle_timeout: int = 300  # seconds before an unused decoder is closed
+    thumbnail_cache_max_bytes: int = 2 * 1024 * 1024 * 1024  # 2GB
+    thumbnail_quality: int = 85
+    index_cache_max_bytes: int = 512 * 1024 * 1024  # 512MB
+    index_build_timeout: int = 600  # seconds
+    transcode_workers: int = 0  # concurrent ffmpeg jobs; 0 = a quarter of the available cores
+    transcode_timeout: int = 3600  # seconds
+    transcode_cache_max_bytes: int = 100 * 1024 * 1024 * 1024  # 100GB
+    transcode_retry_after: int = 5  # seconds clients wait before polling again
+    upload_chunk_size: int = 16 * 1024 * 1024  # 16MB default for resumable uploads
+    upload_session_ttl: int = 24 * 3600  # seconds before a stalled upload session is removed
+    processing_workers: int = 2  # concurrent post-upload probe/transcode jobs
+    ingest_folder: str = ""  # watched hot folder; empty disables ingestion
+    ingest_settle_seconds: int = 30  # a file must stop growing this long before it is registered
+    ingest_poll_interval: int = 10  # seconds between settle checks
+    ingest_polling_observer: bool = False  # poll the tree instead of inotify (GPFS/NFS writes from other nodes)
+    hls_segment_seconds: int = 6
+    hls_cache_max_bytes: int = 20 * 1024 * 1024 * 1024  # 20GB
+    hls_workers: int = 2  # concurrent segment encodes, on their own pool so they never queue behind full transcodes
+    hls_segment_timeout: int = 120  # seconds
 
     model_config = {"env_prefix": "LABEL_"}
 
@@ -21,9 +53,29 @@ class Settings(BaseSettings):
     def preview_dir(self) -> str:
         return os.path.join(self.upload_folder, "preview")
 
+    @property
+    def index_cache(self) -> str:
+        return os.path.join(self.upload_folder, "index")
+
     @property
     def transcode_cache(self) -> str:
         return os.path.join(self.upload_folder, "transcoded")
 
+    @property
+    def hls_cache(self) -> str:
+        return os.path.join(self.upload_folder, "hls")
+
+    @property
+    def upload_sessions_dir(self) -> str:
+        return os.path.join(self.upload_folder, "sessions")
+
+    @property
+    def blob_dir(self) -> str:
+        return os.path.join(self.upload_folder, "blobs")
+
+    @property
+    def lock_dir(self) -> str:
+        return os.path.join(self.upload_folder, "locks")
+
 
 settings = Settings()
@@ -1,41 +1,202 @@
-from sqlalchemy import create_engine
+import logging
+import os
+import threading
+
+from sqlalchemy import create_engine, event, make_url, text
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
 engine = None
+read_engine = None
 SessionLocal = None
+ReadSessionLocal = None
+_maintenance = None
 
 
 class Base(DeclarativeBase):
     pass
 
 
+# WAL keeps its index in shared memory, which only works when every connection is on the same host
+NETWORK_FILESYSTEMS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "gpfs", "lustre", "beegfs", "ceph",
+                       "glusterfs", "panfs", "wekafs", "afs", "9p"}
+
+
+def _filesystem_type(path: str) -> str | None:
+    """Filesystem type of the mount holding ``path``, from /proc/self/mounts (None if unknown)."""
+    path = os.path.realpath(path)
+    best, fs_type = "", None
+    try:
+        with open("/proc/self/mounts") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount = fields[1].replace("\\040", " ")
+                inside = path == mount or path.startswith(mount.rstrip("/") + "/")
+                if inside and len(mount) >= len(best):
+                    best, fs_type = mount, fields[2]
+    except OSError:
+        return None
+    return fs_type
+
+
+def is_local_filesystem(path: str) -> bool:
+    """True only when ``path`` is known to be on a disk of this host."""
+    fs_type = _filesystem_type(path)
+    return fs_type is not None and fs_type not in NETWORK_FILESYSTEMS and not fs_type.startswith("fuse")
+
+
+def _journal_mode(database_url: str) -> str:
+    """``sqlite_journal_mode``, with ``auto`` resolved to WAL only for a database on a local disk."""
+    mode = settings.sqlite_journal_mode.lower()
+    path = make_url(database_url).database
+    if not path or path == ":memory:":
+        return "delete" if mode == "auto" else mode
+    local = is_local_filesystem(os.path.dirname(os.path.abspath(path)))
+    if mode == "auto":
+        return "wal" if local else "delete"
+    if mode == "wal" and not local:
+        logger.warning("WAL requested for %s, which is not on a local filesystem; "
+                       "never open it from another node", path)
+    return mode
+
+
+def _apply_profile(dbapi_conn, read_only: bool, journal_mode: str | None):
+    """Per-connection pragmas from the ``sqlite_*`` settings."""
+    cursor = dbapi_conn.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {int(settings.sqlite_busy_timeout)}")
+        if journal_mode:
+            # Persistent in the file; only the writer needs to (re)assert it
+            cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+        cursor.execute(f"PRAGMA synchronous = {settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA cache_size = {int(settings.sqlite_cache_size)}")
+        cursor.execute(f"PRAGMA mmap_size = {int(settings.sqlite_mmap_size)}")
+        if read_only:
+            cursor.execute("PRAGMA query_only = ON")
+    finally:
+        cursor.close()
+
+
+def _create_engine(database_url: str, read_only: bool = False):
+    pool = {}
+    if read_only:
+        pool = {"pool_size": settings.sqlite_read_pool_size, "max_overflow": settings.sqlite_read_pool_size}
+    journal_mode = None if read_only else _journal_mode(database_url)
+    eng = create_engine(database_url, connect_args={"check_same_thread": False}, **pool)
+    event.listen(eng, "connect", lambda dbapi_conn, _record: _apply_profile(dbapi_conn, read_only, journal_mode))
+    return eng
+
+
 def init_db(database_url: str):
-    global engine, SessionLocal
-    engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    global engine, read_engine, SessionLocal, ReadSessionLocal
+    from . import models  # noqa: F401  (registers the tables on Base.metadata)
+    engine = _create_engine(database_url)
     SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
     Base.metadata.create_all(bind=engine)
-    _add_missing_columns(engine)
-
-
-def _add_missing_columns(eng):
-    """Add columns that create_all won't add to existing tables."""
-    migrations = [
-        ("videos", "source_type", "TEXT DEFAULT 'upload' NOT NULL"),
-        ("videos", "catalog_path", "TEXT"),
-        ("videos", "catalog_dataset_id", "INTEGER"),
-        ("projects", "catalog_dataset_id", "INTEGER"),
-        ("projects", "catalog_dataset_name", "TEXT"),
-        ("temporal_annotations", "frame_index", "INTEGER"),
-    ]
+    run_migrations(engine)
+    # Separate pool for GET routes: in WAL mode readers never wait on the writer
+    read_engine = _create_engine(database_url, read_only=True)
+    ReadSessionLocal = sessionmaker(bind=read_engine, autocommit=False, autoflush=False)
+
+
+# Columns added to existing tables after their first release (create_all won't add them)
+_ADDED_COLUMNS = [
+    ("videos", "source_type", "TEXT DEFAULT 'upload' NOT NULL"),
+    ("videos", "catalog_path", "TEXT"),
+    ("videos", "catalog_dataset_id", "INTEGER"),
+    ("projects", "catalog_dataset_id", "INTEGER"),
+    ("projects", "catalog_dataset_name", "TEXT"),
+    ("temporal_annotations", "frame_index", "INTEGER"),
+    ("videos", "probe_id", "INTEGER REFERENCES media_probes(probe_id)"),
+    ("media_probes", "transcode_plan", "JSON"),
+    ("videos", "processing_status", "TEXT DEFAULT 'ready' NOT NULL"),
+    ("videos", "processing_error", "TEXT"),
+    ("videos", "content_hash", "VARCHAR(64)"),
+    ("videos", "storage_path", "TEXT"),
+]
+
+
+def _add_columns(conn, columns):
+    for table, column, col_type in columns:
+        existing = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+        if existing and column not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}"))
+
+
+def _add_missing_columns(conn):
+    _add_columns(conn, _ADDED_COLUMNS)
+
+
+def _add_annotation_counters(conn):
+    from .services import counters
+    _add_columns(conn, [
+        ("videos", "temporal_count", "INTEGER DEFAULT 0 NOT NULL"),
+        ("videos", "bbox_count", "INTEGER DEFAULT 0 NOT NULL"),
+        ("videos", "last_annotated_at", "DATETIME"),
+        ("videos", "annotators", "JSON"),
+        ("projects", "annotated_videos", "INTEGER DEFAULT 0 NOT NULL"),
+        ("projects", "temporal_count", "INTEGER DEFAULT 0 NOT NULL"),
+        ("projects", "bbox_count", "INTEGER DEFAULT 0 NOT NULL"),
+    ])
+    counters.rebuild(conn)
+
+
+def _create_hot_indexes(conn):
+    """Indexes for the columns every per-video and per-project query filters on."""
+    for statement in (
+        "CREATE INDEX IF NOT EXISTS ix_temporal_annotations_video_id ON temporal_annotations (video_id)",
+        "CREATE INDEX IF NOT EXISTS ix_bbox_annotations_video_frame ON bbox_annotations (video_id, frame_index)",
+        "CREATE INDEX IF NOT EXISTS ix_videos_project_id ON videos (project_id)",
+        "CREATE INDEX IF NOT EXISTS ix_videos_status ON videos (status)",
+        "CREATE INDEX IF NOT EXISTS ix_videos_catalog_path ON videos (catalog_path)",
+        "CREATE INDEX IF NOT EXISTS ix_videos_content_hash ON videos (content_hash)",
+        "CREATE INDEX IF NOT EXISTS ix_videos_storage_path ON videos (storage_path)",
+    ):
+        conn.execute(text(statement))
+
+
+def _index_listing_filters(conn):
+    """Indexes for the /videos filters; each also orders by video_id (the rowid) for keyset paging."""
+    for statement in (
+        "CREATE INDEX IF NOT EXISTS ix_videos_filename ON videos (filename)",
+        "CREATE INDEX IF NOT EXISTS ix_videos_is_completed ON videos (is_completed)",
+        "CREATE INDEX IF NOT EXISTS ix_videos_source_type ON videos (source_type)",
+        "CREATE INDEX IF NOT EXISTS ix_videos_catalog_dataset_id ON videos (catalog_dataset_id)",
+    ):
+        conn.execute(text(statement))
+
+
+# Schema versions, tracked in PRAGMA user_version. Append only; never edit a released step.
+MIGRATIONS = [
+    (1, "add columns introduced after the initial schema", _add_missing_columns),
+    (2, "index hot lookup columns", _create_hot_indexes),
+    (3, "per-video annotation counters and project rollups", _add_annotation_counters),
+    (4, "index video listing filters", _index_listing_filters),
+]
+
+
+def run_migrations(eng):
+    """Apply each migration newer than the database's user_version, once, in its own transaction."""
     with eng.connect() as conn:
-        for table, column, col_type in migrations:
-            try:
-                conn.execute(
-                    __import__("sqlalchemy").text(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
-                )
-                conn.commit()
-            except Exception:
-                pass  # Column already exists
+        version = conn.execute(text("PRAGMA user_version")).scalar()
+    applied = False
+    for number, description, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        with eng.begin() as conn:
+            migrate(conn)
+            conn.execute(text(f"PRAGMA user_version = {number}"))
+        logger.info("Applied migration %d: %s", number, description)
+        applied = True
+    if applied:
+        # New indexes have no statistics yet
+        with eng.begin() as conn:
+            conn.execute(text("ANALYZE"))
 
 
 def get_db():
@@ -44,3 +205,74 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    """Session on the read-only pool, for routes that never write."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def maintain(truncate: bool = False) -> dict:
+    """Checkpoint the WAL into the main file and refresh planner statistics.
+
+    A passive checkpoint copies what it can without waiting on readers;
+    ``truncate`` waits for them (up to the busy timeout) and empties the WAL.
+    """
+    mode = "TRUNCATE" if truncate else "PASSIVE"
+    with engine.connect() as conn:
+        busy, log_frames, checkpointed = conn.execute(text(f"PRAGMA wal_checkpoint({mode})")).one()
+        # 0x10002: analyze any table whose statistics are missing or stale
+        conn.execute(text("PRAGMA optimize=0x10002"))
+        conn.commit()
+    return {"busy": bool(busy), "wal_frames": log_frames, "checkpointed": checkpointed}
+
+
+class _Maintenance:
+    def __init__(self, interval: int):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="db-maintenance", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                result = maintain()
+                if result["busy"] or result["checkpointed"] < result["wal_frames"]:
+                    logger.info("WAL checkpoint incomplete (%d of %d frames); readers still active",
+                                result["checkpointed"], result["wal_frames"])
+            except Exception as e:
+                logger.error("Database maintenance failed: %s", e)
+
+
+def start_maintenance():
+    """Checkpoint and optimize every ``sqlite_maintenance_interval`` seconds in the background."""
+    global _maintenance
+    if settings.sqlite_maintenance_interval > 0 and _maintenance is None:
+        _maintenance = _Maintenance(settings.sqlite_maintenance_interval)
+        _maintenance.start()
+
+
+def close_db():
+    """Stop maintenance, fold the WAL back into the database file and close every pooled connection."""
+    global _maintenance
+    if _maintenance:
+        _maintenance.stop()
+        _maintenance = None
+    if engine is None:
+        return
+    read_engine.dispose()
+    try:
+        maintain(truncate=True)
+    except Exception as e:
+        logger.warning("Final WAL checkpoint failed: %s", e)
+    engine.dispose()
@@ -9,7 +9,13 @@ from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 
 from .config import settings
-from .database import init_db, engine
+from .database import init_db, start_maintenance, close_db
+from .services import hls
+from .services.decoder_pool import decoder_pool
+from .services.ingest import create_watcher
+from .services.pipeline import pipeline
+from .services.uploads import collect_stale_sessions
+from .services.transcode import scheduler as transcode_scheduler
 
 
 @asynccontextmanager
@@ -21,10 +27,22 @@ async def lifespan(app: FastAPI):
     os.makedirs(settings.transcode_cache, exist_ok=True)
     os.makedirs(os.path.dirname(settings.database_url.replace("sqlite:///", "")), exist_ok=True)
     init_db(settings.database_url)
+    start_maintenance()
+    decoder_pool.start_reaper()
+    pipeline.resume()
+    collect_stale_sessions(force=True)
+    ingest_watcher = create_watcher()
+    if ingest_watcher:
+        ingest_watcher.start()
     yield
     # Shutdown
-    if engine:
-        engine.dispose()
+    if ingest_watcher:
+        ingest_watcher.stop()
+    decoder_pool.close_all()
+    pipeline.shutdown()
+    transcode_scheduler.shutdown()
+    hls.shutdown()
+    close_db()
 
 
 app = FastAPI(title="Label Software", lifespan=lifespan)
@@ -39,9 +57,10 @@ app.add_middleware(
 )
 
 # Register routers
-from .routers import videos, annotations, projects, export, review, images, progress, catalog
+from .routers import videos, uploads, annotations, projects, export, review, images, progress, catalog
 
 app.include_router(videos.router, prefix="/api")
+app.include_router(uploads.router, prefix="/api")
 app.include_router(annotations.router, prefix="/api")
 app.include_router(projects.router, prefix="/api/projects")
 app.include_router(export.router, prefix="/api")
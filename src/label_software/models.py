@@ -2,7 +2,7 @@ from .database import Base
 from datetime import datetime
 import enum
 
-from sqlalchemy import Integer, String, Float, Boolean, DateTime, Date, Enum, JSON, ForeignKey, Text
+from sqlalchemy import Integer, String, Float, Boolean, DateTime, Date, Enum, JSON, ForeignKey, Text, Index, UniqueConstraint
 from sqlalchemy.orm import mapped_column, relationship
 
 
@@ -33,6 +33,11 @@ class Project(Base):
     catalog_dataset_id = mapped_column(Integer, nullable=True)
     catalog_dataset_name = mapped_column(String(200), nullable=True)
 
+    # Rollups of the videos' annotation counters (services/counters.py)
+    annotated_videos = mapped_column(Integer, default=0, nullable=False)
+    temporal_count = mapped_column(Integer, default=0, nullable=False)
+    bbox_count = mapped_column(Integer, default=0, nullable=False)
+
     videos = relationship('Video', back_populates='project')
 
     def get_progress_percentage(self):
@@ -58,6 +63,7 @@ class Project(Base):
             data.update({
                 'total_videos': self.total_videos,
                 'completed_videos': self.completed_videos,
+                'annotated_videos': self.annotated_videos,
                 'progress_percentage': self.get_progress_percentage(),
             })
         return data
@@ -70,29 +76,46 @@ class Video(Base):
     __tablename__ = 'videos'
 
     video_id = mapped_column(Integer, primary_key=True)
-    filename = mapped_column(String(255))
+    filename = mapped_column(String(255), index=True)
     resolution = mapped_column(String(50))
     framerate = mapped_column(Float)
     duration = mapped_column(Float)
     import_date = mapped_column(DateTime, default=datetime.utcnow)
     normalization_settings = mapped_column(JSON)
-    status = mapped_column(String(20), nullable=True, default='pending')
-    is_completed = mapped_column(Boolean, default=False, nullable=False)
+    status = mapped_column(String(20), nullable=True, default='pending', index=True)
+    is_completed = mapped_column(Boolean, default=False, nullable=False, index=True)
 
-    project_id = mapped_column(Integer, ForeignKey('projects.project_id'))
+    project_id = mapped_column(Integer, ForeignKey('projects.project_id'), index=True)
     project = relationship('Project', back_populates='videos')
 
     # Catalog integration
-    source_type = mapped_column(String(20), default='upload', nullable=False)
-    catalog_path = mapped_column(Text, nullable=True)
-    catalog_dataset_id = mapped_column(Integer, nullable=True)
+    source_type = mapped_column(String(20), default='upload', nullable=False, index=True)
+    catalog_path = mapped_column(Text, nullable=True, index=True)
+    catalog_dataset_id = mapped_column(Integer, nullable=True, index=True)
+
+    probe_id = mapped_column(Integer, ForeignKey('media_probes.probe_id'), nullable=True)
+    probe = relationship('MediaProbe')
+
+    # Content-addressed uploads: blob location relative to the upload folder (absolute for hot-folder ingests)
+    content_hash = mapped_column(String(64), nullable=True, index=True)
+    storage_path = mapped_column(Text, nullable=True, index=True)
+
+    # Post-upload pipeline: pending -> processing -> ready | failed
+    processing_status = mapped_column(String(20), default='ready', nullable=False)
+    processing_error = mapped_column(Text, nullable=True)
+
+    # Maintained on annotation writes (services/counters.py)
+    temporal_count = mapped_column(Integer, default=0, nullable=False)
+    bbox_count = mapped_column(Integer, default=0, nullable=False)
+    last_annotated_at = mapped_column(DateTime, nullable=True)
+    annotators = mapped_column(JSON, default=list)
 
 
 class TemporalAnnotation(Base):
     __tablename__ = 'temporal_annotations'
 
     annotation_id = mapped_column(Integer, primary_key=True)
-    video_id = mapped_column(Integer, ForeignKey('videos.video_id'), nullable=False)
+    video_id = mapped_column(Integer, ForeignKey('videos.video_id'), nullable=False, index=True)
     frame_index = mapped_column(Integer, nullable=True)      # single-frame annotation
     start_time = mapped_column(Float, nullable=True)          # range annotation
     end_time = mapped_column(Float, nullable=True)
@@ -105,6 +128,7 @@ class TemporalAnnotation(Base):
 
 class BoundingBoxAnnotation(Base):
     __tablename__ = 'bbox_annotations'
+    __table_args__ = (Index('ix_bbox_annotations_video_frame', 'video_id', 'frame_index'),)
 
     bbox_id = mapped_column(Integer, primary_key=True)
     video_id = mapped_column(Integer, ForeignKey('videos.video_id'))
@@ -116,3 +140,95 @@ class BoundingBoxAnnotation(Base):
     part_label = mapped_column(String(50))
     annotator_name = mapped_column(String(100))
     created_at = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class MediaProbe(Base):
+    """Codec/container facts for one version (size + mtime) of a media file."""
+    __tablename__ = 'media_probes'
+
+    probe_id = mapped_column(Integer, primary_key=True)
+    path = mapped_column(Text, nullable=False, unique=True)
+    size = mapped_column(Integer, nullable=False)
+    mtime_ns = mapped_column(Integer, nullable=False)
+    container = mapped_column(String(100))
+    video_codec = mapped_column(String(50))
+    audio_codec = mapped_column(String(50))
+    pix_fmt = mapped_column(String(50))
+    width = mapped_column(Integer)
+    height = mapped_column(Integer)
+    frame_count = mapped_column(Integer)
+    avg_frame_rate = mapped_column(Float)
+    r_frame_rate = mapped_column(Float)
+    duration = mapped_column(Float)
+    bit_rate = mapped_column(Integer)
+    gop_size = mapped_column(Integer)
+    transcode_plan = mapped_column(JSON)
+    probed_at = mapped_column(DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'probe_id': self.probe_id,
+            'path': self.path,
+            'size': self.size,
+            'mtime_ns': self.mtime_ns,
+            'container': self.container,
+            'video_codec': self.video_codec,
+            'audio_codec': self.audio_codec,
+            'pix_fmt': self.pix_fmt,
+            'width': self.width,
+            'height': self.height,
+            'frame_count': self.frame_count,
+            'avg_frame_rate': self.avg_frame_rate,
+            'r_frame_rate': self.r_frame_rate,
+            'duration': self.duration,
+            'bit_rate': self.bit_rate,
+            'gop_size': self.gop_size,
+            'transcode_plan': self.transcode_plan,
+            'probed_at': self.probed_at.isoformat() if self.probed_at else None,
+        }
+
+
+class CatalogFile(Base):
+    """One video file under a catalog dataset's primary path (local index of the filesystem)."""
+    __tablename__ = 'catalog_files'
+    __table_args__ = (
+        UniqueConstraint('dataset_id', 'path'),
+        Index('ix_catalog_files_dataset_relpath', 'dataset_id', 'relative_path'),
+        Index('ix_catalog_files_dataset_filename', 'dataset_id', 'filename'),
+        Index('ix_catalog_files_dataset_directory', 'dataset_id', 'directory'),
+        Index('ix_catalog_files_dataset_size', 'dataset_id', 'size'),
+        Index('ix_catalog_files_dataset_mtime', 'dataset_id', 'mtime_ns'),
+    )
+
+    file_id = mapped_column(Integer, primary_key=True)
+    dataset_id = mapped_column(Integer, nullable=False)
+    path = mapped_column(Text, nullable=False)
+    relative_path = mapped_column(Text, nullable=False)
+    directory = mapped_column(Text, nullable=False)
+    filename = mapped_column(Text, nullable=False)
+    extension = mapped_column(String(10))
+    size = mapped_column(Integer)
+    mtime_ns = mapped_column(Integer)
+
+
+class CatalogDir(Base):
+    """A scanned directory; an unchanged mtime means its entry list is still current."""
+    __tablename__ = 'catalog_dirs'
+    __table_args__ = (UniqueConstraint('dataset_id', 'path'),)
+
+    dir_id = mapped_column(Integer, primary_key=True)
+    dataset_id = mapped_column(Integer, nullable=False)
+    path = mapped_column(Text, nullable=False)
+    parent = mapped_column(Text)
+    mtime_ns = mapped_column(Integer)
+    scanned_at = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class IdempotencyKey(Base):
+    """Stored response of a bulk write, replayed when a client retries with the same key."""
+    __tablename__ = 'idempotency_keys'
+
+    key = mapped_column(String(128), primary_key=True)
+    request_hash = mapped_column(String(64), nullable=False)
+    response = mapped_column(JSON, nullable=False)
+    created_at = mapped_column(DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -1,21 +1,22 @@
 """Annotation routes: temporal annotations and bounding boxes."""
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from sqlalchemy.orm import Session
 import logging
 
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..models import TemporalAnnotation, BoundingBoxAnnotation
-from ..schemas import AnnotationCreate, BboxAnnotationCreate
-from ..services.annotation import get_annotations, save_annotation
-from ..services.bounding_box import save_bbox_annotation
+from ..schemas import AnnotationCreate, BboxAnnotationCreate, BulkAnnotationRequest
+from ..services import bulk_annotations
+from ..services.annotation import get_annotations, remove_annotation, save_annotation
+from ..services.bounding_box import remove_bbox_annotation, save_bbox_annotation
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
 @router.get("/annotations/{video_id}")
-def get_video_annotations(video_id: int, db: Session = Depends(get_db)):
+def get_video_annotations(video_id: int, db: Session = Depends(get_read_db)):
     return get_annotations(db, video_id)
 
 
@@ -35,13 +36,35 @@ def create_annotation(body: AnnotationCreate, db: Session = Depends(get_db)):
         raise HTTPException(500, detail=str(e))
 
 
+@router.post("/annotations/bulk")
+def bulk_annotations_write(
+    body: BulkAnnotationRequest,
+    response: Response,
+    idempotency_key: str | None = Header(default=None, max_length=128),
+    db: Session = Depends(get_db),
+):
+    """Apply temporal and bbox creates, updates and deletes in one transaction.
+
+    The whole batch is validated first; any invalid operation rejects it
+    with a 422 listing every error by ``op`` and ``index``. New ids are
+    returned in request order. A retry with the same ``Idempotency-Key``
+    header replays the stored response instead of writing again.
+    """
+    try:
+        result, replayed = bulk_annotations.apply(db, body, idempotency_key)
+    except bulk_annotations.BulkError as e:
+        raise HTTPException(e.status, detail={'message': str(e), 'errors': e.errors})
+    if replayed:
+        response.headers['Idempotent-Replayed'] = 'true'
+    return result
+
+
 @router.delete("/annotations/{annotation_id}")
 def delete_annotation(annotation_id: int, db: Session = Depends(get_db)):
     annotation = db.get(TemporalAnnotation, annotation_id)
     if not annotation:
         raise HTTPException(404, detail="Annotation not found")
-    db.delete(annotation)
-    db.commit()
+    remove_annotation(db, annotation)
     return {'status': 'deleted'}
 
 
@@ -57,7 +80,7 @@ def create_bbox_annotation(body: BboxAnnotationCreate, db: Session = Depends(get
 
 
 @router.get("/bbox-annotations/{video_id}")
-def get_bbox_annotations(video_id: int, db: Session = Depends(get_db)):
+def get_bbox_annotations(video_id: int, db: Session = Depends(get_read_db)):
     bboxes = db.query(BoundingBoxAnnotation).filter_by(video_id=video_id).all()
     return [{
         'bbox_id': b.bbox_id, 'video_id': b.video_id, 'frame_index': b.frame_index,
@@ -72,6 +95,5 @@ def delete_bbox_get(bbox_id: int, db: Session = Depends(get_db)):
     if not bbox:
         raise HTTPException(404, detail="Bounding box not found")
     video_id = bbox.video_id
-    db.delete(bbox)
-    db.commit()
+    remove_bbox_annotation(db, bbox)
     return {'status': 'success', 'bbox_id': bbox_id, 'video_id': video_id}
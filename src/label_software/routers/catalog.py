@@ -1,15 +1,13 @@
 """Catalog browsing, import, and publish endpoints."""
 
-import os
-from datetime import datetime
-
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from ..database import get_db
-from ..models import Video, Project
+from ..models import Project
 from ..schemas import CatalogImportRequest, CatalogPublishRequest
 from ..services import catalog as catalog_svc
+from ..services import catalog_import
 from ..services.catalog_export import publish_to_catalog
 
 router = APIRouter()
@@ -29,8 +27,26 @@ def get_catalog_dataset(dataset_id: int):
 
 
 @router.get("/catalog/datasets/{dataset_id}/videos")
-def list_catalog_dataset_videos(dataset_id: int, page: int = 1, per_page: int = 50):
-    return catalog_svc.list_dataset_videos(dataset_id, page=page, per_page=per_page)
+def list_catalog_dataset_videos(
+    dataset_id: int,
+    page: int = 1,
+    per_page: int = 50,
+    sort: str = "path",
+    order: str = "asc",
+    search: str | None = None,
+):
+    if sort not in ("path", "name", "size", "mtime") or order not in ("asc", "desc"):
+        raise HTTPException(400, "sort must be path, name, size or mtime; order asc or desc")
+    return catalog_svc.list_dataset_videos(dataset_id, page=page, per_page=per_page,
+                                           sort=sort, order=order, search=search)
+
+
+@router.post("/catalog/datasets/{dataset_id}/refresh")
+def refresh_catalog_dataset_index(dataset_id: int):
+    """Re-check the dataset's directories now instead of waiting for the index TTL."""
+    if not catalog_svc.refresh_dataset_index(dataset_id):
+        raise HTTPException(404, "Dataset has no accessible primary path")
+    return {"scanning": True}
 
 
 @router.get("/catalog/annotations/{dataset_id}")
@@ -38,79 +54,38 @@ def list_catalog_annotations(dataset_id: int):
     return catalog_svc.list_annotations(dataset_id)
 
 
-@router.post("/catalog/import")
+@router.post("/catalog/import", status_code=202)
 def import_from_catalog(req: CatalogImportRequest, db: Session = Depends(get_db)):
-    # Validate project exists
-    project = db.query(Project).get(req.project_id)
+    """Start a background import; poll GET /catalog/import/{job_id} for progress."""
+    project = db.get(Project, req.project_id)
     if not project:
         raise HTTPException(404, "Project not found")
 
-    # Validate dataset exists in catalog
     ds = catalog_svc.get_dataset(req.dataset_id)
     if not ds:
         raise HTTPException(404, "Dataset not found in catalog")
 
-    # Determine which files to import
-    if req.import_all:
-        result = catalog_svc.list_dataset_videos(req.dataset_id, page=1, per_page=100_000)
-        video_files = result["videos"]
-    elif req.video_paths:
-        video_files = [{"filename": os.path.basename(p), "path": p} for p in req.video_paths]
-    else:
+    if not req.import_all and not req.video_paths:
         raise HTTPException(400, "Provide video_paths or set import_all=true")
 
-    # Create Video records by reference (no file copy)
-    imported = 0
-    for vf in video_files:
-        abs_path = vf["path"]
-        if not os.path.isfile(abs_path):
-            continue
-
-        # Skip if already imported (same catalog_path in this project)
-        existing = db.query(Video).filter_by(
-            catalog_path=abs_path, project_id=req.project_id
-        ).first()
-        if existing:
-            continue
-
-        video = Video(
-            filename=vf["filename"],
-            source_type="catalog",
-            catalog_path=abs_path,
-            catalog_dataset_id=req.dataset_id,
-            project_id=req.project_id,
-            status="pending",
-        )
-
-        # Optional eager metadata extraction
-        if req.extract_metadata:
-            try:
-                from ..services.video_processing import extract_metadata
-                meta = extract_metadata(abs_path)
-                video.resolution = meta.get("resolution", "unknown")
-                video.framerate = meta.get("framerate", 0)
-                video.duration = meta.get("duration", 0)
-            except Exception:
-                pass
-
-        db.add(video)
-        imported += 1
-
-    # Update project
-    project.catalog_dataset_id = req.dataset_id
-    project.catalog_dataset_name = ds["name"]
-    project.total_videos = db.query(Video).filter_by(project_id=req.project_id).count() + imported
-    project.last_activity = datetime.utcnow()
-
-    db.commit()
-
-    return {
-        "success": True,
-        "imported": imported,
-        "skipped": len(video_files) - imported,
-        "dataset_name": ds["name"],
-        "project_id": req.project_id,
-    }
+    # Video records are created by reference (no file copy) on a background job
+    return catalog_import.start_import(
+        req.project_id, req.dataset_id, ds["name"], req.video_paths,
+        import_all=req.import_all, extract_metadata=req.extract_metadata,
+    )
+
+
+@router.get("/catalog/import/{job_id}")
+def get_catalog_import(job_id: str):
+    job = catalog_import.get_job(job_id)
+    if not job:
+        raise HTTPException(404, "Import job not found")
+    return job
+
+
+@router.get("/catalog/imports")
+def list_catalog_imports(project_id: int | None = None):
+    return catalog_import.list_jobs(project_id)
 
 
 @router.post("/catalog/publish/{project_id}")
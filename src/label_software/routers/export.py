@@ -1,109 +1,61 @@
-"""Export routes: JSON, CSV, ML dataset."""
+"""Export routes: JSON, JSON Lines, CSV, ML dataset."""
 
 import io
-import csv
 import json
 import random
 import zipfile
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import case, func, select
 from sqlalchemy.orm import Session
 
-from ..database import get_db
+from ..database import get_read_db
 from ..models import Video, TemporalAnnotation, BoundingBoxAnnotation
 from ..schemas import ExportRequest, MLDatasetRequest
+from ..services import export as export_svc
 
 router = APIRouter()
 
 
 @router.get("/export")
-def export_annotations_get(db: Session = Depends(get_db)):
-    temporal = db.query(TemporalAnnotation).all()
-    bboxes = db.query(BoundingBoxAnnotation).all()
-    return {
-        'temporal_annotations': [{
-            'annotation_id': a.annotation_id, 'video_id': a.video_id,
-            'start_time': a.start_time, 'end_time': a.end_time,
-            'start_frame': a.start_frame, 'end_frame': a.end_frame,
-            'label': a.label, 'annotator_name': a.annotator_name, 'frame_index': a.frame_index,
-        } for a in temporal],
-        'bounding_box_annotations': [{
-            'bbox_id': b.bbox_id, 'video_id': b.video_id,
-            'frame_index': b.frame_index, 'x': b.x, 'y': b.y,
-            'width': b.width, 'height': b.height,
-            'part_label': b.part_label, 'annotator_name': b.annotator_name,
-        } for b in bboxes],
-    }
+def export_annotations_get():
+    return StreamingResponse(export_svc.stream_tables(), media_type="application/json")
 
 
 @router.get("/export/stats")
-def get_export_stats(db: Session = Depends(get_db)):
+def get_export_stats(db: Session = Depends(get_read_db)):
+    falls = select(func.count()).select_from(TemporalAnnotation).where(TemporalAnnotation.label == 'Fall')
+    row = db.execute(select(
+        func.count(case((Video.status == 'confirmed', 1))),
+        func.count(),
+        falls.scalar_subquery(),
+        func.coalesce(func.sum(Video.temporal_count), 0),
+        func.coalesce(func.sum(Video.bbox_count), 0),
+    ).select_from(Video)).one()
     return {
-        'confirmedVideos': db.query(Video).filter_by(status='confirmed').count(),
-        'totalVideos': db.query(Video).count(),
-        'fallEvents': db.query(TemporalAnnotation).filter_by(label='Fall').count(),
-        'totalAnnotations': db.query(TemporalAnnotation).count(),
-        'boundingBoxes': db.query(BoundingBoxAnnotation).count(),
+        'confirmedVideos': row[0],
+        'totalVideos': row[1],
+        'fallEvents': row[2],
+        'totalAnnotations': row[3],
+        'boundingBoxes': row[4],
     }
 
 
 @router.post("/export")
-def export_data(body: ExportRequest, db: Session = Depends(get_db)):
-    video_query = db.query(Video)
-    if body.options.get('onlyConfirmed', True):
-        video_query = video_query.filter_by(status='confirmed')
-    videos = video_query.all()
-
-    if body.format == 'json':
-        export = []
-        for video in videos:
-            vd = {
-                'video_id': video.video_id, 'filename': video.filename,
-                'resolution': video.resolution, 'framerate': video.framerate,
-                'duration': video.duration, 'status': video.status,
-                'temporal_annotations': [{
-                    'label': a.label, 'frame_index': a.frame_index,
-                    'start_time': a.start_time, 'end_time': a.end_time,
-                    'start_frame': a.start_frame, 'end_frame': a.end_frame, 'annotator_name': a.annotator_name,
-                } for a in db.query(TemporalAnnotation).filter_by(video_id=video.video_id).all()],
-                'bounding_box_annotations': [{
-                    'frame_index': b.frame_index, 'x': b.x, 'y': b.y,
-                    'width': b.width, 'height': b.height,
-                    'part_label': b.part_label, 'annotator_name': b.annotator_name,
-                } for b in db.query(BoundingBoxAnnotation).filter_by(video_id=video.video_id).all()],
-            }
-            export.append(vd)
-        return export
-
-    elif body.format == 'csv':
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['video_id', 'filename', 'resolution', 'framerate', 'duration',
-                         'annotation_type', 'label', 'start_time', 'end_time',
-                         'start_frame', 'end_frame', 'frame_index', 'x', 'y',
-                         'width', 'height', 'part_label', 'annotator_name'])
-        for video in videos:
-            for a in db.query(TemporalAnnotation).filter_by(video_id=video.video_id).all():
-                writer.writerow([video.video_id, video.filename, video.resolution,
-                                 video.framerate, video.duration, 'temporal',
-                                 a.label, a.start_time, a.end_time, a.start_frame, a.end_frame,
-                                 '', '', '', '', '', '', a.annotator_name])
-            for b in db.query(BoundingBoxAnnotation).filter_by(video_id=video.video_id).all():
-                writer.writerow([video.video_id, video.filename, video.resolution,
-                                 video.framerate, video.duration, 'bounding_box',
-                                 '', '', '', '', '', b.frame_index, b.x, b.y,
-                                 b.width, b.height, b.part_label, b.annotator_name])
-        output.seek(0)
-        return Response(content=output.getvalue(), media_type="text/csv",
-                        headers={"Content-Disposition": "attachment; filename=export.csv"})
-    else:
+def export_data(body: ExportRequest):
+    if body.format not in export_svc.FORMATS:
         raise HTTPException(501, detail=f"{body.format} format export not yet implemented")
+    headers = {}
+    if body.format != 'json':
+        headers["Content-Disposition"] = f"attachment; filename=export.{body.format}"
+    return StreamingResponse(export_svc.stream_export(body.format, body.options.get('onlyConfirmed', True)),
+                             media_type=export_svc.FORMATS[body.format], headers=headers)
 
 
 @router.post("/export/ml-dataset")
-def export_ml_dataset(body: MLDatasetRequest, db: Session = Depends(get_db)):
+def export_ml_dataset(body: MLDatasetRequest, db: Session = Depends(get_read_db)):
     ml_options = body.mlOptions
     videos = list(db.query(Video).filter_by(status='confirmed').all())
     split_ratio = ml_options.get('splitRatio', {'train': 0.7, 'val': 0.15, 'test': 0.15})
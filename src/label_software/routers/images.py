@@ -9,7 +9,7 @@ from fastapi import APIRouter
 from fastapi.responses import Response
 
 from ..config import settings
-from ..services.video_processing import extract_video_frame
+from ..services.video_processing import extract_video_frame, frame_cache_stats
 
 router = APIRouter()
 
@@ -31,3 +31,9 @@ def serve_frame(video_filename: str, frame_number: int):
     cv2.putText(img, "No frame", (30, 65), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
     _, buffer = cv2.imencode('.jpg', img)
     return Response(content=buffer.tobytes(), media_type="image/jpeg")
+
+
+@router.get("/thumbnail-cache/stats")
+def get_thumbnail_cache_stats():
+    """Size, budget and hit/miss counters for the on-disk frame cache."""
+    return frame_cache_stats()
@@ -3,20 +3,20 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
-from ..database import get_db
-from ..models import Video, TemporalAnnotation, BoundingBoxAnnotation
+from ..database import get_read_db
+from ..models import Video
 
 router = APIRouter()
 
 
 @router.get("/progress/{project_id}")
-def get_project_progress(project_id: int, db: Session = Depends(get_db)):
-    videos = db.query(Video).filter_by(project_id=project_id).all()
+def get_project_progress(project_id: int, db: Session = Depends(get_read_db)):
+    videos = (db.query(Video.video_id, Video.filename, Video.is_completed, Video.temporal_count, Video.bbox_count)
+              .filter_by(project_id=project_id).all())
     progress = {'total': len(videos), 'completed': 0, 'in_progress': 0, 'not_started': 0, 'videos': []}
 
     for video in videos:
-        t_count = db.query(TemporalAnnotation).filter_by(video_id=video.video_id).count()
-        b_count = db.query(BoundingBoxAnnotation).filter_by(video_id=video.video_id).count()
+        t_count, b_count = video.temporal_count, video.bbox_count
 
         if video.is_completed:
             status = 'completed'
@@ -2,19 +2,21 @@
 
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 import logging
 
-from ..database import get_db
-from ..models import Project, ProjectStatus, Video, TemporalAnnotation, BoundingBoxAnnotation
+from ..database import get_db, get_read_db
+from ..models import Project, ProjectStatus, Video
 from ..schemas import ProjectCreate, ProjectUpdate, AssignVideosRequest, StatusUpdateRequest
+from ..services import counters
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
 @router.get("")
-def get_projects(include_archived: str = "false", db: Session = Depends(get_db)):
+def get_projects(include_archived: str = "false", db: Session = Depends(get_read_db)):
     query = db.query(Project)
     if include_archived.lower() != 'true':
         query = query.filter(Project.status != ProjectStatus.ARCHIVED)
@@ -49,7 +51,7 @@ def create_project(body: ProjectCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/{project_id}")
-def get_project(project_id: int, db: Session = Depends(get_db)):
+def get_project(project_id: int, db: Session = Depends(get_read_db)):
     project = db.get(Project, project_id)
     if not project:
         raise HTTPException(404, detail="Project not found")
@@ -107,13 +109,16 @@ def assign_videos_to_project(project_id: int, body: AssignVideosRequest, db: Ses
         raise HTTPException(400, detail="video_ids array is required")
 
     count = 0
+    affected = {project_id}
     for vid in body.video_ids:
         video = db.get(Video, vid)
         if video:
+            affected.add(video.project_id)
             video.project_id = project_id
             count += 1
 
-    project.total_videos = db.query(Video).filter_by(project_id=project_id).count()
+    # Annotation rollups move with the videos
+    counters.refresh_projects(db, affected)
     project.last_activity = datetime.utcnow()
     db.commit()
     return {'message': f'{count} videos assigned', 'assigned_count': count}
@@ -135,54 +140,40 @@ def update_project_status(project_id: int, body: StatusUpdateRequest, db: Sessio
 
 
 @router.get("/{project_id}/stats")
-def get_project_statistics(project_id: int, db: Session = Depends(get_db)):
+def get_project_statistics(project_id: int, db: Session = Depends(get_read_db)):
     project = db.get(Project, project_id)
     if not project:
         raise HTTPException(404, detail="Project not found")
 
-    videos = db.query(Video).filter_by(project_id=project_id).all()
-    video_ids = [v.video_id for v in videos]
-
-    t_count = db.query(TemporalAnnotation).filter(TemporalAnnotation.video_id.in_(video_ids)).count() if video_ids else 0
-    b_count = db.query(BoundingBoxAnnotation).filter(BoundingBoxAnnotation.video_id.in_(video_ids)).count() if video_ids else 0
-    completed = sum(1 for v in videos if v.is_completed)
-
     return {
-        'total_videos': len(videos),
-        'completed_videos': completed,
-        'total_temporal_annotations': t_count,
-        'total_bbox_annotations': b_count,
-        'completion_percentage': round((completed / len(videos)) * 100, 1) if videos else 0,
+        'total_videos': project.total_videos,
+        'completed_videos': project.completed_videos,
+        'annotated_videos': project.annotated_videos,
+        'total_temporal_annotations': project.temporal_count,
+        'total_bbox_annotations': project.bbox_count,
+        'completion_percentage': project.get_progress_percentage(),
     }
 
 
 @router.get("/{project_id}/datasets")
-def list_project_datasets(project_id: int, db: Session = Depends(get_db)):
+def list_project_datasets(project_id: int, db: Session = Depends(get_read_db)):
     """List distinct catalog datasets linked to this project via its videos."""
     project = db.get(Project, project_id)
     if not project:
         raise HTTPException(404, detail="Project not found")
 
-    # Group videos by catalog_dataset_id
-    videos = db.query(Video).filter_by(project_id=project_id).filter(Video.catalog_dataset_id.isnot(None)).all()
-    datasets = {}
-    for v in videos:
-        ds_id = v.catalog_dataset_id
-        if ds_id not in datasets:
-            datasets[ds_id] = {'dataset_id': ds_id, 'video_count': 0, 'has_annotations': False}
-        datasets[ds_id]['video_count'] += 1
-        # Check for annotations on this video
-        t = db.query(TemporalAnnotation).filter_by(video_id=v.video_id).count()
-        b = db.query(BoundingBoxAnnotation).filter_by(video_id=v.video_id).count()
-        if t > 0 or b > 0:
-            datasets[ds_id]['has_annotations'] = True
+    rows = (db.query(Video.catalog_dataset_id, func.count(), func.max(Video.temporal_count + Video.bbox_count))
+            .filter(Video.project_id == project_id, Video.catalog_dataset_id.isnot(None))
+            .group_by(Video.catalog_dataset_id).all())
+    datasets = {ds_id: {'dataset_id': ds_id, 'video_count': n, 'has_annotations': bool(most)}
+                for ds_id, n, most in rows}
 
     # Enrich with catalog names
     try:
         from ..services import catalog as catalog_svc
+        found = catalog_svc.get_datasets(datasets.keys())
         for ds_id, info in datasets.items():
-            ds = catalog_svc.get_dataset(ds_id)
-            info['dataset_name'] = ds['name'] if ds else f'Dataset {ds_id}'
+            info['dataset_name'] = found[ds_id]['name'] if ds_id in found else f'Dataset {ds_id}'
     except Exception:
         for ds_id, info in datasets.items():
             info['dataset_name'] = f'Dataset {ds_id}'
@@ -202,12 +193,7 @@ def unlink_dataset(project_id: int, dataset_id: int, db: Session = Depends(get_d
         raise HTTPException(404, detail="No videos from this dataset in the project")
 
     # Safety check — refuse if any video has annotations
-    annotated = []
-    for v in videos:
-        t = db.query(TemporalAnnotation).filter_by(video_id=v.video_id).count()
-        b = db.query(BoundingBoxAnnotation).filter_by(video_id=v.video_id).count()
-        if t > 0 or b > 0:
-            annotated.append(v.filename)
+    annotated = [v.filename for v in videos if v.temporal_count or v.bbox_count]
 
     if annotated:
         raise HTTPException(400, detail=f"Cannot unlink: {len(annotated)} video(s) have annotations. Delete annotations first.")
@@ -218,7 +204,7 @@ def unlink_dataset(project_id: int, dataset_id: int, db: Session = Depends(get_d
         db.delete(v)
 
     # Update project metadata
-    project.total_videos = db.query(Video).filter_by(project_id=project_id).count() - count
+    counters.refresh_projects(db, [project_id])
     remaining = db.query(Video).filter_by(project_id=project_id).filter(Video.catalog_dataset_id != dataset_id).first()
     if not remaining:
         project.catalog_dataset_id = None
@@ -1,37 +1,107 @@
 """Review routes."""
 
+from collections import defaultdict
+
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import or_, update
 from sqlalchemy.orm import Session
 
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..models import Video, TemporalAnnotation, BoundingBoxAnnotation
 
 router = APIRouter()
 
+MAX_REVIEW_PAGE = 200
+
+
+def _by_video(rows) -> dict[int, list]:
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[row.video_id].append(row)
+    return grouped
+
 
 @router.get("/review")
-def get_review_data(db: Session = Depends(get_db)):
-    videos = db.query(Video).all()
-    review_data = []
-    for video in videos:
-        temporal = db.query(TemporalAnnotation).filter_by(video_id=video.video_id).all()
-        bboxes = db.query(BoundingBoxAnnotation).filter_by(video_id=video.video_id).all()
-        review_data.append({
+def get_review_data(
+    project_id: int | None = None,
+    status: str | None = None,
+    label: str | None = None,
+    annotator: str | None = None,
+    after: int | None = None,
+    limit: int = 50,
+    db: Session = Depends(get_read_db),
+):
+    """One page of videos with their annotations, ordered by video id.
+
+    Pass the previous page's ``next_cursor`` as ``after`` to continue;
+    ``label`` matches a temporal label or a box part label.
+    """
+    if not 1 <= limit <= MAX_REVIEW_PAGE:
+        raise HTTPException(400, detail=f"limit must be between 1 and {MAX_REVIEW_PAGE}")
+
+    query = db.query(Video.video_id, Video.filename, Video.resolution, Video.framerate,
+                     Video.duration, Video.status, Video.project_id)
+    if project_id is not None:
+        query = query.filter(Video.project_id == project_id)
+    if status == 'pending':
+        query = query.filter(or_(Video.status == 'pending', Video.status.is_(None)))
+    elif status:
+        query = query.filter(Video.status == status)
+    if label:
+        query = query.filter(or_(
+            db.query(TemporalAnnotation.annotation_id).filter(TemporalAnnotation.video_id == Video.video_id,
+                                                              TemporalAnnotation.label == label).exists(),
+            db.query(BoundingBoxAnnotation.bbox_id).filter(BoundingBoxAnnotation.video_id == Video.video_id,
+                                                           BoundingBoxAnnotation.part_label == label).exists(),
+        ))
+    if annotator:
+        query = query.filter(or_(
+            db.query(TemporalAnnotation.annotation_id).filter(TemporalAnnotation.video_id == Video.video_id,
+                                                              TemporalAnnotation.annotator_name == annotator).exists(),
+            db.query(BoundingBoxAnnotation.bbox_id).filter(BoundingBoxAnnotation.video_id == Video.video_id,
+                                                           BoundingBoxAnnotation.annotator_name == annotator).exists(),
+        ))
+    if after is not None:
+        query = query.filter(Video.video_id > after)
+    # One extra row tells us whether another page exists
+    videos = query.order_by(Video.video_id).limit(limit + 1).all()
+    has_more = len(videos) > limit
+    videos = videos[:limit]
+
+    # One query per annotation type for the whole page
+    ids = [v.video_id for v in videos]
+    temporal = _by_video(db.query(
+        TemporalAnnotation.video_id, TemporalAnnotation.annotation_id, TemporalAnnotation.start_time,
+        TemporalAnnotation.end_time, TemporalAnnotation.start_frame, TemporalAnnotation.end_frame,
+        TemporalAnnotation.frame_index, TemporalAnnotation.label, TemporalAnnotation.annotator_name,
+    ).filter(TemporalAnnotation.video_id.in_(ids)).order_by(TemporalAnnotation.annotation_id)) if ids else {}
+    bboxes = _by_video(db.query(
+        BoundingBoxAnnotation.video_id, BoundingBoxAnnotation.bbox_id, BoundingBoxAnnotation.frame_index,
+        BoundingBoxAnnotation.x, BoundingBoxAnnotation.y, BoundingBoxAnnotation.width,
+        BoundingBoxAnnotation.height, BoundingBoxAnnotation.part_label, BoundingBoxAnnotation.annotator_name,
+    ).filter(BoundingBoxAnnotation.video_id.in_(ids)).order_by(BoundingBoxAnnotation.bbox_id)) if ids else {}
+
+    return {
+        'videos': [{
             'video_id': video.video_id, 'filename': video.filename,
             'resolution': video.resolution, 'framerate': video.framerate,
             'duration': video.duration, 'status': video.status or 'pending',
+            'project_id': video.project_id,
             'annotations': [{
                 'annotation_id': a.annotation_id, 'start_time': a.start_time,
                 'end_time': a.end_time, 'start_frame': a.start_frame,
-                'end_frame': a.end_frame, 'label': a.label,
-            } for a in temporal],
+                'end_frame': a.end_frame, 'frame_index': a.frame_index,
+                'label': a.label, 'annotator_name': a.annotator_name,
+            } for a in temporal.get(video.video_id, [])],
             'bboxAnnotations': [{
                 'bbox_id': b.bbox_id, 'frame_index': b.frame_index,
                 'x': b.x, 'y': b.y, 'width': b.width, 'height': b.height,
-                'part_label': b.part_label,
-            } for b in bboxes],
-        })
-    return review_data
+                'part_label': b.part_label, 'annotator_name': b.annotator_name,
+            } for b in bboxes.get(video.video_id, [])],
+        } for video in videos],
+        'next_cursor': videos[-1].video_id if has_more else None,
+        'limit': limit,
+    }
 
 
 @router.post("/videos/{video_id}/confirm")
@@ -45,9 +115,12 @@ def confirm_video(video_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/review/complete")
-def complete_review(db: Session = Depends(get_db)):
-    pending = db.query(Video).filter_by(status='pending').all()
-    for v in pending:
-        v.status = 'confirmed'
+def complete_review(project_id: int | None = None, db: Session = Depends(get_db)):
+    """Confirm every pending video (in one project, if given) with a single UPDATE."""
+    statement = update(Video).where(Video.status == 'pending')
+    if project_id is not None:
+        statement = statement.where(Video.project_id == project_id)
+    confirmed = db.execute(statement.values(status='confirmed'),
+                           execution_options={'synchronize_session': False}).rowcount
     db.commit()
-    return {'status': 'success', 'confirmed_count': len(pending)}
+    return {'status': 'success', 'confirmed_count': confirmed}
@@ -0,0 +1,94 @@
+"""Resumable chunked upload routes: create a session, PUT chunks, finalize."""
+
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from anyio import from_thread
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from werkzeug.utils import secure_filename
+
+from ..config import settings
+from ..database import get_db
+from ..models import Project
+from ..schemas import UploadSessionCreate
+from ..services import uploads
+from ..services.blob_store import store_file
+from ..services.pipeline import register_uploads
+from ..services.video_processing import allowed_file
+
+router = APIRouter()
+
+
+def _session_or_error(call, *args):
+    try:
+        return call(*args)
+    except uploads.UploadError as e:
+        raise HTTPException(e.status, detail=str(e))
+
+
+@router.post("/uploads", status_code=201)
+def create_upload(body: UploadSessionCreate, db: Session = Depends(get_db)):
+    if not allowed_file(body.filename):
+        raise HTTPException(400, detail="Invalid file type")
+    if body.project_id is not None and not db.get(Project, body.project_id):
+        raise HTTPException(404, detail=f"Project {body.project_id} not found")
+    session = _session_or_error(uploads.create_session, body.filename, body.size, body.chunk_size, body.project_id)
+    return uploads.describe(session)
+
+
+@router.get("/uploads/{upload_id}")
+def get_upload(upload_id: str):
+    """Received byte ranges and missing chunk indexes, for resuming after a dropped connection."""
+    return uploads.describe(_session_or_error(uploads.load_session, upload_id))
+
+
+def _pieces(stream):
+    """Iterate an async request stream from a worker thread, one piece at a time."""
+    while True:
+        try:
+            yield from_thread.run(stream.__anext__)
+        except StopAsyncIteration:
+            return
+
+
+@router.put("/uploads/{upload_id}/chunks/{index}")
+async def put_chunk(upload_id: str, index: int, request: Request):
+    """Write one chunk at its offset as it streams in; an ``X-Chunk-SHA256`` header is verified if sent."""
+    session = await run_in_threadpool(
+        _session_or_error, uploads.write_chunk, upload_id, index, _pieces(request.stream()),
+        request.headers.get("x-chunk-sha256"),
+    )
+    return {'index': index, 'sha256': session['checksums'][str(index)],
+            'received_ranges': uploads.received_ranges(session)}
+
+
+@router.post("/uploads/{upload_id}/complete")
+def complete_upload(upload_id: str, db: Session = Depends(get_db)):
+    """Store and register a fully received upload. Safe to retry: the session keeps the outcome."""
+    incoming = os.path.join(settings.blob_dir, f"incoming.{upload_id}.part")
+    session = _session_or_error(uploads.finalize, upload_id, incoming)
+    if session.get('result') is not None:
+        return session['result']
+    try:
+        project = db.get(Project, session['project_id']) if session.get('project_id') is not None else None
+        filename = secure_filename(session['filename'])
+        blob = session.get('blob')
+        if blob is None:
+            # Chunks arrive out of order, so the content hash needs one read pass here
+            blob = store_file(incoming, filename)
+            uploads.record(upload_id, blob=blob)
+        video = register_uploads(db, [blob], project)[0]
+        result = {'filename': filename, 'status': 'success', 'duplicate': blob['duplicate'],
+                  'video_id': video.video_id, 'content_hash': video.content_hash,
+                  'processing_status': video.processing_status}
+        uploads.record(upload_id, result=result)
+    finally:
+        uploads.release(upload_id)
+    return result
+
+
+@router.delete("/uploads/{upload_id}")
+def abort_upload(upload_id: str):
+    _session_or_error(uploads.abort, upload_id)
+    return {'message': 'Upload aborted'}
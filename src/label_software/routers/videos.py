@@ -1,29 +1,44 @@
 """Video management routes: upload, list, complete, file serving, thumbnails."""
 
 import io
+import json
 import os
+import threading
+import time
 from urllib.parse import unquote
 
 import cv2
 import numpy as np
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import FileResponse, Response
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from sqlalchemy import func, update
 from sqlalchemy.orm import Session
 from werkzeug.utils import secure_filename
 
 from ..config import settings
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..models import Video, Project
-from ..services.video_processing import extract_metadata, ensure_browser_compatible, extract_video_frame
-from datetime import datetime
+from ..services.frame_index import get_frame_index
+from ..services.pipeline import register_uploads
+from ..services.probe import get_probe, probe_video
+from ..services import hls
+from ..services.blob_store import store_stream
+from ..services.transcode import get_playable_path, transcode_status
+from ..services.video_processing import (
+    allowed_file, extract_video_frame, extract_video_frames, find_upload_path, resolve_video_path,
+)
 
 router = APIRouter()
 
-ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'wmv', 'mkv'}
+MAX_BATCH_FRAMES = 300
+MAX_FRAME_SIZE = 1920  # pixels, per tile side
+MAX_SPRITE_PIXELS = 50_000_000  # ~150 MB of RGB for the assembled sprite
+MAX_VIDEO_PAGE = 1000
+VIDEO_TOTAL_TTL = 30  # seconds a listing total is reused
 
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+_totals: dict[tuple, tuple[float, int]] = {}
+_totals_lock = threading.Lock()
+MULTIPART_BOUNDARY = "frame-boundary"
 
 
 @router.post("/upload")
@@ -41,73 +56,138 @@ def upload_video(
         if not project:
             raise HTTPException(404, detail=f"Project {project_id} not found")
 
-    upload_folder = settings.upload_folder
-    os.makedirs(upload_folder, exist_ok=True)
-
-    results = []
+    results, stored = [], []
     for file in files:
         if file and file.filename and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(upload_folder, filename)
-
-            with open(filepath, "wb") as f:
-                import shutil
-                shutil.copyfileobj(file.file, f)
-
-            web_filename = ensure_browser_compatible(filename, upload_folder)
-
-            try:
-                metadata = extract_metadata(filepath)
-            except Exception:
-                metadata = {'resolution': 'unknown', 'width': 0, 'height': 0, 'framerate': 0, 'duration': 0}
-
-            video = Video(
-                filename=web_filename,
-                resolution=metadata.get('resolution', 'unknown'),
-                framerate=metadata.get('framerate', 0),
-                duration=metadata.get('duration', 0),
-                project_id=project_id,
-            )
-            db.add(video)
-
-            if project:
-                project.total_videos = db.query(Video).filter_by(project_id=project_id).count() + 1
-                project.last_activity = datetime.utcnow()
-
-            results.append({'filename': web_filename, 'status': 'success', 'metadata': metadata})
+            # Hashed while written; identical bytes resolve to the existing blob
+            blob = store_stream(file.file, secure_filename(file.filename))
+            result = {'filename': blob['filename'], 'status': 'success', 'duplicate': blob['duplicate']}
+            results.append(result)
+            stored.append(blob)
         else:
             results.append({'filename': getattr(file, 'filename', 'unknown'), 'status': 'error', 'message': 'Invalid file type'})
 
-    db.commit()
+    # Probing and transcoding happen off the request; clients poll /videos/processing-status
+    videos = register_uploads(db, stored, project)
+    for result, video in zip((r for r in results if r['status'] == 'success'), videos):
+        result.update(video_id=video.video_id, content_hash=video.content_hash,
+                      processing_status=video.processing_status)
     return {'uploaded': results}
 
 
+@router.get("/videos/processing-status")
+def processing_status(ids: str | None = None, project_id: int | None = None, db: Session = Depends(get_read_db)):
+    """Pipeline state for the given comma-separated video ids, or a project's unfinished videos."""
+    query = db.query(Video.video_id, Video.filename, Video.processing_status, Video.processing_error)
+    if ids:
+        try:
+            id_list = [int(i) for i in ids.split(',') if i.strip()]
+        except ValueError:
+            raise HTTPException(400, detail="ids must be comma-separated integers")
+        query = query.filter(Video.video_id.in_(id_list))
+    elif project_id is not None:
+        query = query.filter(Video.project_id == project_id, Video.processing_status != 'ready')
+    else:
+        raise HTTPException(400, detail="Provide ids or project_id")
+
+    videos = [{
+        'video_id': v.video_id, 'filename': v.filename,
+        'processing_status': v.processing_status, 'processing_error': v.processing_error,
+    } for v in query]
+    pending = sum(v['processing_status'] in ('pending', 'processing') for v in videos)
+    response = {'videos': videos, 'pending': pending}
+    if pending:
+        response['retry_after'] = settings.transcode_retry_after
+    return response
+
+
 @router.get("/videos")
 def list_videos(
     project_id: int | None = None,
-    page: int = 1,
+    status: str | None = None,
+    completed: bool | None = None,
+    source_type: str | None = None,
+    catalog_dataset_id: int | None = None,
+    filename_prefix: str | None = None,
+    unassigned: bool = False,
+    after: int | None = None,
     per_page: int = 50,
-    db: Session = Depends(get_db),
+    include_total: bool = False,
+    db: Session = Depends(get_read_db),
 ):
-    query = db.query(Video)
-    if project_id:
-        query = query.filter_by(project_id=project_id)
-
-    total = query.count()
-    videos = query.offset((page - 1) * per_page).limit(per_page).all()
-    return {
+    """One keyset page of videos ordered by id; pass ``next_cursor`` back as ``after``.
+
+    ``unassigned`` lists videos without a project; it can't be combined with
+    ``project_id``. ``total`` is only computed when asked for, and is cached briefly.
+    """
+    if not 1 <= per_page <= MAX_VIDEO_PAGE:
+        raise HTTPException(400, detail=f"per_page must be between 1 and {MAX_VIDEO_PAGE}")
+    if unassigned and project_id is not None:
+        raise HTTPException(400, detail="unassigned and project_id are mutually exclusive")
+
+    filters = []
+    if unassigned:
+        filters.append(Video.project_id.is_(None))
+    elif project_id is not None:
+        filters.append(Video.project_id == project_id)
+    if status:
+        filters.append(Video.status == status)
+    if completed is not None:
+        filters.append(Video.is_completed == completed)
+    if source_type:
+        filters.append(Video.source_type == source_type)
+    if catalog_dataset_id is not None:
+        filters.append(Video.catalog_dataset_id == catalog_dataset_id)
+    if filename_prefix:
+        # A range instead of LIKE, so the filename index applies
+        filters.extend([Video.filename >= filename_prefix, Video.filename < filename_prefix + '\U0010ffff'])
+
+    query = db.query(Video).filter(*filters)
+    if after is not None:
+        query = query.filter(Video.video_id > after)
+    videos = query.order_by(Video.video_id).limit(per_page + 1).all()
+    has_more = len(videos) > per_page
+    videos = videos[:per_page]
+
+    response = {
         'videos': [{
             'video_id': v.video_id, 'filename': v.filename,
             'resolution': v.resolution, 'framerate': v.framerate,
             'duration': v.duration, 'status': v.status,
             'is_completed': v.is_completed, 'project_id': v.project_id,
             'source_type': v.source_type, 'catalog_path': v.catalog_path,
+            'processing_status': v.processing_status,
         } for v in videos],
-        'total': total,
-        'page': page,
+        'next_cursor': videos[-1].video_id if has_more else None,
         'per_page': per_page,
-        'total_pages': (total + per_page - 1) // per_page,
     }
+    if include_total:
+        key = (project_id, status, completed, source_type, catalog_dataset_id, filename_prefix, unassigned)
+        project_only = project_id is not None and len(filters) == 1
+        response['total'] = _video_total(db, key, filters, project_id if project_only else None)
+    return response
+
+
+def _video_total(db: Session, key: tuple, filters: list, project_id: int | None = None) -> int:
+    """Count for a filter combination, reused for ``VIDEO_TOTAL_TTL`` seconds.
+
+    A listing filtered only by project (``project_id`` given) reads the
+    project's maintained ``total_videos`` instead of counting.
+    """
+    now = time.monotonic()
+    with _totals_lock:
+        cached = _totals.get(key)
+        if cached and now - cached[0] < VIDEO_TOTAL_TTL:
+            return cached[1]
+    if project_id is not None:
+        total = db.query(Project.total_videos).filter(Project.project_id == project_id).scalar() or 0
+    else:
+        total = db.query(func.count(Video.video_id)).filter(*filters).scalar()
+    with _totals_lock:
+        if len(_totals) > 1000:
+            _totals.clear()
+        _totals[key] = (now, total)
+    return total
 
 
 @router.post("/videos/{video_id}/complete")
@@ -115,6 +195,9 @@ def mark_video_complete(video_id: int, db: Session = Depends(get_db)):
     video = db.get(Video, video_id)
     if not video:
         raise HTTPException(404, detail="Video not found")
+    if not video.is_completed and video.project_id is not None:
+        db.execute(update(Project).where(Project.project_id == video.project_id)
+                   .values(completed_videos=Project.completed_videos + 1))
     video.is_completed = True
     video.status = 'completed'
     db.commit()
@@ -122,38 +205,94 @@ def mark_video_complete(video_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/video-file/{video_id}")
-def serve_video_file(video_id: int, db: Session = Depends(get_db)):
+def serve_video_file(video_id: int, db: Session = Depends(get_read_db)):
     """Unified video serving -- resolves path from DB, handles catalog + upload videos."""
     video = db.get(Video, video_id)
     if not video:
         raise HTTPException(404, detail="Video not found")
 
-    if video.source_type == "catalog" and video.catalog_path:
-        video_path = video.catalog_path
-    else:
-        video_path = os.path.join(settings.upload_folder, video.filename)
+    video_path = resolve_video_path(video)
 
     if not os.path.isfile(video_path):
         raise HTTPException(404, detail=f"Video file not found: {video.filename}")
 
-    # Transcode if needed (AVI, MKV, etc.)
-    from ..services.transcode import get_playable_path
-    playable_path = get_playable_path(video_path)
+    # Files that need converting (AVI, MKV, etc.) are streamed as lazily encoded HLS
+    # segments; a whole-file transcode would only compete with them for cores
+    playable_path = get_playable_path(video_path, queue=False)
+    if playable_path is None:
+        return JSONResponse(
+            {'status': 'streaming', 'video_id': video_id, 'hls_url': f'/api/video-hls/{video_id}/index.m3u8'},
+            status_code=202,
+        )
 
     return FileResponse(playable_path, media_type="video/mp4")
 
 
+@router.get("/video-file/{video_id}/status")
+def get_video_file_status(video_id: int, db: Session = Depends(get_read_db)):
+    """Whether the video can be served yet, or is still being transcoded."""
+    video = db.get(Video, video_id)
+    if not video:
+        raise HTTPException(404, detail="Video not found")
+
+    video_path = resolve_video_path(video)
+    if not os.path.isfile(video_path):
+        raise HTTPException(404, detail=f"Video file not found: {video.filename}")
+
+    info = get_probe(video_path)
+    return {
+        'video_id': video_id,
+        **transcode_status(video_path),
+        'transcode_plan': info.get('transcode_plan') if info else None,
+    }
+
+
+@router.get("/video-hls/{video_id}/index.m3u8")
+def get_hls_playlist(video_id: int, db: Session = Depends(get_db)):
+    """Segmented playback that starts before (or instead of) a full transcode."""
+    video = db.get(Video, video_id)
+    if not video:
+        raise HTTPException(404, detail="Video not found")
+
+    video_path = resolve_video_path(video)
+    if not os.path.isfile(video_path):
+        raise HTTPException(404, detail=f"Video file not found: {video.filename}")
+
+    if not video.duration:
+        probe_video(video, video_path)
+        db.commit()
+    if not video.duration:
+        raise HTTPException(422, detail="Could not determine video duration")
+
+    return Response(content=hls.build_playlist(video.duration), media_type="application/vnd.apple.mpegurl")
+
+
+@router.get("/video-hls/{video_id}/seg_{segment}.ts")
+def get_hls_segment(video_id: int, segment: int, db: Session = Depends(get_read_db)):
+    video = db.get(Video, video_id)
+    if not video:
+        raise HTTPException(404, detail="Video not found")
+
+    video_path = resolve_video_path(video)
+    if not os.path.isfile(video_path):
+        raise HTTPException(404, detail=f"Video file not found: {video.filename}")
+    if segment < 0 or (video.duration and segment >= hls.segment_count(video.duration)):
+        raise HTTPException(404, detail="Segment out of range")
+
+    segment_path = hls.get_segment(video_path, segment)
+    if not segment_path:
+        raise HTTPException(500, detail="Segment transcode failed")
+    return FileResponse(segment_path, media_type="video/mp2t")
+
+
 @router.get("/video-thumbnail/{video_id}/{frame_number}")
-def get_video_thumbnail(video_id: int, frame_number: int, db: Session = Depends(get_db)):
+def get_video_thumbnail(video_id: int, frame_number: int, db: Session = Depends(get_read_db)):
     """Thumbnail extraction using video_id (works for both catalog and upload videos)."""
     video = db.get(Video, video_id)
     if not video:
         raise HTTPException(404, detail="Video not found")
 
-    if video.source_type == "catalog" and video.catalog_path:
-        video_path = video.catalog_path
-    else:
-        video_path = os.path.join(settings.upload_folder, video.filename)
+    video_path = resolve_video_path(video)
 
     if os.path.isfile(video_path):
         thumbnail_path = extract_video_frame(
@@ -171,9 +310,167 @@ def get_video_thumbnail(video_id: int, frame_number: int, db: Session = Depends(
     return Response(content=buffer.tobytes(), media_type="image/jpeg")
 
 
+@router.get("/video-frames/{video_id}")
+def get_video_frames(
+    video_id: int,
+    frames: str | None = None,
+    start: int | None = None,
+    end: int | None = None,
+    step: int = 1,
+    width: int = 160,
+    height: int = 120,
+    format: str = "sprite",
+    columns: int = 10,
+    db: Session = Depends(get_read_db),
+):
+    """Extract many frames in one request and one forward decode pass.
+
+    Frames are given either as a comma-separated ``frames`` list or as a
+    ``start``/``end`` (exclusive)/``step`` range. ``format=sprite`` returns a
+    single JPEG grid: the requested frames in ascending order fill it row by
+    row, so frame ``i`` of that order sits at ``(i % columns, i // columns)``.
+    The ``X-Frame-Layout`` header gives the tile size and column count, and
+    ``X-Missing-Tiles`` the positions in that order left blank (as ranges like
+    ``30-41,57``); both stay small enough for proxy header buffers. ``format=multipart``
+    streams each frame as its own ``image/jpeg`` part.
+    """
+    video = db.get(Video, video_id)
+    if not video:
+        raise HTTPException(404, detail="Video not found")
+
+    if frames:
+        try:
+            frame_numbers = sorted({int(f) for f in frames.split(',') if f.strip()})
+        except ValueError:
+            raise HTTPException(400, detail="frames must be a comma-separated list of integers")
+    elif start is not None and end is not None:
+        if step < 1:
+            raise HTTPException(400, detail="step must be positive")
+        # Size the range before materializing it
+        frame_numbers = range(max(start, 0), end, step)
+    else:
+        raise HTTPException(400, detail="Provide frames or start + end")
+
+    if not frame_numbers:
+        raise HTTPException(400, detail="No frames requested")
+    if len(frame_numbers) > MAX_BATCH_FRAMES:
+        raise HTTPException(400, detail=f"At most {MAX_BATCH_FRAMES} frames per request")
+    frame_numbers = list(frame_numbers)
+    if format not in ("sprite", "multipart"):
+        raise HTTPException(400, detail="format must be 'sprite' or 'multipart'")
+    if not (1 <= width <= MAX_FRAME_SIZE and 1 <= height <= MAX_FRAME_SIZE):
+        raise HTTPException(400, detail=f"width and height must be between 1 and {MAX_FRAME_SIZE}")
+    if format == "sprite" and len(frame_numbers) * width * height > MAX_SPRITE_PIXELS:
+        raise HTTPException(400, detail="Sprite too large; request fewer or smaller frames, or format=multipart")
+
+    video_path = resolve_video_path(video)
+    if not os.path.isfile(video_path):
+        raise HTTPException(404, detail=f"Video file not found: {video.filename}")
+
+    output_size = (width, height)
+    extracted = extract_video_frames(video_path, frame_numbers, settings.thumbnail_cache, output_size)
+
+    if format == "multipart":
+        def iter_parts():
+            for n in frame_numbers:
+                path = extracted.get(n)
+                if not path:
+                    continue
+                try:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                except OSError:
+                    continue  # evicted since extraction
+                yield (
+                    f"--{MULTIPART_BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                    f"X-Frame-Number: {n}\r\nContent-Length: {len(data)}\r\n\r\n"
+                ).encode() + data + b"\r\n"
+            yield f"--{MULTIPART_BOUNDARY}--\r\n".encode()
+
+        return StreamingResponse(
+            iter_parts(), media_type=f"multipart/mixed; boundary={MULTIPART_BOUNDARY}",
+        )
+
+    columns = max(1, min(columns, len(frame_numbers)))
+    rows = (len(frame_numbers) + columns - 1) // columns
+    sprite = np.zeros((rows * height, columns * width, 3), dtype=np.uint8)
+    missing = []
+    for i, n in enumerate(frame_numbers):
+        path = extracted.get(n)
+        tile = cv2.imread(path) if path else None
+        if tile is None:
+            missing.append(i)
+            continue
+        x, y = (i % columns) * width, (i // columns) * height
+        sprite[y:y + height, x:x + width] = tile
+
+    _, buffer = cv2.imencode('.jpg', sprite, [cv2.IMWRITE_JPEG_QUALITY, settings.thumbnail_quality])
+    layout = {'tile_width': width, 'tile_height': height, 'columns': columns, 'count': len(frame_numbers)}
+    return Response(
+        content=buffer.tobytes(), media_type="image/jpeg",
+        headers={"X-Frame-Layout": json.dumps(layout, separators=(',', ':')),
+                 "X-Missing-Tiles": _ranges(missing)},
+    )
+
+
+def _ranges(numbers: list[int]) -> str:
+    """Sorted integers as compact ranges: ``[1, 2, 3, 7]`` -> ``"1-3,7"``."""
+    runs = []
+    for n in numbers:
+        if runs and n == runs[-1][1] + 1:
+            runs[-1][1] = n
+        else:
+            runs.append([n, n])
+    return ','.join(str(a) if a == b else f"{a}-{b}" for a, b in runs)
+
+
+@router.get("/videos/{video_id}/frame-index")
+def get_video_frame_index(
+    video_id: int,
+    frame: int | None = None,
+    time: float | None = None,
+    db: Session = Depends(get_read_db),
+):
+    """Frame <-> presentation time mapping from the video's packet index.
+
+    Pass ``frame`` to get its timestamp or ``time`` (seconds) to get the frame
+    on screen at that moment. Builds the index on first use.
+    """
+    video = db.get(Video, video_id)
+    if not video:
+        raise HTTPException(404, detail="Video not found")
+
+    video_path = resolve_video_path(video)
+    if not os.path.isfile(video_path):
+        raise HTTPException(404, detail=f"Video file not found: {video.filename}")
+
+    index = get_frame_index(video_path, build=True)
+    if index is None:
+        raise HTTPException(422, detail="Could not build a frame index for this video")
+
+    result = {
+        'video_id': video_id,
+        'frame_count': index.frame_count,
+        'keyframe_count': len(index.keyframes),
+        'duration': index.duration,
+        'is_vfr': index.is_vfr,
+    }
+    if time is not None:
+        frame = index.time_to_frame(time)
+    if frame is not None:
+        if not 0 <= frame < index.frame_count:
+            raise HTTPException(400, detail=f"frame must be between 0 and {index.frame_count - 1}")
+        result.update({
+            'frame': frame,
+            'time': index.frame_to_time(frame),
+            'keyframe': index.keyframe_before(frame),
+        })
+    return result
+
+
 @router.get("/static/{filename:path}")
 def serve_static(filename: str):
-    filepath = os.path.join(settings.upload_folder, filename)
+    filepath = find_upload_path(filename)
     if not os.path.isfile(filepath):
         raise HTTPException(404, detail="File not found")
     return FileResponse(filepath)
@@ -191,7 +488,7 @@ def serve_preview(filename: str):
 def get_thumbnail(video_filename: str, frame_number: int):
     try:
         video_filename = unquote(video_filename)
-        video_path = os.path.join(settings.upload_folder, video_filename)
+        video_path = find_upload_path(video_filename)
 
         if os.path.exists(video_path):
             thumbnail_path = extract_video_frame(
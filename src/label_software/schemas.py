@@ -23,6 +23,43 @@ class BboxAnnotationCreate(BaseModel):
     annotator_name: str | None = None
 
 
+class AnnotationUpdate(BaseModel):
+    annotation_id: int
+    label: str | None = None
+    frame_index: int | None = None
+    start_time: float | None = None
+    end_time: float | None = None
+    start_frame: int | None = None
+    end_frame: int | None = None
+
+
+class BboxAnnotationUpdate(BaseModel):
+    bbox_id: int
+    frame_index: int | None = None
+    x: float | None = None
+    y: float | None = None
+    width: float | None = None
+    height: float | None = None
+    part_label: str | None = None
+
+
+class TemporalOperations(BaseModel):
+    create: list[AnnotationCreate] = []
+    update: list[AnnotationUpdate] = []
+    delete: list[int] = []
+
+
+class BboxOperations(BaseModel):
+    create: list[BboxAnnotationCreate] = []
+    update: list[BboxAnnotationUpdate] = []
+    delete: list[int] = []
+
+
+class BulkAnnotationRequest(BaseModel):
+    temporal: TemporalOperations = TemporalOperations()
+    bbox: BboxOperations = BboxOperations()
+
+
 class ProjectCreate(BaseModel):
     name: str
     description: str | None = None
@@ -49,6 +86,13 @@ class StatusUpdateRequest(BaseModel):
     status: str
 
 
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int
+    chunk_size: int | None = None
+    project_id: int | None = None
+
+
 class ExportRequest(BaseModel):
     format: str = "json"
     options: dict = {}
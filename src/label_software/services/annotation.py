@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
 from ..models import TemporalAnnotation
+from . import counters
 
 
 def get_annotations(db: Session, video_id):
@@ -30,6 +31,9 @@ def save_annotation(db: Session, data, annotator_name=None):
         annotator_name=annotator_name,
     )
     db.add(annotation)
+    db.flush()
+    counters.adjust(db, annotation.video_id, temporal=1, annotated_at=annotation.created_at,
+                    added_by=[annotator_name])
     db.commit()
     db.refresh(annotation)
     return {
@@ -44,3 +48,10 @@ def save_annotation(db: Session, data, annotator_name=None):
         "annotator_name": annotation.annotator_name,
         "created_at": annotation.created_at.isoformat() if annotation.created_at else None,
     }
+
+
+def remove_annotation(db: Session, annotation: TemporalAnnotation):
+    db.delete(annotation)
+    db.flush()
+    counters.adjust(db, annotation.video_id, temporal=-1, removed_by=[annotation.annotator_name])
+    db.commit()
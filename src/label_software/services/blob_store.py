@@ -0,0 +1,63 @@
+"""Content-addressed storage for uploaded videos.
+
+Uploads are hashed (SHA-256) while they stream to disk and stored once under
+``settings.blob_dir/<ab>/<digest><ext>``. ``Video.storage_path`` points at
+the blob and ``Video.filename`` keeps the original name, so two different
+files with the same name never collide and a re-upload of the same bytes
+lands on the existing blob. Blobs are immutable, so every path-keyed cache
+(probes, frame indexes, thumbnails, transcodes) is shared by duplicates.
+"""
+
+import hashlib
+import os
+import threading
+
+from ..config import settings
+
+COPY_BUFFER = 1024 * 1024
+
+
+def blob_relpath(digest: str, ext: str) -> str:
+    """Blob location relative to the upload folder."""
+    return os.path.join(os.path.relpath(settings.blob_dir, settings.upload_folder), digest[:2], digest + ext.lower())
+
+
+def _commit(tmp_path: str, digest: str, ext: str) -> tuple[str, bool]:
+    relpath = blob_relpath(digest, ext)
+    path = os.path.join(settings.upload_folder, relpath)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+        return relpath, True
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp_path, path)
+    return relpath, False
+
+
+def store_stream(fileobj, filename: str) -> dict:
+    """Copy a file object into the store, hashing as it is written."""
+    os.makedirs(settings.blob_dir, exist_ok=True)
+    tmp_path = os.path.join(settings.blob_dir, f"incoming.{os.getpid()}.{threading.get_ident()}.part")
+    digest = hashlib.sha256()
+    try:
+        with open(tmp_path, "wb") as f:
+            while True:
+                block = fileobj.read(COPY_BUFFER)
+                if not block:
+                    break
+                digest.update(block)
+                f.write(block)
+        relpath, duplicate = _commit(tmp_path, digest.hexdigest(), os.path.splitext(filename)[1])
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return {'filename': filename, 'content_hash': digest.hexdigest(), 'storage_path': relpath, 'duplicate': duplicate}
+
+
+def store_file(path: str, filename: str) -> dict:
+    """Move a file already on the upload filesystem into the store (hashing it in one read pass)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(COPY_BUFFER), b""):
+            digest.update(block)
+    relpath, duplicate = _commit(path, digest.hexdigest(), os.path.splitext(filename)[1])
+    return {'filename': filename, 'content_hash': digest.hexdigest(), 'storage_path': relpath, 'duplicate': duplicate}
@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
 from ..models import BoundingBoxAnnotation
+from . import counters
 
 
 def get_bbox_annotations(db: Session, video_id):
@@ -30,6 +31,8 @@ def save_bbox_annotation(db: Session, data, annotator_name=None):
         annotator_name=annotator_name,
     )
     db.add(bbox)
+    db.flush()
+    counters.adjust(db, bbox.video_id, bbox=1, annotated_at=bbox.created_at, added_by=[annotator_name])
     db.commit()
     db.refresh(bbox)
     return {
@@ -38,3 +41,10 @@ def save_bbox_annotation(db: Session, data, annotator_name=None):
         'annotator_name': bbox.annotator_name,
         'created_at': bbox.created_at.isoformat() if bbox.created_at else None,
     }
+
+
+def remove_bbox_annotation(db: Session, bbox: BoundingBoxAnnotation):
+    db.delete(bbox)
+    db.flush()
+    counters.adjust(db, bbox.video_id, bbox=-1, removed_by=[bbox.annotator_name])
+    db.commit()
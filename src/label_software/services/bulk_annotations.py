@@ -0,0 +1,210 @@
+"""Bulk annotation writes.
+
+A batch of temporal and bounding-box creates, updates and deletes is
+validated as a whole and then applied in one transaction: one multi-row
+``INSERT ... RETURNING`` per annotation type (new ids come back in request
+order), bulk UPDATEs by primary key, one DELETE per type and one counter
+adjustment per touched video. Either every operation is applied or none is.
+With an idempotency key the response is stored in the same transaction and
+replayed when the client retries.
+"""
+
+import hashlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import BoundingBoxAnnotation, IdempotencyKey, TemporalAnnotation, Video
+from ..schemas import BulkAnnotationRequest
+from . import counters
+
+QUERY_BATCH = 500  # ids per IN (...) lookup
+
+# Columns read for rows that are updated or deleted
+TEMPORAL_FIELDS = ('video_id', 'annotator_name', 'label', 'frame_index',
+                   'start_time', 'end_time', 'start_frame', 'end_frame')
+BBOX_FIELDS = ('video_id', 'annotator_name', 'frame_index', 'x', 'y', 'width', 'height', 'part_label')
+BBOX_REQUIRED = ('frame_index', 'x', 'y', 'width', 'height', 'part_label')
+
+
+class BulkError(Exception):
+    """A rejected batch; ``errors`` lists the offending operations."""
+
+    def __init__(self, status: int, message: str, errors: list[dict] | None = None):
+        super().__init__(message)
+        self.status = status
+        self.errors = errors or []
+
+
+def _batched(ids):
+    ids = list(ids)
+    for i in range(0, len(ids), QUERY_BATCH):
+        yield ids[i:i + QUERY_BATCH]
+
+
+def _existing(db: Session, model, key, fields, ids) -> dict[int, dict]:
+    """``id -> current values`` for the rows that exist."""
+    found = {}
+    columns = [getattr(model, f) for f in fields]
+    for batch in _batched(set(ids)):
+        for row in db.execute(select(key, *columns).where(key.in_(batch))):
+            found[row[0]] = dict(zip(fields, row[1:]))
+    return found
+
+
+def _temporal_problems(values: dict) -> list[str]:
+    """Rule violations of a temporal annotation's resulting field values."""
+    problems = []
+    if values.get('label') is None:
+        problems.append("label must not be null")
+    start, end = values.get('start_frame'), values.get('end_frame')
+    if values.get('frame_index') is None and (start is None or end is None):
+        problems.append("Provide frame_index (single-frame) or start_frame + end_frame (range)")
+    if start is not None and end is not None and start > end:
+        problems.append("start_frame must not be after end_frame")
+    start_time, end_time = values.get('start_time'), values.get('end_time')
+    if start_time is not None and end_time is not None and start_time > end_time:
+        problems.append("start_time must not be after end_time")
+    return problems
+
+
+def _bbox_problems(values: dict) -> list[str]:
+    """Rule violations of a bounding box's resulting field values."""
+    problems = [f"{field} must not be null" for field in BBOX_REQUIRED if values.get(field) is None]
+    if any(values.get(f) is not None and values[f] <= 0 for f in ('width', 'height')):
+        problems.append("width and height must be positive")
+    return problems
+
+
+def _validate(db: Session, request: BulkAnnotationRequest):
+    errors = []
+
+    def error(op: str, index: int, message: str):
+        errors.append({'op': op, 'index': index, 'error': message})
+
+    video_ids = {c.video_id for c in request.temporal.create} | {c.video_id for c in request.bbox.create}
+    known_videos = set()
+    for batch in _batched(video_ids):
+        known_videos.update(db.scalars(select(Video.video_id).where(Video.video_id.in_(batch))))
+
+    existing = {}
+    for kind, ops, model, key, id_field, fields, problems in (
+        ('temporal', request.temporal, TemporalAnnotation, TemporalAnnotation.annotation_id, 'annotation_id',
+         TEMPORAL_FIELDS, _temporal_problems),
+        ('bbox', request.bbox, BoundingBoxAnnotation, BoundingBoxAnnotation.bbox_id, 'bbox_id',
+         BBOX_FIELDS, _bbox_problems),
+    ):
+        for i, c in enumerate(ops.create):
+            if c.video_id not in known_videos:
+                error(f'{kind}.create', i, f"Video {c.video_id} not found")
+            for problem in problems(c.model_dump()):
+                error(f'{kind}.create', i, problem)
+
+        updated = [getattr(u, id_field) for u in ops.update]
+        rows = _existing(db, model, key, fields, updated + ops.delete)
+        deleted = set()
+        for i, row_id in enumerate(ops.delete):
+            if row_id not in rows:
+                error(f'{kind}.delete', i, f"{id_field} {row_id} not found")
+            elif row_id in deleted:
+                error(f'{kind}.delete', i, f"{id_field} {row_id} is deleted twice")
+            deleted.add(row_id)
+        seen = set()
+        for i, u in enumerate(ops.update):
+            row_id = getattr(u, id_field)
+            if row_id not in rows:
+                error(f'{kind}.update', i, f"{id_field} {row_id} not found")
+            elif row_id in deleted:
+                error(f'{kind}.update', i, f"{id_field} {row_id} is also deleted in this batch")
+            elif row_id in seen:
+                error(f'{kind}.update', i, f"{id_field} {row_id} is updated twice")
+            else:
+                # Checked against the row as it will be after the update
+                merged = {**rows[row_id], **u.model_dump(exclude_unset=True, exclude={id_field})}
+                for problem in problems(merged):
+                    error(f'{kind}.update', i, problem)
+            seen.add(row_id)
+        existing[kind] = rows
+    return errors, existing
+
+
+def _fingerprint(request: BulkAnnotationRequest) -> str:
+    return hashlib.sha256(request.model_dump_json().encode()).hexdigest()
+
+
+def _replay(db: Session, key: str, fingerprint: str) -> dict | None:
+    stored = db.get(IdempotencyKey, key)
+    if stored is None:
+        return None
+    if stored.request_hash != fingerprint:
+        raise BulkError(422, "Idempotency-Key was already used for a different request")
+    return stored.response
+
+
+def apply(db: Session, request: BulkAnnotationRequest, idempotency_key: str | None = None) -> tuple[dict, bool]:
+    """Validate and apply a batch; returns ``(response, replayed)``."""
+    fingerprint = _fingerprint(request)
+    if idempotency_key:
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.idempotency_ttl)
+        db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff))
+        stored = _replay(db, idempotency_key, fingerprint)
+        if stored is not None:
+            db.commit()
+            return stored, True
+
+    errors, existing = _validate(db, request)
+    if errors:
+        db.rollback()
+        raise BulkError(422, f"{len(errors)} invalid operation(s); nothing was applied", errors)
+
+    now = datetime.utcnow()
+    deltas = defaultdict(lambda: {'temporal': 0, 'bbox': 0, 'added_by': set(), 'removed_by': set()})
+    response = {}
+    for kind, ops, model, key, id_field in (
+        ('temporal', request.temporal, TemporalAnnotation, TemporalAnnotation.annotation_id, 'annotation_id'),
+        ('bbox', request.bbox, BoundingBoxAnnotation, BoundingBoxAnnotation.bbox_id, 'bbox_id'),
+    ):
+        created = []
+        if ops.create:
+            rows = [{**c.model_dump(), 'created_at': now} for c in ops.create]
+            created = list(db.scalars(insert(model).returning(key, sort_by_parameter_order=True), rows))
+            for c in ops.create:
+                deltas[c.video_id][kind] += 1
+                deltas[c.video_id]['added_by'].add(c.annotator_name)
+
+        changes = [{id_field: getattr(u, id_field), **u.model_dump(exclude_unset=True, exclude={id_field})}
+                   for u in ops.update]
+        changes = [c for c in changes if len(c) > 1]
+        if changes:
+            db.execute(update(model), changes)
+
+        for batch in _batched(ops.delete):
+            db.execute(delete(model).where(key.in_(batch)))
+        for row_id in ops.delete:
+            row = existing[kind][row_id]
+            deltas[row['video_id']][kind] -= 1
+            deltas[row['video_id']]['removed_by'].add(row['annotator_name'])
+
+        response[kind] = {'created': created, 'updated': len(ops.update), 'deleted': len(ops.delete)}
+
+    for video_id, d in deltas.items():
+        counters.adjust(db, video_id, temporal=d['temporal'], bbox=d['bbox'],
+                        annotated_at=now if d['added_by'] else None,
+                        added_by=d['added_by'], removed_by=d['removed_by'])
+
+    if idempotency_key:
+        db.add(IdempotencyKey(key=idempotency_key, request_hash=fingerprint, response=response, created_at=now))
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent retry with the same key committed first
+        db.rollback()
+        stored = _replay(db, idempotency_key, fingerprint) if idempotency_key else None
+        if stored is None:
+            raise
+        return stored, True
+    return response, False
@@ -1,20 +1,98 @@
-"""Read-only access to the Data-Catalog database."""
+"""Read-only access to the Data-Catalog database.
 
+Each thread keeps one read-only connection open instead of reopening the
+file on shared storage per call, and lookups are cached until the catalog
+file (or its WAL) changes.
+"""
+
+import copy
 import os
 import sqlite3
+import threading
+import time
+from urllib.parse import quote
+
 from ..config import settings
+from .catalog_index import ensure_index, query_files
 
-VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.wmv'}
 NON_ANNOTATABLE_FORMATS = {'zip', 'csv', 'dcm', 'npy', 'fls', 'fpc', 'fls/fpc'}
+FIRST_PAGE_WAIT = 5  # seconds a browse waits for the first results of a brand-new index
+SIGNATURE_CHECK_INTERVAL = 2.0  # seconds between stats of the catalog file
+
+_local = threading.local()
+_cache: dict[tuple, object] = {}
+_cache_lock = threading.Lock()
+_signature = None
+_generation = 0
+_checked_at = 0.0
+
+
+def _catalog_signature(path: str) -> tuple:
+    signature = []
+    for suffix in ('', '-wal'):
+        try:
+            st = os.stat(path + suffix)
+            signature.append((st.st_ino, st.st_size, st.st_mtime_ns))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def _check_signature():
+    """Drop cached results (and connections to a replaced file) once the catalog changes."""
+    global _signature, _generation, _checked_at
+    now = time.monotonic()
+    with _cache_lock:
+        if now - _checked_at < SIGNATURE_CHECK_INTERVAL:
+            return
+        _checked_at = now
+        signature = (settings.catalog_db_path, _catalog_signature(settings.catalog_db_path))
+        if signature != _signature:
+            _signature = signature
+            _generation += 1
+            _cache.clear()
+
+
+def invalidate_cache():
+    """Forget cached results now, e.g. after this process wrote to the catalog."""
+    global _checked_at
+    with _cache_lock:
+        _checked_at = 0.0
+    _check_signature()
+    with _cache_lock:
+        _cache.clear()
 
 
 def _get_catalog_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(settings.catalog_db_path)
+    _check_signature()
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.generation == _generation:
+        return conn
+    if conn is not None:
+        conn.close()
+    # Autocommit: never hold a read transaction open between calls and block catalog writers
+    conn = sqlite3.connect(f"file:{quote(settings.catalog_db_path)}?mode=ro", uri=True, isolation_level=None)
     conn.row_factory = sqlite3.Row
+    _local.conn, _local.generation = conn, _generation
     return conn
 
 
+def _cached(key: tuple, loader):
+    _check_signature()
+    with _cache_lock:
+        if key in _cache:
+            return copy.deepcopy(_cache[key])
+    value = loader()
+    with _cache_lock:
+        _cache[key] = value
+    return copy.deepcopy(value)
+
+
 def list_datasets(modality: str | None = None, domain: str | None = None) -> list[dict]:
+    return _cached(('datasets', modality, domain), lambda: _list_datasets(modality, domain))
+
+
+def _list_datasets(modality: str | None, domain: str | None) -> list[dict]:
     conn = _get_catalog_conn()
     query = """
         SELECT d.id, d.name, d.description, d.modality, d.domain,
@@ -36,37 +114,68 @@ def list_datasets(modality: str | None = None, domain: str | None = None) -> lis
     query += " ORDER BY d.name"
 
     rows = conn.execute(query, params).fetchall()
-    conn.close()
+    return [_dataset_summary(r) for r in rows]
+
+
+def _dataset_summary(r) -> dict:
+    fmt = (r["format"] or "").lower()
+    return {
+        "id": r["id"],
+        "name": r["name"],
+        "description": r["description"],
+        "modality": r["modality"],
+        "domain": r["domain"],
+        "num_samples": r["num_samples"],
+        "total_size_gb": round(r["total_size_bytes"] / (1024**3), 1) if r["total_size_bytes"] else None,
+        "format": r["format"],
+        "resolution": r["resolution"],
+        "fps": r["fps"],
+        "primary_path": r["primary_path"],
+        "is_annotatable": r["modality"] == "video" and fmt not in NON_ANNOTATABLE_FORMATS,
+    }
 
-    results = []
+
+def get_datasets(ids) -> dict[int, dict]:
+    """Summaries (as in ``list_datasets``, plus tags) for several datasets in one query."""
+    ids = sorted(set(ids))
+    if not ids:
+        return {}
+    return _cached(('datasets_by_id', tuple(ids)), lambda: _get_datasets(ids))
+
+
+def _get_datasets(ids: list[int]) -> dict[int, dict]:
+    conn = _get_catalog_conn()
+    placeholders = ",".join("?" * len(ids))
+    rows = conn.execute(f"""
+        SELECT d.id, d.name, d.description, d.modality, d.domain,
+               ds.num_samples, ds.total_size_bytes, ds.format, ds.resolution, ds.fps,
+               sl.path as primary_path,
+               (SELECT group_concat(t.name, char(31)) FROM tags t
+                  JOIN dataset_tags dt ON dt.tag_id = t.id WHERE dt.dataset_id = d.id) as tag_names
+        FROM datasets d
+        LEFT JOIN dataset_stats ds ON ds.dataset_id = d.id
+        LEFT JOIN storage_locations sl ON sl.dataset_id = d.id AND sl.is_primary = 1
+        WHERE d.id IN ({placeholders})
+    """, ids).fetchall()
+    results = {}
     for r in rows:
-        fmt = (r["format"] or "").lower()
-        is_annotatable = r["modality"] == "video" and fmt not in NON_ANNOTATABLE_FORMATS
-        results.append({
-            "id": r["id"],
-            "name": r["name"],
-            "description": r["description"],
-            "modality": r["modality"],
-            "domain": r["domain"],
-            "num_samples": r["num_samples"],
-            "total_size_gb": round(r["total_size_bytes"] / (1024**3), 1) if r["total_size_bytes"] else None,
-            "format": r["format"],
-            "resolution": r["resolution"],
-            "fps": r["fps"],
-            "primary_path": r["primary_path"],
-            "is_annotatable": is_annotatable,
-        })
+        summary = _dataset_summary(r)
+        summary["tags"] = r["tag_names"].split(chr(31)) if r["tag_names"] else []
+        results[r["id"]] = summary
     return results
 
 
 def get_dataset(dataset_id: int) -> dict | None:
+    return _cached(('dataset', dataset_id), lambda: _get_dataset(dataset_id))
+
+
+def _get_dataset(dataset_id: int) -> dict | None:
     conn = _get_catalog_conn()
     row = conn.execute(
         "SELECT id, name, description, modality, domain FROM datasets WHERE id = ?",
         (dataset_id,),
     ).fetchone()
     if not row:
-        conn.close()
         return None
 
     stats = conn.execute(
@@ -85,7 +194,6 @@ def get_dataset(dataset_id: int) -> dict | None:
            WHERE dt.dataset_id = ?""",
         (dataset_id,),
     ).fetchall()
-    conn.close()
 
     return {
         "id": row["id"],
@@ -100,60 +208,54 @@ def get_dataset(dataset_id: int) -> dict | None:
     }
 
 
-def list_dataset_videos(dataset_id: int, page: int = 1, per_page: int = 50) -> dict:
-    """Scan the primary storage path and return paginated video file list."""
-    conn = _get_catalog_conn()
-    row = conn.execute(
-        "SELECT path FROM storage_locations WHERE dataset_id = ? AND is_primary = 1",
-        (dataset_id,),
-    ).fetchone()
-    conn.close()
-
-    if not row or not os.path.isdir(row["path"]):
-        return {"videos": [], "total": 0, "page": page, "per_page": per_page}
-
-    base_path = row["path"]
-    all_videos = []
-    for root, _, files in os.walk(base_path):
-        for f in sorted(files):
-            if os.path.splitext(f)[1].lower() in VIDEO_EXTENSIONS:
-                full_path = os.path.join(root, f)
-                all_videos.append({
-                    "filename": f,
-                    "path": full_path,
-                    "relative_path": os.path.relpath(full_path, base_path),
-                    "size_bytes": os.path.getsize(full_path),
-                })
-
-    total = len(all_videos)
-    start = (page - 1) * per_page
-    page_videos = all_videos[start:start + per_page]
+def list_dataset_videos(dataset_id: int, page: int = 1, per_page: int = 50, sort: str = "path",
+                        order: str = "asc", search: str | None = None, wait: bool = False) -> dict:
+    """Paginated video files under the dataset's primary path, served from the local file index.
+
+    A refresh runs in the background; ``scanning`` is true while it does, and
+    results may still grow. Pass ``wait`` to block until the scan finishes.
+    """
+    base_path = get_primary_path(dataset_id)
+    if not base_path or not os.path.isdir(base_path):
+        return {"videos": [], "total": 0, "page": page, "per_page": per_page, "total_pages": 0, "scanning": False}
+
+    job = ensure_index(dataset_id, base_path)
+    if job and wait:
+        job.done.wait()
+    result = query_files(dataset_id, page=page, per_page=per_page, sort=sort, order=order, search=search)
+    if job and not result["total"] and not job.first_batch.is_set():
+        # First ever scan: give it a moment to produce a page
+        job.first_batch.wait(FIRST_PAGE_WAIT)
+        result = query_files(dataset_id, page=page, per_page=per_page, sort=sort, order=order, search=search)
+    result["scanning"] = bool(job) and not job.done.is_set()
+    return result
 
-    return {
-        "videos": page_videos,
-        "total": total,
-        "page": page,
-        "per_page": per_page,
-        "total_pages": (total + per_page - 1) // per_page,
-    }
+
+def refresh_dataset_index(dataset_id: int) -> bool:
+    """Start a scan of the dataset's directories now; False if it has no accessible primary path."""
+    base_path = get_primary_path(dataset_id)
+    if not base_path or not os.path.isdir(base_path):
+        return False
+    ensure_index(dataset_id, base_path, force=True)
+    return True
 
 
 def list_annotations(dataset_id: int) -> list[dict]:
     """List published annotation sets for a dataset from the catalog."""
-    conn = _get_catalog_conn()
-    rows = conn.execute(
-        "SELECT * FROM annotations WHERE dataset_id = ? ORDER BY id DESC",
-        (dataset_id,),
-    ).fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
+    def load():
+        rows = _get_catalog_conn().execute(
+            "SELECT * FROM annotations WHERE dataset_id = ? ORDER BY id DESC",
+            (dataset_id,),
+        ).fetchall()
+        return [dict(r) for r in rows]
+    return _cached(('annotations', dataset_id), load)
 
 
 def get_primary_path(dataset_id: int) -> str | None:
-    conn = _get_catalog_conn()
-    row = conn.execute(
-        "SELECT path FROM storage_locations WHERE dataset_id = ? AND is_primary = 1",
-        (dataset_id,),
-    ).fetchone()
-    conn.close()
-    return row["path"] if row else None
+    def load():
+        row = _get_catalog_conn().execute(
+            "SELECT path FROM storage_locations WHERE dataset_id = ? AND is_primary = 1",
+            (dataset_id,),
+        ).fetchone()
+        return row["path"] if row else None
+    return _cached(('primary_path', dataset_id), load)
@@ -9,6 +9,7 @@ from sqlalchemy.orm import Session
 
 from ..config import settings
 from ..models import Project, Video, TemporalAnnotation, BoundingBoxAnnotation
+from .catalog import invalidate_cache
 
 
 def publish_to_catalog(db: Session, project_id: int, version: str | None = None) -> dict:
@@ -138,6 +139,7 @@ def publish_to_catalog(db: Session, project_id: int, version: str | None = None)
     )
     catalog_conn.commit()
     catalog_conn.close()
+    invalidate_cache()
 
     return {
         "success": True,
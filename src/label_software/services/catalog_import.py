@@ -0,0 +1,178 @@
+"""Background catalog imports.
+
+An import resolves its file list, drops paths already in the project with
+one set-based query, bulk-inserts ``Video`` rows by reference in batches and
+optionally probes metadata on a parallel pool, updating a progress record
+that clients poll.
+"""
+
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import insert, update
+
+from .. import database
+from ..config import settings
+from ..models import Project, Video
+from . import catalog as catalog_svc
+from .probe import get_probe, metadata_from_probe
+
+logger = logging.getLogger(__name__)
+
+INSERT_BATCH = 1000
+MAX_FINISHED_JOBS = 100
+
+_jobs: dict[str, dict] = {}
+_jobs_lock = threading.Lock()
+# Imports run one at a time; each fans out its own probe pool
+_runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog-import")
+
+
+def _update(job: dict, **changes):
+    with _jobs_lock:
+        job.update(changes)
+
+
+def _count(job: dict, field: str, n: int = 1):
+    with _jobs_lock:
+        job[field] += n
+
+
+def get_job(job_id: str) -> dict | None:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def list_jobs(project_id: int | None = None) -> list[dict]:
+    with _jobs_lock:
+        return [dict(j) for j in _jobs.values() if project_id is None or j['project_id'] == project_id]
+
+
+def start_import(project_id: int, dataset_id: int, dataset_name: str, video_paths: list[str],
+                 import_all: bool, extract_metadata: bool) -> dict:
+    job = {
+        'job_id': uuid.uuid4().hex,
+        'project_id': project_id,
+        'dataset_id': dataset_id,
+        'dataset_name': dataset_name,
+        'status': 'queued',
+        'total': 0,
+        'processed': 0,
+        'imported': 0,
+        'skipped': 0,
+        'failed': 0,
+        'probed': 0,
+        'error': None,
+        'created_at': datetime.utcnow().isoformat(),
+        'finished_at': None,
+    }
+    with _jobs_lock:
+        finished = [k for k, j in _jobs.items() if j['status'] in ('done', 'failed')]
+        for key in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del _jobs[key]
+        _jobs[job['job_id']] = job
+    _runner.submit(_run, job, video_paths, import_all, extract_metadata)
+    return dict(job)
+
+
+def _run(job: dict, video_paths: list[str], import_all: bool, extract_metadata: bool):
+    _update(job, status='running')
+    try:
+        _import(job, video_paths, import_all, extract_metadata)
+        _update(job, status='done')
+    except Exception as e:
+        logger.error("Catalog import %s failed: %s", job['job_id'], e)
+        _update(job, status='failed', error=str(e))
+    finally:
+        _update(job, finished_at=datetime.utcnow().isoformat())
+
+
+def _import(job: dict, video_paths: list[str], import_all: bool, extract_metadata: bool):
+    project_id, dataset_id = job['project_id'], job['dataset_id']
+
+    if import_all:
+        listing = catalog_svc.list_dataset_videos(dataset_id, page=1, per_page=10**9, wait=True)
+        paths = [v['path'] for v in listing['videos']]
+    else:
+        with ThreadPoolExecutor(max_workers=settings.import_probe_workers) as pool:
+            exists = list(pool.map(os.path.isfile, video_paths))
+        paths = [p for p, ok in zip(video_paths, exists) if ok]
+        _count(job, 'failed', len(video_paths) - len(paths))
+    paths = list(dict.fromkeys(paths))
+    _update(job, total=len(paths) + job['failed'], processed=job['failed'])
+
+    db = database.SessionLocal()
+    try:
+        existing = {p for (p,) in db.query(Video.catalog_path).filter(Video.project_id == project_id,
+                                                                      Video.catalog_path.isnot(None))}
+        new_paths = [p for p in paths if p not in existing]
+        _count(job, 'skipped', len(paths) - len(new_paths))
+        _count(job, 'processed', len(paths) - len(new_paths))
+
+        created = []
+        for i in range(0, len(new_paths), INSERT_BATCH):
+            rows = [{
+                'filename': os.path.basename(p),
+                'source_type': 'catalog',
+                'catalog_path': p,
+                'catalog_dataset_id': dataset_id,
+                'project_id': project_id,
+                'status': 'pending',
+            } for p in new_paths[i:i + INSERT_BATCH]]
+            result = db.execute(insert(Video).returning(Video.video_id, Video.catalog_path), rows)
+            created.extend(result.all())
+            db.commit()
+            _count(job, 'imported', len(rows))
+            if not extract_metadata:
+                _count(job, 'processed', len(rows))
+
+        project = db.get(Project, project_id)
+        project.catalog_dataset_id = dataset_id
+        project.catalog_dataset_name = job['dataset_name']
+        project.total_videos = db.query(Video).filter_by(project_id=project_id).count()
+        project.last_activity = datetime.utcnow()
+        db.commit()
+
+        if extract_metadata and created:
+            _probe_all(job, db, created)
+    finally:
+        db.close()
+
+
+def _probe_one(job: dict, video_id: int, path: str) -> dict | None:
+    try:
+        info = get_probe(path)
+    except Exception as e:
+        logger.warning("Probe failed for %s: %s", path, e)
+        info = None
+    if info is None:
+        _count(job, 'failed')
+        return None
+    metadata = metadata_from_probe(info)
+    _count(job, 'probed')
+    return {'video_id': video_id, 'probe_id': info['probe_id'], 'resolution': metadata['resolution'],
+            'framerate': metadata['framerate'], 'duration': metadata['duration']}
+
+
+def _probe_all(job: dict, db, created: list):
+    """Probe new videos in parallel and write their metadata back in batched updates."""
+    pending = []
+    with ThreadPoolExecutor(max_workers=settings.import_probe_workers, thread_name_prefix="import-probe") as pool:
+        futures = [pool.submit(_probe_one, job, video_id, path) for video_id, path in created]
+        for future in futures:
+            values = future.result()
+            _count(job, 'processed')
+            if values:
+                pending.append(values)
+            if len(pending) >= INSERT_BATCH:
+                db.execute(update(Video), pending)
+                db.commit()
+                pending = []
+    if pending:
+        db.execute(update(Video), pending)
+        db.commit()
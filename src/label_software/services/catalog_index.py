@@ -0,0 +1,247 @@
+"""Local index of the video files under each catalog dataset's primary path.
+
+Browsing a dataset queries ``catalog_files`` instead of walking the
+filesystem. Refreshes are incremental: a directory whose mtime hasn't
+changed since it was last listed still has the same entries, so only its
+known subdirectories are visited and GPFS only sees one ``stat`` per
+directory. Files modified in place (same name, new size) are picked up the
+next time their directory is relisted. Scans run in the background and
+stream into the table, so the first page is available before a large
+dataset has been fully walked.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from sqlalchemy import delete, insert
+
+from .. import database
+from ..config import settings
+from ..models import CatalogDir, CatalogFile
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.wmv'}
+COMMIT_EVERY = 200  # directories per transaction while refreshing
+COMMIT_INTERVAL = 1.0  # ...or seconds, whichever comes first
+DELETE_BATCH = 500
+# A directory modified this recently may change again within the same mtime tick
+MTIME_SAFETY_NS = 2 * 10**9
+
+SORT_COLUMNS = {
+    'path': CatalogFile.relative_path,
+    'name': CatalogFile.filename,
+    'size': CatalogFile.size,
+    'mtime': CatalogFile.mtime_ns,
+}
+
+_refreshed: dict[int, float] = {}
+_jobs: dict[int, "ScanJob"] = {}
+_jobs_lock = threading.Lock()
+
+
+def _scan_directory(path: str) -> tuple[list[tuple], list[str]]:
+    """Video files (name, size, mtime_ns) and subdirectories, using the DirEntry stat cache."""
+    files, subdirs = [], []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in VIDEO_EXTENSIONS and entry.is_file():
+                    st = entry.stat()
+                    files.append((entry.name, st.st_size, st.st_mtime_ns))
+            except OSError:
+                continue
+    return files, subdirs
+
+
+def _delete_dirs(db, dataset_id: int, paths: list[str]):
+    for i in range(0, len(paths), DELETE_BATCH):
+        batch = paths[i:i + DELETE_BATCH]
+        db.execute(delete(CatalogFile).where(CatalogFile.dataset_id == dataset_id,
+                                             CatalogFile.directory.in_(batch)))
+        db.execute(delete(CatalogDir).where(CatalogDir.dataset_id == dataset_id, CatalogDir.path.in_(batch)))
+
+
+def _visit(directory: str, known_mtime: int | None):
+    """Stat one directory and list it if its mtime changed. Runs on the scan pool."""
+    mtime_ns = os.stat(directory).st_mtime_ns
+    if known_mtime is not None and known_mtime == mtime_ns:
+        return mtime_ns, None, None
+    files, subdirs = _scan_directory(directory)
+    return mtime_ns, files, subdirs
+
+
+class ScanJob:
+    """One background refresh of a dataset's index.
+
+    Directories are visited concurrently on a thread pool (network
+    filesystems are latency-bound, so parallel metadata requests overlap),
+    while this job's own thread applies results to the database and commits
+    them in small batches so browsing sees files as they are found.
+    """
+
+    def __init__(self, dataset_id: int, base_path: str):
+        self.dataset_id = dataset_id
+        self.base_path = base_path
+        self.first_batch = threading.Event()
+        self.done = threading.Event()
+        self.stats = None
+        self._thread = threading.Thread(target=self._run, name=f"catalog-scan-{dataset_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self.stats = refresh_dataset(self.dataset_id, self.base_path, on_commit=self.first_batch.set)
+        except Exception as e:
+            logger.error("Catalog scan for dataset %s failed: %s", self.dataset_id, e)
+        finally:
+            self.first_batch.set()
+            self.done.set()
+            with _jobs_lock:
+                _jobs.pop(self.dataset_id, None)
+
+
+def refresh_dataset(dataset_id: int, base_path: str, on_commit=None) -> dict:
+    """Bring the index for one dataset up to date with the filesystem."""
+    started = time.time()
+    db = database.SessionLocal()
+    try:
+        known = {path: (mtime_ns, parent) for path, mtime_ns, parent in
+                 db.query(CatalogDir.path, CatalogDir.mtime_ns, CatalogDir.parent).filter_by(dataset_id=dataset_id)}
+        if known and base_path not in known:
+            # Primary path moved: start over
+            db.execute(delete(CatalogFile).where(CatalogFile.dataset_id == dataset_id))
+            db.execute(delete(CatalogDir).where(CatalogDir.dataset_id == dataset_id))
+            known = {}
+        children = defaultdict(list)
+        for path, (_, parent) in known.items():
+            children[parent].append(path)
+
+        seen = set()
+        listed = pending = 0
+        last_commit = time.time()
+        with ThreadPoolExecutor(max_workers=settings.catalog_scan_workers,
+                                thread_name_prefix="catalog-scandir") as pool:
+            def submit(directory, parent):
+                known_mtime = known[directory][0] if directory in known else None
+                futures[pool.submit(_visit, directory, known_mtime)] = (directory, parent)
+
+            futures = {}
+            submit(base_path, None)
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    directory, parent = futures.pop(future)
+                    try:
+                        mtime_ns, files, subdirs = future.result()
+                    except OSError as e:
+                        if os.path.isdir(directory):
+                            logger.warning("Cannot list %s: %s", directory, e)
+                            # Keep what we had rather than dropping the subtree
+                            seen.add(directory)
+                            for child in children[directory]:
+                                submit(child, directory)
+                        continue
+                    seen.add(directory)
+                    if files is None:
+                        for child in children[directory]:
+                            submit(child, directory)
+                        continue
+
+                    listed += 1
+                    db.execute(delete(CatalogFile).where(CatalogFile.dataset_id == dataset_id,
+                                                         CatalogFile.directory == directory))
+                    if files:
+                        db.execute(insert(CatalogFile), [{
+                            'dataset_id': dataset_id,
+                            'path': os.path.join(directory, name),
+                            'relative_path': os.path.relpath(os.path.join(directory, name), base_path),
+                            'directory': directory,
+                            'filename': name,
+                            'extension': os.path.splitext(name)[1].lower(),
+                            'size': size,
+                            'mtime_ns': file_mtime,
+                        } for name, size, file_mtime in files])
+                    db.execute(delete(CatalogDir).where(CatalogDir.dataset_id == dataset_id,
+                                                        CatalogDir.path == directory))
+                    fresh = time.time_ns() - mtime_ns < MTIME_SAFETY_NS
+                    db.add(CatalogDir(dataset_id=dataset_id, path=directory, parent=parent,
+                                      mtime_ns=None if fresh else mtime_ns))
+                    for subdir in subdirs:
+                        submit(subdir, directory)
+                    pending += 1
+
+                # Commit often enough that browsing sees progress during a long first scan
+                if pending and (pending >= COMMIT_EVERY or time.time() - last_commit >= COMMIT_INTERVAL):
+                    db.commit()
+                    pending, last_commit = 0, time.time()
+                    if on_commit:
+                        on_commit()
+
+        vanished = [path for path in known if path not in seen]
+        _delete_dirs(db, dataset_id, vanished)
+        db.commit()
+    finally:
+        db.close()
+
+    _refreshed[dataset_id] = time.time()
+    elapsed = time.time() - started
+    logger.info("Catalog index for dataset %s: %d dirs checked, %d listed, %d removed in %.1fs",
+                dataset_id, len(seen), listed, len(vanished), elapsed)
+    return {'directories': len(seen), 'listed': listed, 'removed': len(vanished), 'seconds': round(elapsed, 2)}
+
+
+def ensure_index(dataset_id: int, base_path: str, force: bool = False) -> ScanJob | None:
+    """Start a background refresh if the index is older than ``catalog_index_ttl``.
+
+    Returns the running scan (new or already in progress), or None if the
+    index is current.
+    """
+    with _jobs_lock:
+        job = _jobs.get(dataset_id)
+        if job is None:
+            last = _refreshed.get(dataset_id)
+            if not (force or last is None or time.time() - last > settings.catalog_index_ttl):
+                return None
+            job = ScanJob(dataset_id, base_path)
+            _jobs[dataset_id] = job
+            job.start()
+    return job
+
+
+def query_files(dataset_id: int, page: int = 1, per_page: int = 50, sort: str = 'path',
+                order: str = 'asc', search: str | None = None) -> dict:
+    column = SORT_COLUMNS.get(sort, CatalogFile.relative_path)
+    db = database.SessionLocal()
+    try:
+        query = db.query(CatalogFile).filter(CatalogFile.dataset_id == dataset_id)
+        if search:
+            # Prefix range rather than LIKE '%x%', so ix_catalog_files_dataset_filename serves it
+            query = query.filter(CatalogFile.filename >= search, CatalogFile.filename < search + '\U0010ffff')
+        total = query.count()
+        rows = (query.order_by(column.desc() if order == 'desc' else column, CatalogFile.file_id)
+                .offset((page - 1) * per_page).limit(per_page).all())
+        videos = [{
+            'filename': f.filename,
+            'path': f.path,
+            'relative_path': f.relative_path,
+            'size_bytes': f.size,
+            'mtime_ns': f.mtime_ns,
+        } for f in rows]
+    finally:
+        db.close()
+    return {
+        'videos': videos,
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'total_pages': (total + per_page - 1) // per_page,
+    }
@@ -0,0 +1,155 @@
+"""Denormalized annotation counters.
+
+Each video carries its temporal/bbox annotation counts, the time of its
+newest annotation and its distinct annotators; each project carries
+rollups of those. The annotation save and delete paths adjust them inside
+their own transaction (``adjust``), so progress and statistics endpoints
+read one row per video instead of counting annotations. ``rebuild``
+recomputes everything from the annotation tables and reports how many rows
+had drifted.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import bindparam, func, select, text, union_all, update
+from sqlalchemy.orm import Session
+
+from ..models import BoundingBoxAnnotation, Project, TemporalAnnotation, Video
+
+
+def _newest_annotation(db, video_id: int):
+    newest = union_all(
+        select(TemporalAnnotation.created_at).where(TemporalAnnotation.video_id == video_id),
+        select(BoundingBoxAnnotation.created_at).where(BoundingBoxAnnotation.video_id == video_id),
+    ).subquery()
+    return db.execute(select(func.max(newest.c.created_at))).scalar()
+
+
+def _still_annotating(db, video_id: int, annotator: str) -> bool:
+    for model in (TemporalAnnotation, BoundingBoxAnnotation):
+        if db.query(model.video_id).filter(model.video_id == video_id,
+                                           model.annotator_name == annotator).first():
+            return True
+    return False
+
+
+def adjust(db, video_id: int, temporal: int = 0, bbox: int = 0, annotated_at: datetime | None = None,
+           added_by=(), removed_by=()):
+    """Apply annotation count changes for one video and its project in the caller's transaction.
+
+    Call after the annotation rows were added or deleted and flushed;
+    ``annotated_at`` is the creation time of the newest added annotation,
+    ``added_by`` / ``removed_by`` the annotator names involved.
+    """
+    # The counter update comes first so the write lock is held before reading current values
+    values = {Video.temporal_count: Video.temporal_count + temporal, Video.bbox_count: Video.bbox_count + bbox}
+    db.execute(update(Video).where(Video.video_id == video_id).values(values))
+    row = db.execute(select(Video.project_id, Video.temporal_count, Video.bbox_count,
+                            Video.annotators, Video.last_annotated_at)
+                     .where(Video.video_id == video_id)).one_or_none()
+    if row is None:
+        return
+
+    changes = {}
+    if annotated_at is not None and (row.last_annotated_at is None or annotated_at > row.last_annotated_at):
+        changes['last_annotated_at'] = annotated_at
+    elif removed_by or temporal < 0 or bbox < 0:
+        changes['last_annotated_at'] = _newest_annotation(db, video_id)
+    annotators = set(row.annotators or [])
+    names = annotators | {n for n in added_by if n}
+    names -= {n for n in removed_by if n and not _still_annotating(db, video_id, n)}
+    if names != annotators:
+        changes['annotators'] = sorted(names)
+    if changes:
+        db.execute(update(Video).where(Video.video_id == video_id).values(changes))
+
+    if row.project_id is not None:
+        after = row.temporal_count + row.bbox_count
+        before = after - temporal - bbox
+        project_values = {
+            Project.temporal_count: Project.temporal_count + temporal,
+            Project.bbox_count: Project.bbox_count + bbox,
+            Project.annotated_videos: Project.annotated_videos + (int(after > 0) - int(before > 0)),
+        }
+        if annotated_at is not None:
+            project_values[Project.last_activity] = annotated_at
+        db.execute(update(Project).where(Project.project_id == row.project_id).values(project_values))
+
+
+_REBUILD_VIDEOS = """
+UPDATE videos SET temporal_count = c.temporal_count, bbox_count = c.bbox_count,
+                  last_annotated_at = c.last_annotated_at, annotators = c.annotators
+FROM (
+    WITH annotations AS (
+        SELECT video_id, annotator_name, created_at FROM temporal_annotations
+        UNION ALL
+        SELECT video_id, annotator_name, created_at FROM bbox_annotations
+    ),
+    t AS (SELECT video_id, COUNT(*) AS n FROM temporal_annotations GROUP BY video_id),
+    b AS (SELECT video_id, COUNT(*) AS n FROM bbox_annotations GROUP BY video_id),
+    latest AS (SELECT video_id, MAX(created_at) AS at FROM annotations GROUP BY video_id),
+    names AS (
+        SELECT video_id, json_group_array(annotator_name) AS annotators FROM (
+            SELECT DISTINCT video_id, annotator_name FROM annotations
+            WHERE annotator_name IS NOT NULL ORDER BY video_id, annotator_name
+        ) GROUP BY video_id
+    )
+    SELECT v.video_id, COALESCE(t.n, 0) AS temporal_count, COALESCE(b.n, 0) AS bbox_count,
+           latest.at AS last_annotated_at, COALESCE(names.annotators, '[]') AS annotators
+    FROM videos v
+    LEFT JOIN t ON t.video_id = v.video_id
+    LEFT JOIN b ON b.video_id = v.video_id
+    LEFT JOIN latest ON latest.video_id = v.video_id
+    LEFT JOIN names ON names.video_id = v.video_id
+) AS c
+WHERE c.video_id = videos.video_id
+  AND (videos.temporal_count IS NOT c.temporal_count OR videos.bbox_count IS NOT c.bbox_count
+       OR videos.last_annotated_at IS NOT c.last_annotated_at
+       OR json(COALESCE(videos.annotators, 'null')) IS NOT c.annotators)
+"""
+
+_REBUILD_PROJECTS = """
+UPDATE projects SET total_videos = c.total_videos, completed_videos = c.completed_videos,
+                    annotated_videos = c.annotated_videos, temporal_count = c.temporal_count,
+                    bbox_count = c.bbox_count
+FROM (
+    SELECT p.project_id,
+           COUNT(v.video_id) AS total_videos,
+           COALESCE(SUM(v.is_completed), 0) AS completed_videos,
+           COALESCE(SUM(v.temporal_count + v.bbox_count > 0), 0) AS annotated_videos,
+           COALESCE(SUM(v.temporal_count), 0) AS temporal_count,
+           COALESCE(SUM(v.bbox_count), 0) AS bbox_count
+    FROM projects p LEFT JOIN videos v ON v.project_id = p.project_id
+    {where}
+    GROUP BY p.project_id
+) AS c
+WHERE c.project_id = projects.project_id
+  AND (projects.total_videos IS NOT c.total_videos OR projects.completed_videos IS NOT c.completed_videos
+       OR projects.annotated_videos IS NOT c.annotated_videos
+       OR projects.temporal_count IS NOT c.temporal_count OR projects.bbox_count IS NOT c.bbox_count)
+"""
+
+
+def refresh_projects(db, project_ids=None) -> int:
+    """Recompute project rollups from their videos' counters; returns the number of projects changed.
+
+    Use after moving or removing videos in bulk. Pending ORM changes are
+    flushed first so the aggregate sees them.
+    """
+    if isinstance(db, Session):
+        db.flush()
+    if project_ids is None:
+        return db.execute(text(_REBUILD_PROJECTS.format(where=''))).rowcount
+    project_ids = [p for p in set(project_ids) if p is not None]
+    if not project_ids:
+        return 0
+    statement = text(_REBUILD_PROJECTS.format(where='WHERE p.project_id IN :ids')).bindparams(
+        bindparam('ids', expanding=True))
+    return db.execute(statement, {'ids': project_ids}).rowcount
+
+
+def rebuild(db) -> dict:
+    """Recompute every counter from the annotation tables, in the caller's transaction."""
+    videos = db.execute(text(_REBUILD_VIDEOS)).rowcount
+    projects = refresh_projects(db)
+    return {'videos': videos, 'projects': projects}
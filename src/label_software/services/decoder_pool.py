@@ -0,0 +1,265 @@
+"""Pool of open OpenCV decoders shared by the frame-extraction routes."""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+
+from ..config import settings
+from .frame_index import ensure_frame_index
+
+logger = logging.getLogger(__name__)
+
+# Forward gaps up to this many frames are decoded with grab() instead of a seek,
+# which is much cheaper than re-seeking when stepping through a video.
+MAX_FORWARD_GRAB = 48
+# How often a decoder without a frame index checks whether one has been built.
+INDEX_RECHECK_INTERVAL = 5
+# Earlier keyframes tried when a timestamp seek lands past the target frame.
+SEEK_RETRIES = 3
+
+
+class _Decoder:
+    """An open capture, its read position and the lock that serialises access to it."""
+
+    def __init__(self, path: str, signature: tuple):
+        self.path = path
+        self.signature = signature
+        self.lock = threading.Lock()
+        self.closed = False
+        self.cap = cv2.VideoCapture(path)
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)) if self.cap.isOpened() else 0
+        self.position = 0  # index of the frame the next read() returns, -1 if unknown
+        self.last_used = time.monotonic()
+        self.index = None
+        self._index_checked = 0.0
+
+    def is_opened(self) -> bool:
+        return self.cap.isOpened()
+
+    def _refresh_index(self):
+        if self.index is not None or time.monotonic() - self._index_checked < INDEX_RECHECK_INTERVAL:
+            return
+        self._index_checked = time.monotonic()
+        self.index = ensure_frame_index(self.path)
+        if self.index is not None and self.index.frame_count:
+            # The packet count is exact; the container header often isn't
+            self.frame_count = self.index.frame_count
+
+    def _seek_target(self, frame_number: int) -> int:
+        """Where to seek before decoding forward to ``frame_number``."""
+        if self.index is not None:
+            keyframe = self.index.keyframe_before(frame_number)
+            if keyframe is not None:
+                return keyframe
+        return frame_number
+
+    def _seek(self, start: int, frame_number: int) -> int | None:
+        """Seek so that ``frame_number`` can be decoded forward; returns the frame just decoded.
+
+        With an index the seek goes to a keyframe's presentation time and the
+        landed frame is identified from its timestamp, since OpenCV's
+        frame-number seek assumes a constant frame rate. Returns None if no
+        verified landing at or before ``frame_number`` was found.
+        """
+        keyframe = start
+        for _ in range(SEEK_RETRIES):
+            self.cap.set(cv2.CAP_PROP_POS_MSEC, self.index.frame_to_time(keyframe) * 1000.0)
+            if not self.cap.grab():
+                return None
+            # Millisecond precision; nudge so rounding down can't map to the previous frame
+            landed = self.index.time_to_frame(self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0 + 5e-4)
+            if landed <= frame_number:
+                return landed
+            earlier = self.index.keyframe_before(keyframe - 1) if keyframe > 0 else None
+            keyframe = earlier if earlier is not None and earlier < keyframe else max(0, keyframe - MAX_FORWARD_GRAB)
+        return None
+
+    def read(self, frame_number: int):
+        """Decode one frame. Caller must hold ``self.lock``."""
+        self._refresh_index()
+        if frame_number < 0 or frame_number >= self.frame_count:
+            return None
+
+        # Seeking to a known keyframe lands exactly and only costs decoding the
+        # rest of that GOP. Continuing forward is never worse once we're past it.
+        start = self._seek_target(frame_number)
+        if (self.position < 0 or frame_number < self.position
+                or (self.position < start and frame_number - self.position > MAX_FORWARD_GRAB)):
+            landed = self._seek(start, frame_number) if self.index is not None else None
+            if landed is None:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+                self.position = start
+            elif landed == frame_number:
+                ok, frame = self.cap.retrieve()
+                self.position = frame_number + 1 if ok else -1
+                return frame if ok else None
+            else:
+                self.position = landed + 1
+
+        for _ in range(frame_number - self.position):
+            if not self.cap.grab():
+                self.position = -1
+                return None
+
+        ok, frame = self.cap.read()
+        self.position = frame_number + 1 if ok else -1
+        return frame if ok else None
+
+    def release(self):
+        self.closed = True
+        self.cap.release()
+
+
+def _file_signature(path: str) -> tuple | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class DecoderPool:
+    """LRU pool of open ``cv2.VideoCapture`` objects keyed by resolved path.
+
+    Safe to use from the FastAPI threadpool: the pool lock only guards the
+    bookkeeping, and each decoder has its own lock held while decoding.
+    """
+
+    def __init__(self, max_open: int = 8, idle_timeout: float = 300):
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+        self._decoders: OrderedDict[str, _Decoder] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._reaper = None
+
+    def read_frame(self, video_path: str, frame_number: int):
+        """Return the decoded BGR frame, or None if it can't be read."""
+        return self.read_frames(video_path, [frame_number]).get(frame_number)
+
+    def read_frames(self, video_path: str, frame_numbers, transform=None) -> dict:
+        """Decode several frames in one forward pass, holding the decoder for the batch.
+
+        ``transform`` (e.g. a resize) is applied to each frame as it is decoded so
+        a long batch never holds many full-resolution frames at once.
+        """
+        path = os.path.realpath(video_path)
+        for _ in range(2):
+            decoder = self._acquire(path)
+            if decoder is None:
+                return {}
+            with decoder.lock:
+                if decoder.closed:
+                    continue  # evicted between lookup and lock; reopen
+                frames = {}
+                for frame_number in sorted(set(frame_numbers)):
+                    frame = decoder.read(frame_number)
+                    if frame is not None:
+                        frames[frame_number] = transform(frame) if transform else frame
+                decoder.last_used = time.monotonic()
+                return frames
+        return {}
+
+    def frame_count(self, video_path: str) -> int:
+        decoder = self._acquire(os.path.realpath(video_path))
+        return decoder.frame_count if decoder else 0
+
+    def _acquire(self, path: str) -> _Decoder | None:
+        signature = _file_signature(path)
+        if signature is None:
+            self.evict(path)
+            return None
+
+        stale = []
+        with self._lock:
+            stale.extend(self._expire_idle())
+            decoder = self._decoders.get(path)
+            if decoder is not None and decoder.signature != signature:
+                # File was replaced on disk; don't serve frames from the old one
+                stale.append(self._decoders.pop(path))
+                decoder = None
+            if decoder is not None:
+                self._decoders.move_to_end(path)
+        self._release_all(stale)
+        if decoder is not None:
+            return decoder
+        stale = []
+
+        # Open outside the pool lock -- container open is the slow part
+        decoder = _Decoder(path, signature)
+        if not decoder.is_opened():
+            decoder.release()
+            return None
+
+        with self._lock:
+            existing = self._decoders.get(path)
+            if existing is not None and existing.signature == signature:
+                stale.append(decoder)
+                decoder = existing
+                self._decoders.move_to_end(path)
+            else:
+                if existing is not None:
+                    stale.append(existing)
+                self._decoders[path] = decoder
+                while len(self._decoders) > self.max_open:
+                    _, oldest = self._decoders.popitem(last=False)
+                    stale.append(oldest)
+        self._release_all(stale)
+        return decoder
+
+    def _expire_idle(self) -> list[_Decoder]:
+        """Pop decoders idle longer than the timeout. Caller holds ``self._lock``."""
+        expired = []
+        cutoff = time.monotonic() - self.idle_timeout
+        for path in list(self._decoders):
+            if self._decoders[path].last_used >= cutoff:
+                break
+            expired.append(self._decoders.pop(path))
+        return expired
+
+    @staticmethod
+    def _release_all(decoders):
+        for decoder in decoders:
+            with decoder.lock:
+                decoder.release()
+
+    def evict(self, video_path: str):
+        path = os.path.realpath(video_path)
+        with self._lock:
+            decoder = self._decoders.pop(path, None)
+        if decoder is not None:
+            self._release_all([decoder])
+
+    def start_reaper(self):
+        """Close idle decoders in the background, so handles don't stay open when traffic stops."""
+        with self._lock:
+            if self._reaper is not None or self.idle_timeout <= 0:
+                return
+            self._stop.clear()
+            self._reaper = threading.Thread(target=self._reap, name="decoder-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap(self):
+        interval = min(max(self.idle_timeout / 2, 1), 60)
+        while not self._stop.wait(interval):
+            with self._lock:
+                expired = self._expire_idle()
+            if expired:
+                self._release_all(expired)
+                logger.debug("Closed %d idle decoders", len(expired))
+
+    def close_all(self):
+        self._stop.set()
+        with self._lock:
+            self._reaper = None
+            decoders = list(self._decoders.values())
+            self._decoders.clear()
+        self._release_all(decoders)
+        logger.info("Closed %d pooled decoders", len(decoders))
+
+
+decoder_pool = DecoderPool(settings.decoder_pool_size, settings.decoder_idle_timeout)
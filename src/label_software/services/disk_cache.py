@@ -0,0 +1,182 @@
+"""Size-budgeted, LRU-evicted directory cache for derived media files."""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Don't rewrite a file's mtime on every hit; shared filesystems pay for each metadata op.
+TOUCH_INTERVAL = 60
+
+
+class DiskCache:
+    """Files in ``directory`` named by key, evicted least-recently-used first
+    once their total size exceeds ``max_bytes``.
+
+    Last access is tracked in memory and persisted as the file mtime, so the
+    LRU order survives restarts without relying on atime.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, suffix: str):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, list] = OrderedDict()  # key -> [size, last_touch]
+        self._total = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}{self.suffix}")
+
+    def get(self, key: str) -> str | None:
+        """Return the cached file path for ``key``, or None on a miss."""
+        path = self.path_for(key)
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is None:
+                # Written by another process (label-warm, another worker) since the index was loaded
+                entry = self._adopt(key, path)
+            if entry is None or not os.path.exists(path):
+                if entry is not None:
+                    self._forget(key)
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            now = time.time()
+            touch = now - entry[1] > TOUCH_INTERVAL
+            if touch:
+                entry[1] = now
+        if touch:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return path
+
+    def put_bytes(self, key: str, data: bytes) -> str:
+        """Atomically write ``data`` as the entry for ``key``."""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return self.commit(key, tmp_path)
+
+    def commit(self, key: str, tmp_path: str) -> str:
+        """Rename a finished temp file into place and account for it."""
+        path = self.path_for(key)
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            self._load()
+            self._forget(key)
+            self._entries[key] = [size, time.time()]
+            self._total += size
+            self._evict()
+        return path
+
+    def discard(self, key: str):
+        with self._lock:
+            self._load()
+            self._forget(key)
+        try:
+            os.remove(self.path_for(key))
+        except OSError:
+            pass
+
+    def prune(self, max_bytes: int | None = None) -> int:
+        """Evict down to ``max_bytes`` (default: the configured budget). Returns files removed."""
+        with self._lock:
+            self._load()
+            before = self.evictions
+            self._evict(self.max_bytes if max_bytes is None else max_bytes)
+            return self.evictions - before
+
+    def entries(self) -> list[tuple[str, int]]:
+        """(key, size) pairs, least recently used first."""
+        with self._lock:
+            self._load()
+            return [(k, e[0]) for k, e in self._entries.items()]
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load()
+            lookups = self.hits + self.misses
+            return {
+                "directory": self.directory,
+                "entries": len(self._entries),
+                "size_bytes": self._total,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+                "evictions": self.evictions,
+            }
+
+    def _load(self):
+        """Index the existing directory contents once. Caller holds ``self._lock``."""
+        if self._loaded:
+            return
+        self._loaded = True
+        found = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.endswith(self.suffix) or ".part" in entry.name:
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    found.append((st.st_mtime, entry.name[:-len(self.suffix)], st.st_size))
+        except FileNotFoundError:
+            return
+        for mtime, key, size in sorted(found):
+            self._entries[key] = [size, mtime]
+            self._total += size
+        self._evict()
+
+    def _adopt(self, key: str, path: str) -> list | None:
+        """Index a file that exists on disk but not in ``_entries``. Caller holds ``self._lock``."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        self._entries[key] = [st.st_size, st.st_mtime]
+        self._total += st.st_size
+        self._evict()
+        return self._entries.get(key)
+
+    def _forget(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total -= entry[0]
+
+    def _evict(self, max_bytes: int | None = None):
+        budget = self.max_bytes if max_bytes is None else max_bytes
+        while self._total > budget and self._entries:
+            key, (size, _) = self._entries.popitem(last=False)
+            self._total -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path_for(key))
+            except OSError as e:
+                logger.warning("Could not evict cache entry %s: %s", key, e)
@@ -0,0 +1,177 @@
+"""Streaming annotation exports (JSON array, JSON Lines, CSV).
+
+Rows are read in keyset windows: videos are cut into windows of at most
+``ROW_WINDOW`` annotations (using their counters), the temporal and
+bounding-box annotations of a window come from one query each and are
+grouped by video, and the window is serialized and handed to the response
+before the next one is fetched. Memory depends on the window size, not on
+the size of the export. Each stream opens its own read-only session, since
+it outlives the request's.
+"""
+
+import csv
+import io
+import json
+from collections import defaultdict
+
+from sqlalchemy import select
+
+from .. import database
+from ..models import BoundingBoxAnnotation, TemporalAnnotation, Video
+
+VIDEO_WINDOW = 500  # videos fetched per query (and at most per IN (...) list)
+ROW_WINDOW = 20000  # annotation rows per window
+
+FORMATS = {
+    'json': 'application/json',
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+CSV_HEADER = ['video_id', 'filename', 'resolution', 'framerate', 'duration',
+              'annotation_type', 'label', 'start_time', 'end_time',
+              'start_frame', 'end_frame', 'frame_index', 'x', 'y',
+              'width', 'height', 'part_label', 'annotator_name']
+
+VIDEO_COLUMNS = (Video.video_id, Video.filename, Video.resolution, Video.framerate, Video.duration, Video.status,
+                 Video.temporal_count, Video.bbox_count)
+TEMPORAL_COLUMNS = (TemporalAnnotation.video_id, TemporalAnnotation.label, TemporalAnnotation.frame_index,
+                    TemporalAnnotation.start_time, TemporalAnnotation.end_time, TemporalAnnotation.start_frame,
+                    TemporalAnnotation.end_frame, TemporalAnnotation.annotator_name)
+BBOX_COLUMNS = (BoundingBoxAnnotation.video_id, BoundingBoxAnnotation.frame_index, BoundingBoxAnnotation.x,
+                BoundingBoxAnnotation.y, BoundingBoxAnnotation.width, BoundingBoxAnnotation.height,
+                BoundingBoxAnnotation.part_label, BoundingBoxAnnotation.annotator_name)
+
+
+def _keyset(db, columns, key, window: int, *conditions):
+    """Yield lists of up to ``window`` rows ordered by ``key``, one query per list."""
+    last = None
+    while True:
+        query = select(*columns).where(*conditions)
+        if last is not None:
+            query = query.where(key > last)
+        rows = db.execute(query.order_by(key).limit(window)).all()
+        if not rows:
+            return
+        yield rows
+        last = getattr(rows[-1], key.key)
+
+
+def _grouped(db, columns, model, key, video_ids: list[int]) -> dict[int, list]:
+    grouped = defaultdict(list)
+    for row in db.execute(select(*columns).where(model.video_id.in_(video_ids)).order_by(model.video_id, key)):
+        grouped[row.video_id].append(row)
+    return grouped
+
+
+def _by_annotation_count(videos):
+    """Split videos into runs of at most ``ROW_WINDOW`` annotations (a heavier video goes alone)."""
+    batch, rows = [], 0
+    for video in videos:
+        n = video.temporal_count + video.bbox_count
+        if batch and rows + n > ROW_WINDOW:
+            yield batch
+            batch, rows = [], 0
+        batch.append(video)
+        rows += n
+    if batch:
+        yield batch
+
+
+def video_windows(only_confirmed: bool = True):
+    """Yield lists of ``(video, temporal rows, bbox rows)`` for one window of videos at a time."""
+    db = database.ReadSessionLocal()
+    try:
+        conditions = [Video.status == 'confirmed'] if only_confirmed else []
+        for videos in _keyset(db, VIDEO_COLUMNS, Video.video_id, VIDEO_WINDOW, *conditions):
+            for window in _by_annotation_count(videos):
+                ids = [v.video_id for v in window]
+                temporal = _grouped(db, TEMPORAL_COLUMNS, TemporalAnnotation, TemporalAnnotation.annotation_id, ids)
+                bboxes = _grouped(db, BBOX_COLUMNS, BoundingBoxAnnotation, BoundingBoxAnnotation.bbox_id, ids)
+                yield [(v, temporal.get(v.video_id, []), bboxes.get(v.video_id, [])) for v in window]
+    finally:
+        db.close()
+
+
+def _video_record(video, temporal, bboxes) -> dict:
+    return {
+        'video_id': video.video_id, 'filename': video.filename,
+        'resolution': video.resolution, 'framerate': video.framerate,
+        'duration': video.duration, 'status': video.status,
+        'temporal_annotations': [{
+            'label': a.label, 'frame_index': a.frame_index,
+            'start_time': a.start_time, 'end_time': a.end_time,
+            'start_frame': a.start_frame, 'end_frame': a.end_frame, 'annotator_name': a.annotator_name,
+        } for a in temporal],
+        'bounding_box_annotations': [{
+            'frame_index': b.frame_index, 'x': b.x, 'y': b.y,
+            'width': b.width, 'height': b.height,
+            'part_label': b.part_label, 'annotator_name': b.annotator_name,
+        } for b in bboxes],
+    }
+
+
+def _csv_rows(video, temporal, bboxes):
+    for a in temporal:
+        yield [video.video_id, video.filename, video.resolution, video.framerate, video.duration, 'temporal',
+               a.label, a.start_time, a.end_time, a.start_frame, a.end_frame,
+               '', '', '', '', '', '', a.annotator_name]
+    for b in bboxes:
+        yield [video.video_id, video.filename, video.resolution, video.framerate, video.duration, 'bounding_box',
+               '', '', '', '', '', b.frame_index, b.x, b.y, b.width, b.height, b.part_label, b.annotator_name]
+
+
+def stream_export(fmt: str, only_confirmed: bool = True):
+    """Encoded chunks of a per-video export, one chunk per window."""
+    if fmt == 'csv':
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(CSV_HEADER)
+        for window in video_windows(only_confirmed):
+            for entry in window:
+                writer.writerows(_csv_rows(*entry))
+            yield buf.getvalue().encode()
+            buf.seek(0)
+            buf.truncate()
+        if buf.tell():
+            yield buf.getvalue().encode()
+    elif fmt == 'jsonl':
+        for window in video_windows(only_confirmed):
+            yield ''.join(json.dumps(_video_record(*entry)) + '\n' for entry in window).encode()
+    else:
+        separator = '['
+        for window in video_windows(only_confirmed):
+            yield (separator + ','.join(json.dumps(_video_record(*entry)) for entry in window)).encode()
+            separator = ','
+        yield b'[]' if separator == '[' else b']'
+
+
+def _json_array(db, name: str, columns, key, first: bool):
+    yield f'{"" if first else ","}{json.dumps(name)}:['.encode()
+    separator = ''
+    for rows in _keyset(db, columns, key, ROW_WINDOW):
+        yield (separator + ','.join(json.dumps(dict(r._mapping)) for r in rows)).encode()
+        separator = ','
+    yield b']'
+
+
+def stream_tables():
+    """Every temporal and bounding-box annotation as one JSON object, streamed in keyset windows."""
+    db = database.ReadSessionLocal()
+    try:
+        yield b'{'
+        yield from _json_array(db, 'temporal_annotations', (
+            TemporalAnnotation.annotation_id, TemporalAnnotation.video_id,
+            TemporalAnnotation.start_time, TemporalAnnotation.end_time,
+            TemporalAnnotation.start_frame, TemporalAnnotation.end_frame,
+            TemporalAnnotation.label, TemporalAnnotation.annotator_name, TemporalAnnotation.frame_index,
+        ), TemporalAnnotation.annotation_id, first=True)
+        yield from _json_array(db, 'bounding_box_annotations', (
+            BoundingBoxAnnotation.bbox_id, BoundingBoxAnnotation.video_id,
+            BoundingBoxAnnotation.frame_index, BoundingBoxAnnotation.x, BoundingBoxAnnotation.y,
+            BoundingBoxAnnotation.width, BoundingBoxAnnotation.height,
+            BoundingBoxAnnotation.part_label, BoundingBoxAnnotation.annotator_name,
+        ), BoundingBoxAnnotation.bbox_id, first=False)
+        yield b'}'
+    finally:
+        db.close()
@@ -0,0 +1,226 @@
+"""Per-video keyframe and presentation-timestamp index.
+
+Built once per file (keyed by path, size and mtime) from ffprobe's packet
+list and stored as a small ``.npz`` in ``settings.index_cache``. The decoder
+pool uses it to seek to the keyframe preceding a target frame and decode
+forward, and the frame-index API uses it for exact frame <-> time mapping on
+variable-frame-rate sources.
+"""
+
+import logging
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from ..config import settings
+from .disk_cache import DiskCache
+from .transcode import FFPROBE_BIN
+
+logger = logging.getLogger(__name__)
+
+MAX_LOADED_INDEXES = 64
+
+
+class FrameIndex:
+    """Presentation timestamps (seconds) per frame and sorted keyframe positions."""
+
+    def __init__(self, pts: np.ndarray, keyframes: np.ndarray):
+        self.pts = pts
+        self.keyframes = keyframes
+
+    @property
+    def frame_count(self) -> int:
+        return len(self.pts)
+
+    @property
+    def duration(self) -> float:
+        if len(self.pts) < 2:
+            return 0.0
+        return float(self.pts[-1] - self.pts[0] + (self.pts[-1] - self.pts[-2]))
+
+    @property
+    def is_vfr(self) -> bool:
+        if len(self.pts) < 3:
+            return False
+        deltas = np.diff(self.pts)
+        return bool(deltas.max() - deltas.min() > 0.5 * np.median(deltas))
+
+    def frame_to_time(self, frame_number: int) -> float | None:
+        if 0 <= frame_number < len(self.pts):
+            return float(self.pts[frame_number] - self.pts[0])
+        return None
+
+    def time_to_frame(self, seconds: float) -> int | None:
+        """The frame on screen at ``seconds`` from the start of the stream."""
+        if not len(self.pts):
+            return None
+        i = int(np.searchsorted(self.pts - self.pts[0], seconds, side='right')) - 1
+        return min(max(i, 0), len(self.pts) - 1)
+
+    def keyframe_before(self, frame_number: int) -> int | None:
+        """Nearest keyframe at or before ``frame_number`` (None if keyframes are unknown)."""
+        if not len(self.keyframes):
+            return None
+        i = int(np.searchsorted(self.keyframes, frame_number, side='right')) - 1
+        return int(self.keyframes[max(i, 0)])
+
+
+index_store = DiskCache(settings.index_cache, settings.index_cache_max_bytes, '.npz')
+_loaded: OrderedDict[str, FrameIndex] = OrderedDict()
+_loaded_lock = threading.Lock()
+_builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="frame-index")
+_pending: dict[str, list] = {}  # index key -> callbacks waiting for the build
+
+
+def _index_key(video_path: str) -> str | None:
+    try:
+        st = os.stat(video_path)
+    except OSError:
+        return None
+    return index_store.make_key(os.path.realpath(video_path), st.st_size, st.st_mtime_ns)
+
+
+def _probe_packets(video_path: str) -> FrameIndex | None:
+    """Read packet timestamps and keyframe flags without decoding."""
+    try:
+        output = subprocess.check_output(
+            [
+                FFPROBE_BIN, '-v', 'error', '-select_streams', 'v:0',
+                '-show_entries', 'packet=pts_time,dts_time,flags',
+                '-of', 'csv=p=0', video_path,
+            ],
+            stderr=subprocess.DEVNULL, universal_newlines=True, timeout=settings.index_build_timeout,
+        )
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, FileNotFoundError, PermissionError):
+        return None
+
+    times, key_flags = [], []
+    for line in output.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) < 3:
+            continue
+        ts = parts[0] if parts[0] not in ('', 'N/A') else parts[1]
+        try:
+            times.append(float(ts))
+        except ValueError:
+            continue
+        key_flags.append('K' in parts[-1])
+    if not times:
+        return None
+
+    # Packets arrive in decode order; frames are numbered in presentation order
+    times = np.asarray(times, dtype=np.float64)
+    order = np.argsort(times, kind='stable')
+    is_key = np.asarray(key_flags, dtype=bool)[order]
+    return FrameIndex(times[order], np.flatnonzero(is_key).astype(np.int32))
+
+
+def _scan_with_opencv(video_path: str) -> FrameIndex | None:
+    """Fallback without ffprobe: timestamps only, keyframes unknown."""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+    times = []
+    while cap.grab():
+        times.append(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0)
+    cap.release()
+    if not times:
+        return None
+    return FrameIndex(np.asarray(times, dtype=np.float64), np.zeros(0, dtype=np.int32))
+
+
+def _remember(key: str, index: FrameIndex):
+    with _loaded_lock:
+        _loaded[key] = index
+        _loaded.move_to_end(key)
+        while len(_loaded) > MAX_LOADED_INDEXES:
+            _loaded.popitem(last=False)
+
+
+def get_frame_index(video_path: str, build: bool = False) -> FrameIndex | None:
+    """Load the index for a video, building it synchronously if ``build`` is set."""
+    key = _index_key(video_path)
+    if key is None:
+        return None
+    with _loaded_lock:
+        index = _loaded.get(key)
+    if index is not None:
+        return index
+
+    stored = index_store.get(key)
+    if stored:
+        try:
+            with np.load(stored) as data:
+                index = FrameIndex(data['pts'], data['keyframes'])
+            _remember(key, index)
+            return index
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Discarding unreadable frame index %s: %s", stored, e)
+            index_store.discard(key)
+
+    if not build:
+        return None
+    return build_frame_index(video_path)
+
+
+def build_frame_index(video_path: str) -> FrameIndex | None:
+    key = _index_key(video_path)
+    if key is None:
+        return None
+    index = _probe_packets(video_path) or _scan_with_opencv(video_path)
+    if index is None:
+        return None
+
+    tmp_path = index_store.path_for(key) + f".{threading.get_ident()}.part"
+    os.makedirs(index_store.directory, exist_ok=True)
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, pts=index.pts, keyframes=index.keyframes)
+    index_store.commit(key, tmp_path)
+    _remember(key, index)
+    logger.info("Indexed %s: %d frames, %d keyframes", video_path, index.frame_count, len(index.keyframes))
+    return index
+
+
+def ensure_frame_index(video_path: str, on_built=None) -> FrameIndex | None:
+    """Return the index if it exists, otherwise queue a background build and return None.
+
+    ``on_built`` is called with the index once a queued build finishes.
+    """
+    index = get_frame_index(video_path)
+    if index is not None:
+        return index
+    key = _index_key(video_path)
+    with _loaded_lock:
+        if key is None:
+            return None
+        waiting = _pending.get(key)
+        if waiting is not None:
+            if on_built is not None:
+                waiting.append(on_built)
+            return None
+        _pending[key] = [on_built] if on_built is not None else []
+
+    def _build():
+        index = None
+        try:
+            index = build_frame_index(video_path)
+        except Exception as e:
+            logger.error("Frame index build failed for %s: %s", video_path, e)
+        finally:
+            with _loaded_lock:
+                callbacks = _pending.pop(key, [])
+        if index is None:
+            return
+        for callback in callbacks:
+            try:
+                callback(index)
+            except Exception as e:
+                logger.error("Frame index callback failed for %s: %s", video_path, e)
+
+    _builder.submit(_build)
+    return None
@@ -0,0 +1,108 @@
+"""On-demand HLS streaming: a VOD playlist whose segments are transcoded lazily.
+
+Only the segments the player actually requests are encoded, each one cached
+on its own, so a long recording is playable within seconds and footage nobody
+watches is never transcoded.
+"""
+
+import logging
+import math
+import os
+import subprocess
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+from ..config import settings
+from .disk_cache import DiskCache
+from .transcode import FFMPEG_BIN, available_cores
+
+logger = logging.getLogger(__name__)
+
+segment_cache = DiskCache(settings.hls_cache, settings.hls_cache_max_bytes, '.ts')
+
+# Separate from the transcode scheduler: a segment a player is waiting on must
+# never sit behind a whole-file transcode
+_executor = ThreadPoolExecutor(max_workers=settings.hls_workers, thread_name_prefix="hls")
+THREADS_PER_SEGMENT = max(2, available_cores() // 4)
+
+_segment_locks: dict[str, threading.Lock] = {}
+_segment_locks_guard = threading.Lock()
+
+
+def segment_count(duration: float) -> int:
+    return max(1, math.ceil(duration / settings.hls_segment_seconds))
+
+
+def build_playlist(duration: float) -> str:
+    seconds = settings.hls_segment_seconds
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{seconds}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+    ]
+    for n in range(segment_count(duration)):
+        length = min(seconds, duration - n * seconds) if duration > 0 else seconds
+        lines.append(f"#EXTINF:{length:.3f},")
+        lines.append(f"seg_{n}.ts")
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+def _segment_lock(key: str) -> threading.Lock:
+    with _segment_locks_guard:
+        return _segment_locks.setdefault(key, threading.Lock())
+
+
+def _encode(video_path: str, start: float, seconds: int, tmp_path: str):
+    subprocess.run(
+        [
+            FFMPEG_BIN, "-ss", str(start), "-i", video_path, "-t", str(seconds),
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-pix_fmt", "yuv420p",
+            "-threads", str(THREADS_PER_SEGMENT),
+            "-c:a", "aac", "-ac", "2",
+            "-output_ts_offset", str(start),
+            "-f", "mpegts", "-y", tmp_path,
+        ],
+        check=True, capture_output=True, timeout=settings.hls_segment_timeout,
+    )
+
+
+def get_segment(video_path: str, segment: int) -> str | None:
+    """Path of the cached MPEG-TS segment, encoding it first if needed."""
+    try:
+        st = os.stat(video_path)
+    except OSError:
+        return None
+    seconds = settings.hls_segment_seconds
+    key = segment_cache.make_key(os.path.realpath(video_path), st.st_size, st.st_mtime_ns, segment, seconds)
+
+    cached = segment_cache.get(key)
+    if cached:
+        return cached
+
+    # Concurrent requests for the same segment wait for one encode
+    lock = _segment_lock(key)
+    with lock:
+        cached = segment_cache.get(key)
+        if cached:
+            return cached
+        tmp_path = segment_cache.path_for(key) + f".{threading.get_ident()}.part"
+        start = segment * seconds
+        try:
+            _executor.submit(_encode, video_path, start, seconds, tmp_path).result()
+            return segment_cache.commit(key, tmp_path)
+        except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired, OSError,
+                RuntimeError, CancelledError) as e:  # RuntimeError, CancelledError: pool shut down
+            logger.error("HLS segment %d failed for %s: %s", segment, video_path, e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+        finally:
+            with _segment_locks_guard:
+                _segment_locks.pop(key, None)
+
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
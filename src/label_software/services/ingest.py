@@ -0,0 +1,156 @@
+"""Hot-folder ingestion.
+
+Files copied (e.g. rsync'd) into ``settings.ingest_folder`` are registered
+in place as ``Video`` rows once they have stopped growing, then go through
+the normal processing pipeline. Files directly in the folder are global;
+files under a first-level subdirectory named after a project's id or name
+are added to that project.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
+
+from .. import database
+from ..config import settings
+from ..models import Project, Video
+from .pipeline import register_uploads
+from .video_processing import allowed_file
+
+logger = logging.getLogger(__name__)
+
+QUERY_BATCH = 500  # paths per IN (...) lookup, well under SQLite's variable limit
+
+
+class IngestWatcher(FileSystemEventHandler):
+    """Tracks candidate files from filesystem events and registers them once settled."""
+
+    def __init__(self, root: str, settle_seconds: int, poll_interval: int, polling: bool = False):
+        self.root = os.path.abspath(root)
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self._observer = PollingObserver(timeout=poll_interval) if polling else Observer()
+        self._candidates = {}  # path -> (size, mtime_ns, unchanged since)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # Filesystem events only nominate paths; settling is decided by stat in check()
+    def on_created(self, event):
+        if not event.is_directory:
+            self._note(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._note(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self._note(event.dest_path)
+
+    def _note(self, path: str):
+        name = os.path.basename(path)
+        if name.startswith('.') or not allowed_file(name):
+            return  # rsync/scp temp files are dotfiles until renamed into place
+        with self._lock:
+            self._candidates.setdefault(os.path.abspath(path), None)
+
+    def start(self):
+        os.makedirs(self.root, exist_ok=True)
+        # Observe first so nothing arriving during the rescan is missed
+        self._observer.schedule(self, self.root, recursive=True)
+        self._observer.start()
+        self._thread = threading.Thread(target=self._run, name="ingest", daemon=True)
+        self._thread.start()
+        logger.info("Watching %s for new videos", self.root)
+
+    def _rescan(self):
+        """Nominate anything that arrived while the server was down; walks the whole tree."""
+        for dirpath, _, filenames in os.walk(self.root):
+            if self._stop.is_set():
+                return
+            for name in filenames:
+                self._note(os.path.join(dirpath, name))
+
+    def stop(self):
+        self._stop.set()
+        self._observer.stop()
+
+    def _run(self):
+        # On this thread rather than in start(), so server startup doesn't wait on a large tree
+        try:
+            self._rescan()
+        except Exception as e:
+            logger.error("Ingest rescan of %s failed: %s", self.root, e)
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error("Ingest check failed: %s", e)
+
+    def check(self) -> int:
+        """Register every candidate that has not changed for ``settle_seconds``."""
+        now = time.time()
+        settled = []
+        with self._lock:
+            for path, seen in list(self._candidates.items()):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    del self._candidates[path]  # renamed or removed before settling
+                    continue
+                if seen is None or seen[:2] != (st.st_size, st.st_mtime_ns):
+                    self._candidates[path] = (st.st_size, st.st_mtime_ns, now)
+                elif now - seen[2] >= self.settle_seconds:
+                    settled.append(path)
+                    del self._candidates[path]
+        return self._register(settled) if settled else 0
+
+    def _project_key(self, path: str) -> str | None:
+        parts = os.path.relpath(path, self.root).split(os.sep)
+        return parts[0] if len(parts) > 1 else None
+
+    def _register(self, paths: list[str]) -> int:
+        db = database.SessionLocal()
+        try:
+            known = set()
+            for i in range(0, len(paths), QUERY_BATCH):
+                batch = paths[i:i + QUERY_BATCH]
+                known.update(p for (p,) in db.query(Video.storage_path).filter(Video.storage_path.in_(batch)))
+            groups = {}
+            for path in paths:
+                if path not in known:
+                    groups.setdefault(self._project_key(path), []).append(path)
+
+            registered = 0
+            for key, group in groups.items():
+                project = None
+                if key is not None:
+                    project = (db.get(Project, int(key)) if key.isdigit() else None) or \
+                        db.query(Project).filter_by(name=key).first()
+                    if project is None:
+                        logger.warning("Ingest folder %s matches no project; adding %d videos unassigned",
+                                       key, len(group))
+                # One transaction per project group
+                register_uploads(db, [{
+                    'filename': os.path.basename(path), 'content_hash': None,
+                    'storage_path': path, 'source_type': 'ingest',
+                } for path in group], project)
+                registered += len(group)
+            if registered:
+                logger.info("Ingested %d videos from %s", registered, self.root)
+            return registered
+        finally:
+            db.close()
+
+
+def create_watcher() -> IngestWatcher | None:
+    if not settings.ingest_folder:
+        return None
+    return IngestWatcher(settings.ingest_folder, settings.ingest_settle_seconds,
+                         settings.ingest_poll_interval, settings.ingest_polling_observer)
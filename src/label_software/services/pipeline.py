@@ -0,0 +1,136 @@
+"""Post-upload processing pipeline.
+
+Uploads return as soon as the file is on disk with the video marked
+``pending``. A bounded pool then probes the file and, when the planner asks
+for it, waits on the transcode scheduler, moving the video through
+``processing`` to ``ready`` or ``failed``.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .. import database
+from ..config import settings
+from ..models import Video
+from .probe import get_probe, probe_video, record_transcode_plan
+from .transcode import FFMPEG_BIN, cache_key_for, plan_transcode, scheduler, transcode_cache
+from .video_processing import resolve_video_path
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATES = ('pending', 'processing')
+
+
+class ProcessingPipeline:
+    """Runs post-upload processing on a bounded pool, one job per video at a time."""
+
+    def __init__(self, max_workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline")
+        self._jobs = {}  # video_id -> Future
+        self._lock = threading.Lock()
+
+    def submit(self, video_id: int):
+        with self._lock:
+            job = self._jobs.get(video_id)
+            if job is not None:
+                return job
+            job = self._executor.submit(self._run, video_id)
+            self._jobs[video_id] = job
+            return job
+
+    def resume(self):
+        """Requeue videos left pending or processing by a previous server run."""
+        db = database.SessionLocal()
+        try:
+            ids = [v for (v,) in db.query(Video.video_id).filter(Video.processing_status.in_(ACTIVE_STATES))]
+        finally:
+            db.close()
+        for video_id in ids:
+            self.submit(video_id)
+        if ids:
+            logger.info("Resumed processing for %d videos", len(ids))
+
+    def _set_status(self, db, video, status, error=None):
+        video.processing_status = status
+        video.processing_error = error
+        db.commit()
+
+    def _run(self, video_id: int):
+        db = database.SessionLocal()
+        try:
+            video = db.get(Video, video_id)
+            if video is None:
+                return
+            self._set_status(db, video, 'processing')
+            video_path = resolve_video_path(video)
+
+            try:
+                probe_video(video, video_path)
+                db.commit()
+                info = get_probe(video_path)
+                if info is None:
+                    self._set_status(db, video, 'failed', "File could not be read")
+                    return
+
+                plan = plan_transcode(info)
+                record_transcode_plan(info, plan)
+                key = cache_key_for(video_path)
+                if plan["action"] != "direct" and os.path.isfile(FFMPEG_BIN) and not transcode_cache.get(key):
+                    # On the transcode pool; playback meanwhile streams HLS segments from their own pool
+                    scheduler.submit(video_path, key, plan["args"]).result()
+                    if scheduler.status(key) == "failed":
+                        self._set_status(db, video, 'failed', scheduler.error(key))
+                        return
+                self._set_status(db, video, 'ready')
+            except Exception as e:
+                logger.error("Processing failed for video %s: %s", video_id, e)
+                db.rollback()
+                self._set_status(db, video, 'failed', str(e))
+        finally:
+            db.close()
+            with self._lock:
+                self._jobs.pop(video_id, None)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+pipeline = ProcessingPipeline(settings.processing_workers)
+
+
+def register_uploads(db, stored: list[dict], project=None) -> list[Video]:
+    """Create Video rows for blobs from ``blob_store`` (or in-place ingests) and queue the ones that need processing.
+
+    A duplicate of an already-processed blob is linked to the existing probe
+    and metadata and marked ready immediately.
+    """
+    videos, queued = [], []
+    for blob in stored:
+        video = Video(filename=blob['filename'], project_id=project.project_id if project else None,
+                      content_hash=blob['content_hash'], storage_path=blob['storage_path'],
+                      source_type=blob.get('source_type', 'upload'), processing_status='pending')
+        original = None
+        if blob.get('duplicate'):
+            original = (db.query(Video)
+                        .filter_by(content_hash=blob['content_hash'], processing_status='ready')
+                        .first())
+        if original is not None:
+            video.probe_id = original.probe_id
+            video.resolution, video.framerate, video.duration = original.resolution, original.framerate, original.duration
+            video.processing_status = 'ready'
+        else:
+            queued.append(video)
+        videos.append(video)
+
+    db.add_all(videos)
+    if project and videos:
+        db.flush()
+        project.total_videos = db.query(Video).filter_by(project_id=project.project_id).count()
+        project.last_activity = datetime.utcnow()
+    db.commit()
+    for video in queued:
+        pipeline.submit(video.video_id)
+    return videos
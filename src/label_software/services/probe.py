@@ -0,0 +1,278 @@
+"""Persistent media probe records.
+
+One ffprobe run per file version captures everything playback, thumbnails
+and metadata need. Results are stored in ``media_probes`` keyed by path and
+validated against the file's size and mtime, with an in-process cache in
+front so hot paths don't touch the database either.
+"""
+
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import cv2
+from sqlalchemy.dialects.sqlite import insert
+
+from .. import database
+from ..models import MediaProbe
+from .frame_index import ensure_frame_index
+from .transcode import FFPROBE_BIN
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHED_PROBES = 1024
+# Packets read to measure the keyframe interval; enough for a few GOPs
+GOP_SAMPLE_PACKETS = 600
+
+_cache: OrderedDict[tuple, dict] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _parse_rate(value) -> float:
+    if not value or value in ('0/0', 'N/A'):
+        return 0.0
+    if '/' in value:
+        num, den = value.split('/', 1)
+        try:
+            return float(num) / float(den) if float(den) else 0.0
+        except ValueError:
+            return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+def _to_int(value) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value) -> float | None:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _run_ffprobe(video_path: str) -> dict | None:
+    try:
+        output = subprocess.check_output(
+            [
+                FFPROBE_BIN, '-v', 'error',
+                '-read_intervals', f'%+#{GOP_SAMPLE_PACKETS}',
+                '-show_entries',
+                'format=format_name,duration,bit_rate'
+                ':stream=index,codec_type,codec_name,pix_fmt,width,height,nb_frames,'
+                'avg_frame_rate,r_frame_rate,duration,bit_rate'
+                ':packet=stream_index,flags',
+                '-of', 'json', video_path,
+            ],
+            stderr=subprocess.DEVNULL, universal_newlines=True, timeout=30,
+        )
+        data = json.loads(output)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, FileNotFoundError,
+            PermissionError, json.JSONDecodeError):
+        return None
+
+    streams = data.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    if video is None:
+        return None
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+    fmt = data.get('format', {})
+
+    # Keyframe interval from the sampled packets of the video stream
+    key_positions = []
+    count = 0
+    for packet in data.get('packets', []):
+        if packet.get('stream_index') != video.get('index'):
+            continue
+        if 'K' in packet.get('flags', ''):
+            key_positions.append(count)
+        count += 1
+    gaps = [b - a for a, b in zip(key_positions, key_positions[1:])]
+
+    avg_rate = _parse_rate(video.get('avg_frame_rate'))
+    duration = _to_float(video.get('duration')) or _to_float(fmt.get('duration')) or 0.0
+    frame_count = _to_int(video.get('nb_frames'))
+    estimated = not frame_count
+    if estimated:
+        # MKV/AVI headers often omit it; counting packets means a full demux,
+        # so estimate here and let get_probe correct it from the frame index
+        frame_count = int(round(duration * avg_rate))
+
+    return {
+        'container': fmt.get('format_name'),
+        'video_codec': video.get('codec_name'),
+        'audio_codec': audio.get('codec_name') if audio else None,
+        'pix_fmt': video.get('pix_fmt'),
+        'width': _to_int(video.get('width')) or 0,
+        'height': _to_int(video.get('height')) or 0,
+        'frame_count': frame_count,
+        'avg_frame_rate': avg_rate,
+        'r_frame_rate': _parse_rate(video.get('r_frame_rate')),
+        'duration': duration,
+        'bit_rate': _to_int(fmt.get('bit_rate')) or _to_int(video.get('bit_rate')),
+        'gop_size': max(gaps) if gaps else None,
+        'frame_count_estimated': estimated,
+    }
+
+
+def _run_opencv(video_path: str) -> dict | None:
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+    try:
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        framerate = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+    finally:
+        cap.release()
+    codec = ''.join(chr((fourcc >> 8 * i) & 0xFF) for i in range(4)).strip().lower() or None
+    return {
+        'container': os.path.splitext(video_path)[1].lstrip('.').lower() or None,
+        'video_codec': 'h264' if codec in ('avc1', 'h264', 'x264') else codec,
+        'audio_codec': None,
+        'pix_fmt': None,
+        'width': width,
+        'height': height,
+        'frame_count': frame_count,
+        'avg_frame_rate': framerate if framerate > 0 else 0.0,
+        'r_frame_rate': framerate if framerate > 0 else 0.0,
+        'duration': frame_count / framerate if framerate > 0 else 0.0,
+        'bit_rate': None,
+        'gop_size': None,
+    }
+
+
+def probe_file(video_path: str) -> dict | None:
+    """Probe a file directly, with no caching."""
+    if not shutil.which(FFPROBE_BIN) and not os.path.isfile(FFPROBE_BIN):
+        logger.warning("FFprobe not found. Using OpenCV for metadata extraction.")
+        return _run_opencv(video_path)
+    return _run_ffprobe(video_path) or _run_opencv(video_path)
+
+
+def _remember(key: tuple, info: dict):
+    with _cache_lock:
+        _cache[key] = info
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHED_PROBES:
+            _cache.popitem(last=False)
+
+
+def get_probe(video_path: str) -> dict | None:
+    """Probe record for the current version of a file, probing only if it changed.
+
+    Returns a plain dict (including ``probe_id``) or None if the file can't be read.
+    """
+    path = os.path.realpath(video_path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (path, st.st_size, st.st_mtime_ns)
+    with _cache_lock:
+        info = _cache.get(key)
+    if info is not None:
+        return info
+
+    # Own short-lived session, so probing never commits a caller's pending changes
+    db = database.SessionLocal()
+    try:
+        row = db.query(MediaProbe).filter_by(path=path).first()
+        if row is not None and row.size == st.st_size and row.mtime_ns == st.st_mtime_ns:
+            info = row.to_dict()
+            _remember(key, info)
+            return info
+
+        probed = probe_file(path)
+        if probed is None:
+            return None
+        estimated = probed.pop('frame_count_estimated', False)
+        values = {'path': path, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                  'probed_at': datetime.utcnow(), 'transcode_plan': None, **probed}
+        stmt = insert(MediaProbe).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[MediaProbe.path],
+            set_={k: v for k, v in values.items() if k != 'path'},
+        )
+        db.execute(stmt)
+        db.commit()
+        info = db.query(MediaProbe).filter_by(path=path).first().to_dict()
+        _remember(key, info)
+    finally:
+        db.close()
+
+    if estimated:
+        index = ensure_frame_index(path, on_built=lambda index: _exact_frame_count(key, index.frame_count))
+        if index is not None:
+            _exact_frame_count(key, index.frame_count)
+    return info
+
+
+def _exact_frame_count(key: tuple, frame_count: int):
+    """Replace an estimated frame count with the frame index's exact one."""
+    path, size, mtime_ns = key
+    db = database.SessionLocal()
+    try:
+        db.query(MediaProbe).filter_by(path=path, size=size, mtime_ns=mtime_ns).update({'frame_count': frame_count})
+        db.commit()
+    finally:
+        db.close()
+    with _cache_lock:
+        info = _cache.get(key)
+        if info is not None:
+            info['frame_count'] = frame_count
+
+
+def record_transcode_plan(info: dict | None, plan: dict):
+    """Store the planner's decision on the probe row so it can be inspected later."""
+    if not info or (info.get('transcode_plan') or {}).get('args') == plan['args']:
+        return
+    plan = {**plan, 'decided_at': datetime.utcnow().isoformat()}
+    db = database.SessionLocal()
+    try:
+        db.query(MediaProbe).filter_by(probe_id=info['probe_id']).update({'transcode_plan': plan})
+        db.commit()
+    finally:
+        db.close()
+    info['transcode_plan'] = plan
+    logger.info("Transcode plan for %s: %s (%s)", info['path'], plan['action'], plan['reason'])
+
+
+def metadata_from_probe(info: dict | None) -> dict:
+    """The legacy metadata shape used by uploads, imports and Video rows."""
+    if not info:
+        return {'resolution': 'unknown', 'width': 0, 'height': 0, 'framerate': 0, 'duration': 0}
+    width, height = info.get('width') or 0, info.get('height') or 0
+    framerate = info.get('avg_frame_rate') or 0
+    return {
+        'resolution': f"{width}x{height}" if width and height else "unknown",
+        'width': width,
+        'height': height,
+        'framerate': round(framerate, 2) if framerate > 0 else 0,
+        'duration': info.get('duration') or 0,
+    }
+
+
+def probe_video(video, video_path: str) -> dict:
+    """Probe a Video's file, link the record and refresh its metadata columns."""
+    info = get_probe(video_path)
+    metadata = metadata_from_probe(info)
+    if info:
+        video.probe_id = info['probe_id']
+    video.resolution = metadata['resolution']
+    video.framerate = metadata['framerate']
+    video.duration = metadata['duration']
+    return metadata
@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
-from ..models import Project, Video, TemporalAnnotation, BoundingBoxAnnotation, ProjectStatus
+from ..models import Project, Video, ProjectStatus
+from . import counters
 from datetime import datetime
 
 
@@ -18,19 +19,13 @@ class ProjectService:
         if not project:
             return None
 
-        videos = db.query(Video).filter_by(project_id=project_id).all()
-        video_ids = [v.video_id for v in videos]
-
-        t_count = db.query(TemporalAnnotation).filter(TemporalAnnotation.video_id.in_(video_ids)).count() if video_ids else 0
-        b_count = db.query(BoundingBoxAnnotation).filter(BoundingBoxAnnotation.video_id.in_(video_ids)).count() if video_ids else 0
-        completed = sum(1 for v in videos if v.is_completed)
-
         return {
-            'total_videos': len(videos),
-            'completed_videos': completed,
-            'total_temporal_annotations': t_count,
-            'total_bbox_annotations': b_count,
-            'completion_percentage': round((completed / len(videos)) * 100, 1) if videos else 0,
+            'total_videos': project.total_videos,
+            'completed_videos': project.completed_videos,
+            'annotated_videos': project.annotated_videos,
+            'total_temporal_annotations': project.temporal_count,
+            'total_bbox_annotations': project.bbox_count,
+            'completion_percentage': project.get_progress_percentage(),
         }
 
     @staticmethod
@@ -40,13 +35,15 @@ class ProjectService:
             return 0, 'Project not found'
 
         count = 0
+        affected = {project_id}
         for vid in video_ids:
             video = db.get(Video, vid)
             if video:
+                affected.add(video.project_id)
                 video.project_id = project_id
                 count += 1
 
-        project.total_videos = db.query(Video).filter_by(project_id=project_id).count()
+        counters.refresh_projects(db, affected)
         project.last_activity = datetime.utcnow()
         db.commit()
         return count, None
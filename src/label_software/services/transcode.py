@@ -1,67 +1,235 @@
-"""Lazy non-H264 → H.264 MP4 transcoder with disk cache."""
+"""Lazy non-H264 → H.264 MP4 transcoder with disk cache.
 
-import hashlib
+Transcodes run on a bounded background pool so a request never blocks on
+ffmpeg: callers get ``None`` from ``get_playable_path`` while the job is in
+flight and should tell the client to retry.
+"""
+
+import logging
 import os
 import shutil
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from ..config import settings
+from .disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
 
 # Try to find ffmpeg - check common HPC module paths
 FFMPEG_BIN = shutil.which("ffmpeg") or "/apps/arch/software/FFmpeg/7.1.2-GCCcore-14.3.0/bin/ffmpeg"
+FFPROBE_BIN = shutil.which("ffprobe") or os.path.join(os.path.dirname(FFMPEG_BIN), "ffprobe")
+
 
+# What browsers can play from a progressive MP4
+BROWSER_VIDEO_CODECS = {"h264"}
+BROWSER_PIX_FMTS = {"yuv420p", "yuvj420p"}
+BROWSER_AUDIO_CODECS = {"aac", "mp3"}
 
-def _is_h264(video_path: str) -> bool:
-    """Check if a video file is already H.264 encoded."""
+
+def available_cores() -> int:
+    # Respects SLURM/cgroup CPU binding, unlike os.cpu_count()
     try:
-        result = subprocess.run(
-            [FFMPEG_BIN, "-i", video_path],
-            capture_output=True, text=True, timeout=10,
-        )
-        # ffmpeg prints codec info to stderr
-        return "h264" in result.stderr.lower()
-    except Exception:
-        return False
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
 
 
-def get_playable_path(video_path: str) -> str:
-    """Return a browser-playable path for the video. Transcodes and caches if needed."""
-    if not os.path.isfile(video_path):
-        return video_path
+def _encode_preset(height: int) -> str:
+    """Trade compression for speed as resolution (and encode cost) grows."""
+    if height and height > 1080:
+        return "veryfast"
+    if height and height > 720:
+        return "faster"
+    return "fast"
 
-    # Check cache first (fast path)
-    cache_dir = settings.transcode_cache
-    os.makedirs(cache_dir, exist_ok=True)
-    cache_key = hashlib.md5(video_path.encode()).hexdigest()
-    cached_path = os.path.join(cache_dir, f"{cache_key}.mp4")
 
-    if os.path.exists(cached_path) and os.path.getsize(cached_path) > 0:
-        return cached_path
+def plan_transcode(info: dict | None) -> dict:
+    """Pick the cheapest way to make a file browser-playable.
 
-    # Check if already H.264 -- no transcode needed
-    if _is_h264(video_path):
-        return video_path
+    Actions, cheapest first: ``direct`` (serve as-is), ``remux`` (copy streams
+    into MP4), ``audio`` (copy video, re-encode audio), ``video`` (full
+    re-encode). ``args`` are the ffmpeg output options for the chosen action.
+    """
+    if not info:
+        return {
+            "action": "video", "reason": "file could not be probed",
+            "args": ["-c:v", "libx264", "-preset", "fast", "-crf", "23", "-pix_fmt", "yuv420p", "-c:a", "aac"],
+        }
+
+    containers = set((info.get("container") or "").split(","))
+    in_mp4 = "mp4" in containers or "mov" in containers
+    video_ok = info.get("video_codec") in BROWSER_VIDEO_CODECS and (
+        info.get("pix_fmt") is None or info.get("pix_fmt") in BROWSER_PIX_FMTS
+    )
+    audio_ok = info.get("audio_codec") is None or info.get("audio_codec") in BROWSER_AUDIO_CODECS
+    audio_args = ["-c:a", "copy"] if audio_ok else ["-c:a", "aac"]
+
+    if video_ok and audio_ok and in_mp4:
+        return {"action": "direct", "reason": "browser-compatible MP4", "args": []}
+    if video_ok and audio_ok:
+        return {
+            "action": "remux", "reason": f"{info.get('video_codec')} in {info.get('container')} container",
+            "args": ["-c:v", "copy", *audio_args],
+        }
+    if video_ok:
+        return {
+            "action": "audio", "reason": f"unsupported audio codec {info.get('audio_codec')}",
+            "args": ["-c:v", "copy", *audio_args],
+        }
+    preset = _encode_preset(info.get("height") or 0)
+    return {
+        "action": "video",
+        "reason": f"unsupported video {info.get('video_codec')}/{info.get('pix_fmt')}, preset {preset}",
+        "args": ["-c:v", "libx264", "-preset", preset, "-crf", "23", "-pix_fmt", "yuv420p", *audio_args],
+    }
+
+
+class TranscodeScheduler:
+    """Runs transcodes on a bounded pool, one job per cache entry at a time."""
+
+    def __init__(self, max_workers: int, threads_per_job: int):
+        self.max_workers = max_workers
+        self.threads_per_job = threads_per_job
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transcode")
+        self._jobs = {}  # cache key -> Future
+        self._failed = {}  # cache key -> error message
+        self._lock = threading.Lock()
+
+    def submit(self, video_path: str, key: str, output_args: list[str]):
+        """Queue a transcode unless one for the same output is already running."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                return job
+            self._failed.pop(key, None)
+            job = self._executor.submit(self._run, video_path, key, output_args)
+            self._jobs[key] = job
+            return job
+
+    def status(self, key: str) -> str | None:
+        """'transcoding', 'failed', or None if no job is known."""
+        with self._lock:
+            if key in self._jobs:
+                return "transcoding"
+            if key in self._failed:
+                return "failed"
+        return None
+
+    def error(self, key: str) -> str | None:
+        with self._lock:
+            return self._failed.get(key)
+
+    def _run(self, video_path: str, key: str, output_args: list[str]):
+        try:
+            transcode_now(video_path, key, output_args, self.threads_per_job)
+        except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired, OSError) as e:
+            logger.error("Transcode failed for %s: %s", video_path, e)
+            with self._lock:
+                self._failed[key] = str(e)
+        finally:
+            with self._lock:
+                self._jobs.pop(key, None)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _make_scheduler() -> TranscodeScheduler:
+    cores = available_cores()
+    workers = settings.transcode_workers or max(1, cores // 4)
+    return TranscodeScheduler(workers, max(1, cores // workers))
 
-    # Transcode to H.264
-    if not os.path.isfile(FFMPEG_BIN):
-        return video_path
 
+scheduler = _make_scheduler()
+
+
+transcode_cache = DiskCache(settings.transcode_cache, settings.transcode_cache_max_bytes, ".mp4")
+
+
+def cache_key_for(video_path: str) -> str | None:
+    """Cache key for the current version of a source file; a replaced file gets a new key."""
+    try:
+        st = os.stat(video_path)
+    except OSError:
+        return None
+    return transcode_cache.make_key(os.path.realpath(video_path), st.st_size, st.st_mtime_ns)
+
+
+def transcode_now(video_path: str, key: str, output_args: list[str], threads: int) -> str:
+    """Run ffmpeg in the calling thread and commit the result to the cache."""
+    if transcode_cache.get(key):
+        return transcode_cache.path_for(key)  # finished by a job that completed just before this one
+    # Write beside the final file and rename, so readers never see a partial MP4
+    tmp_path = f"{transcode_cache.path_for(key)}.{os.getpid()}.{threading.get_ident()}.part"
+    os.makedirs(transcode_cache.directory, exist_ok=True)
     try:
         subprocess.run(
             [
                 FFMPEG_BIN, "-i", video_path,
-                "-c:v", "libx264", "-preset", "fast", "-crf", "23",
-                "-c:a", "aac", "-movflags", "faststart",
-                "-y", cached_path,
+                *output_args,
+                "-threads", str(threads),
+                "-movflags", "faststart",
+                "-f", "mp4", "-y", tmp_path,
             ],
             check=True,
             capture_output=True,
-            timeout=300,
+            timeout=settings.transcode_timeout,
         )
-    except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired):
-        # Clean up partial file
-        if os.path.exists(cached_path):
-            os.remove(cached_path)
+        cached_path = transcode_cache.commit(key, tmp_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    logger.info("Transcoded %s -> %s", video_path, cached_path)
+    return cached_path
+
+
+def get_playable_path(video_path: str, queue: bool = True) -> str | None:
+    """Return a browser-playable path for the video.
+
+    Returns None if a transcode has been queued or is still running; the
+    caller should ask the client to retry. With ``queue=False`` no transcode
+    is started, and None means the file needs one that hasn't finished.
+    """
+    if not os.path.isfile(video_path):
         return video_path
 
-    return cached_path
+    # Check cache first (fast path)
+    key = cache_key_for(video_path)
+    cached_path = transcode_cache.get(key)
+    if cached_path:
+        return cached_path
+
+    state = scheduler.status(key)
+    if state == "transcoding":
+        return None
+    if state == "failed":
+        return video_path  # best effort: serve the original
+
+    from .probe import get_probe, record_transcode_plan
+    info = get_probe(video_path)
+    plan = plan_transcode(info)
+    record_transcode_plan(info, plan)
+    if plan["action"] == "direct":
+        return video_path
+
+    if not os.path.isfile(FFMPEG_BIN):
+        return video_path
+
+    if queue:
+        scheduler.submit(video_path, key, plan["args"])
+    return None
+
+
+def transcode_status(video_path: str) -> dict:
+    """Playback readiness of a video without starting any work."""
+    key = cache_key_for(video_path)
+    if os.path.exists(transcode_cache.path_for(key)):
+        return {"status": "ready"}
+    state = scheduler.status(key)
+    if state == "transcoding":
+        return {"status": "transcoding", "retry_after": settings.transcode_retry_after}
+    if state == "failed":
+        return {"status": "failed", "error": scheduler.error(key)}
+    return {"status": "idle"}
@@ -0,0 +1,259 @@
+"""Resumable chunked uploads.
+
+A session is a JSON file plus a preallocated data file under
+``settings.upload_sessions_dir``. Chunks are written straight to their
+offsets in the data file as they stream in, so a dropped connection only
+costs the chunk in flight, and finalizing is a rename into the blob
+store rather than another copy. A finalized session keeps its outcome, so
+a client retrying ``complete`` after a timeout gets the same answer.
+Sessions idle for longer than ``settings.upload_session_ttl`` are
+garbage-collected.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+GC_INTERVAL = 600  # seconds between sweeps for stalled sessions
+
+_lock = threading.Lock()
+_last_gc = 0.0
+_finalizing: set[str] = set()  # upload ids being hashed and registered in this process
+
+
+class UploadError(Exception):
+    """Invalid request against an upload session; ``status`` is the HTTP code to report."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _meta_path(upload_id: str) -> str:
+    return os.path.join(settings.upload_sessions_dir, f"{upload_id}.json")
+
+
+def _data_path(upload_id: str) -> str:
+    return os.path.join(settings.upload_sessions_dir, f"{upload_id}.data")
+
+
+def _save(session: dict):
+    session['updated_at'] = time.time()
+    tmp_path = _meta_path(session['upload_id']) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(session, f)
+    os.replace(tmp_path, _meta_path(session['upload_id']))
+
+
+def load_session(upload_id: str) -> dict:
+    if not upload_id.isalnum():
+        raise UploadError(404, "Upload session not found")
+    try:
+        with open(_meta_path(upload_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        raise UploadError(404, "Upload session not found")
+
+
+def chunk_count(session: dict) -> int:
+    return max(1, -(-session['size'] // session['chunk_size']))
+
+
+def chunk_length(session: dict, index: int) -> int:
+    start = index * session['chunk_size']
+    return max(0, min(session['chunk_size'], session['size'] - start))
+
+
+def received_ranges(session: dict) -> list[list[int]]:
+    """Received bytes as merged ``[start, end)`` ranges."""
+    ranges = []
+    for index in sorted(session['received']):
+        start = index * session['chunk_size']
+        end = start + chunk_length(session, index)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return ranges
+
+
+def describe(session: dict) -> dict:
+    received = set(session['received'])
+    return {
+        'upload_id': session['upload_id'],
+        'filename': session['filename'],
+        'size': session['size'],
+        'chunk_size': session['chunk_size'],
+        'chunk_count': chunk_count(session),
+        'received_ranges': received_ranges(session),
+        'missing_chunks': [i for i in range(chunk_count(session)) if i not in received],
+        'project_id': session.get('project_id'),
+    }
+
+
+def create_session(filename: str, size: int, chunk_size: int | None = None, project_id: int | None = None) -> dict:
+    if size < 0 or size > settings.max_upload_size:
+        raise UploadError(413, f"File size must be between 0 and {settings.max_upload_size} bytes")
+    chunk_size = chunk_size or settings.upload_chunk_size
+    if chunk_size <= 0 or chunk_size > settings.upload_chunk_size * 4:
+        raise UploadError(400, "Invalid chunk size")
+
+    collect_stale_sessions()
+    os.makedirs(settings.upload_sessions_dir, exist_ok=True)
+    session = {
+        'upload_id': uuid.uuid4().hex,
+        'filename': filename,
+        'size': size,
+        'chunk_size': chunk_size,
+        'project_id': project_id,
+        'received': [],
+        'checksums': {},
+        'created_at': time.time(),
+    }
+    # Sparse preallocation: chunks land at their final offsets in any order
+    with open(_data_path(session['upload_id']), 'wb') as f:
+        f.truncate(size)
+    with _lock:
+        _save(session)
+    return session
+
+
+def write_chunk(upload_id: str, index: int, pieces, expected_sha256: str | None = None) -> dict:
+    """Write one chunk from an iterable of byte strings at its offset; returns the updated session."""
+    session = load_session(upload_id)
+    if session.get('assembled'):
+        raise UploadError(409, "Upload already finalized")
+    if not 0 <= index < chunk_count(session):
+        raise UploadError(416, f"Chunk index {index} out of range")
+
+    offset = index * session['chunk_size']
+    length = chunk_length(session, index)
+    digest = hashlib.sha256()
+    written = 0
+    fd = os.open(_data_path(upload_id), os.O_WRONLY)
+    try:
+        for piece in pieces:
+            if written + len(piece) > length:
+                raise UploadError(400, f"Chunk {index} exceeds its {length} bytes")
+            os.pwrite(fd, piece, offset + written)
+            digest.update(piece)
+            written += len(piece)
+    finally:
+        os.close(fd)
+
+    if written != length:
+        raise UploadError(400, f"Chunk {index} has {written} bytes, expected {length}")
+    checksum = digest.hexdigest()
+    if expected_sha256 and expected_sha256.lower() != checksum:
+        # Left unmarked: the client resends and the bytes are overwritten
+        raise UploadError(422, f"Checksum mismatch for chunk {index}")
+
+    with _lock:
+        session = load_session(upload_id)
+        if index not in session['received']:
+            session['received'].append(index)
+        session['checksums'][str(index)] = checksum
+        _save(session)
+    return session
+
+
+def finalize(upload_id: str, destination: str) -> dict:
+    """Move a complete upload's data file to ``destination`` and claim the session for completion.
+
+    The session is kept (with the destination recorded) until ``record``
+    stores the result, so a retry after a failure or timeout resumes instead
+    of finding nothing. Call ``release`` when done, whatever the outcome.
+    """
+    with _lock:
+        session = load_session(upload_id)
+        if session.get('result') is not None:
+            return session
+        if upload_id in _finalizing:
+            raise UploadError(409, "Upload is already being finalized")
+        if not session.get('assembled'):
+            missing = describe(session)['missing_chunks']
+            if missing:
+                raise UploadError(409, f"{len(missing)} chunks missing")
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            os.replace(_data_path(upload_id), destination)
+            session['assembled'] = destination
+            _save(session)
+        _finalizing.add(upload_id)
+    return session
+
+
+def record(upload_id: str, **fields) -> dict:
+    """Persist completion progress (``blob``, ``result``) on the session."""
+    with _lock:
+        session = load_session(upload_id)
+        session.update(fields)
+        _save(session)
+    return session
+
+
+def release(upload_id: str):
+    with _lock:
+        _finalizing.discard(upload_id)
+
+
+def _discard_files(session: dict):
+    paths = [_data_path(session['upload_id']), _meta_path(session['upload_id'])]
+    if session.get('assembled') and not session.get('blob'):
+        paths.append(session['assembled'])  # assembled but never moved into the blob store
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def abort(upload_id: str):
+    with _lock:
+        if upload_id in _finalizing:
+            raise UploadError(409, "Upload is being finalized")
+        _discard_files(load_session(upload_id))
+
+
+def collect_stale_sessions(force: bool = False) -> int:
+    """Delete sessions with no activity for ``upload_session_ttl`` seconds (at most every GC_INTERVAL)."""
+    global _last_gc
+    now = time.time()
+    if not force and now - _last_gc < GC_INTERVAL:
+        return 0
+    _last_gc = now
+    try:
+        names = os.listdir(settings.upload_sessions_dir)
+    except FileNotFoundError:
+        return 0
+
+    removed = 0
+    for name in names:
+        path = os.path.join(settings.upload_sessions_dir, name)
+        try:
+            if now - os.path.getmtime(path) < settings.upload_session_ttl:
+                continue
+            if name.endswith('.json'):
+                upload_id = name[:-len('.json')]
+                with _lock:
+                    if upload_id in _finalizing:
+                        continue
+                    try:
+                        _discard_files(load_session(upload_id))
+                    except UploadError:
+                        os.remove(path)  # unreadable session file
+                removed += 1
+            else:
+                os.remove(path)
+        except OSError:
+            continue
+    if removed:
+        logger.info("Removed %d stalled upload sessions", removed)
+    return removed
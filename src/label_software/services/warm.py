@@ -0,0 +1,108 @@
+"""Cache pre-warming: do a video's heavy media work ahead of the first annotator.
+
+Every step reads through the same caches the request path uses, so warming
+is idempotent. A per-video lock file lets concurrent shards (e.g. a SLURM
+array on a shared filesystem) skip videos another process is working on.
+
+Warming only fills the file caches (frame index, transcode, thumbnails) and
+never opens the label database: shards run on other nodes, where SQLite's
+locking can't be trusted. The server records each probe on first use.
+"""
+
+import hashlib
+import logging
+import os
+import socket
+import time
+
+from ..config import settings
+from .frame_index import get_frame_index
+from .probe import probe_file
+from .transcode import FFMPEG_BIN, cache_key_for, plan_transcode, transcode_cache, transcode_now
+from .video_processing import extract_video_frames
+
+logger = logging.getLogger(__name__)
+
+
+def _lock_path(video_path: str) -> str:
+    digest = hashlib.sha1(os.path.realpath(video_path).encode()).hexdigest()
+    return os.path.join(settings.lock_dir, f"{digest}.lock")
+
+
+def _acquire_lock(video_path: str) -> str | None:
+    """Create the video's lock file, or return None if another live process holds it."""
+    os.makedirs(settings.lock_dir, exist_ok=True)
+    path = _lock_path(video_path)
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                age = time.time() - os.path.getmtime(path)
+            except OSError:
+                continue  # released between open and stat
+            if age < settings.transcode_timeout * 2:
+                return None
+            logger.warning("Breaking stale warm lock %s (%.0fs old)", path, age)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        with os.fdopen(fd, "w") as f:
+            f.write(f"{socket.gethostname()}:{os.getpid()}\n{video_path}\n")
+        return path
+    return None
+
+
+def filmstrip_frames(frame_count: int, count: int) -> list[int]:
+    """``count`` frame numbers spread evenly across the video."""
+    if frame_count <= 0 or count <= 0:
+        return []
+    if frame_count <= count:
+        return list(range(frame_count))
+    step = frame_count / count
+    return sorted({int(i * step) for i in range(count)})
+
+
+def warm_video(video_path: str, filmstrip: int = 20, transcode: bool = True, threads: int = 1) -> dict:
+    """Probe, index, transcode and thumbnail one video. Returns a status summary."""
+    result = {"path": video_path, "status": "done", "steps": []}
+    if not os.path.isfile(video_path):
+        return {**result, "status": "missing"}
+
+    lock = _acquire_lock(video_path)
+    if lock is None:
+        return {**result, "status": "locked"}
+    try:
+        info = probe_file(video_path)
+        if info is None:
+            return {**result, "status": "failed", "error": "probe failed"}
+        result["steps"].append("probe")
+
+        index = get_frame_index(video_path, build=True)
+        if index is not None:
+            result["steps"].append("index")
+            if info.get("frame_count_estimated"):
+                info["frame_count"] = index.frame_count
+
+        if transcode:
+            plan = plan_transcode(info)
+            key = cache_key_for(video_path)
+            if plan["action"] != "direct" and os.path.isfile(FFMPEG_BIN) and not transcode_cache.get(key):
+                transcode_now(video_path, key, plan["args"], threads)
+                result["steps"].append(f"transcode:{plan['action']}")
+
+        # Poster frame plus the strip the labeling UI shows first
+        frames = sorted({0, *filmstrip_frames(info.get("frame_count") or 0, filmstrip)})
+        extracted = extract_video_frames(video_path, frames, settings.thumbnail_cache)
+        result["steps"].append(f"frames:{len(extracted)}")
+        return result
+    except Exception as e:
+        logger.error("Warming %s failed: %s", video_path, e)
+        return {**result, "status": "failed", "error": str(e)}
+    finally:
+        try:
+            os.remove(lock)
+        except OSError:
+            pass
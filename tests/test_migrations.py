@@ -0,0 +1,83 @@
+"""Migrating a database created with the initial schema, and the query plans that depend on it."""
+
+import sqlite3
+
+import pytest
+
+from label_software import database
+
+# Tables as the first release created them: no counters, no indexes besides the primary keys
+BASELINE_SCHEMA = """
+CREATE TABLE projects (
+    project_id INTEGER PRIMARY KEY, name VARCHAR(200) NOT NULL, description TEXT,
+    created_at DATETIME NOT NULL, deadline DATE, status VARCHAR(9) NOT NULL,
+    annotation_schema JSON, normalization_settings JSON, quality_threshold FLOAT,
+    total_videos INTEGER, completed_videos INTEGER, last_activity DATETIME
+);
+CREATE TABLE videos (
+    video_id INTEGER PRIMARY KEY, filename VARCHAR(255), resolution VARCHAR(50), framerate FLOAT,
+    duration FLOAT, import_date DATETIME, normalization_settings JSON, status VARCHAR(20),
+    is_completed BOOLEAN NOT NULL, project_id INTEGER REFERENCES projects (project_id)
+);
+CREATE TABLE temporal_annotations (
+    annotation_id INTEGER PRIMARY KEY, video_id INTEGER NOT NULL REFERENCES videos (video_id),
+    start_time FLOAT, end_time FLOAT, start_frame INTEGER, end_frame INTEGER,
+    label VARCHAR(50) NOT NULL, annotator_name VARCHAR(100), created_at DATETIME
+);
+CREATE TABLE bbox_annotations (
+    bbox_id INTEGER PRIMARY KEY, video_id INTEGER REFERENCES videos (video_id), frame_index INTEGER,
+    x FLOAT, y FLOAT, width FLOAT, height FLOAT, part_label VARCHAR(50),
+    annotator_name VARCHAR(100), created_at DATETIME
+);
+"""
+
+# Enough rows spread over projects and videos that ANALYZE favours the indexes, as it does in production
+BASELINE_ROWS = """
+WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 5000)
+INSERT INTO projects (project_id, name, created_at, status, total_videos, completed_videos)
+    SELECT i, 'project ' || i, '2024-01-01', 'ACTIVE', 20, 0 FROM n WHERE i <= 20;
+WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 5000)
+INSERT INTO videos (video_id, filename, status, is_completed, project_id)
+    SELECT i, 'video' || i || '.mp4', 'pending', 0, i % 20 + 1 FROM n WHERE i <= 400;
+WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 5000)
+INSERT INTO temporal_annotations (video_id, start_frame, end_frame, label, annotator_name, created_at)
+    SELECT i % 400 + 1, i, i + 10, 'fall', 'ann', '2024-01-02' FROM n WHERE i <= 2000;
+WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 5000)
+INSERT INTO bbox_annotations (video_id, frame_index, x, y, width, height, part_label, annotator_name, created_at)
+    SELECT i % 400 + 1, i / 400, 1, 2, 3, 4, 'head', 'ann', '2024-01-02' FROM n;
+"""
+
+HOT_QUERIES = [
+    ("SELECT * FROM temporal_annotations WHERE video_id = 1", "ix_temporal_annotations_video_id"),
+    ("SELECT * FROM bbox_annotations WHERE video_id = 1 AND frame_index = 0", "ix_bbox_annotations_video_frame"),
+    ("SELECT * FROM bbox_annotations WHERE video_id = 1", "ix_bbox_annotations_video_frame"),
+    ("SELECT * FROM videos WHERE project_id = 1", "ix_videos_project_id"),
+]
+
+
+@pytest.fixture
+def migrated(tmp_path):
+    path = tmp_path / "baseline.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+        conn.executescript(BASELINE_ROWS)
+    database.init_db(f"sqlite:///{path}")
+    conn = sqlite3.connect(path)
+    yield conn
+    conn.close()
+    database.engine.dispose()
+    database.read_engine.dispose()
+
+
+def test_baseline_is_migrated_to_latest(migrated):
+    assert migrated.execute("PRAGMA user_version").fetchone()[0] == database.MIGRATIONS[-1][0]
+    columns = {row[1] for row in migrated.execute("PRAGMA table_info(videos)")}
+    assert {"temporal_count", "bbox_count", "source_type", "catalog_path"} <= columns
+    # Counters are backfilled from the existing annotations
+    assert migrated.execute("SELECT temporal_count, bbox_count FROM videos WHERE video_id = 1").fetchone() == (5, 12)
+
+
+@pytest.mark.parametrize(("query", "index"), HOT_QUERIES)
+def test_hot_queries_use_indexes(migrated, query, index):
+    plan = " ".join(row[-1] for row in migrated.execute(f"EXPLAIN QUERY PLAN {query}"))
+    assert f"USING INDEX {index}" in plan or f"USING COVERING INDEX {index}" in plan, plan